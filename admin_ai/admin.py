@@ -2,7 +2,8 @@ from django.contrib import admin
 
 from .models import (
     AISettings, AIProfile, AIModelCache,
-    AIConversation, AIMessage, AIKnowledgeChunk,
+    AIConversation, AIMessage, AIKnowledgeChunk, AIEmbeddingCache, AIIngestJob, AIStoreInsight,
+    AIUsageMetric,
 )
 
 
@@ -40,5 +41,35 @@ class AIMessageAdmin(admin.ModelAdmin):
 
 @admin.register(AIKnowledgeChunk)
 class AIKnowledgeChunkAdmin(admin.ModelAdmin):
-    list_display = ['source_name', 'chunk_index', 'industries', 'created_at']
+    list_display = ['source_name', 'chunk_index', 'industries', 'embedding_model', 'created_at']
+    list_filter = ['embedding_model']
     search_fields = ['source_name', 'content']
+
+
+@admin.register(AIEmbeddingCache)
+class AIEmbeddingCacheAdmin(admin.ModelAdmin):
+    list_display = ['model', 'content_hash', 'created_at']
+    list_filter = ['model']
+    search_fields = ['content_hash']
+    exclude = ['embedding']
+
+
+@admin.register(AIIngestJob)
+class AIIngestJobAdmin(admin.ModelAdmin):
+    list_display = ['source_name', 'status', 'total', 'embedded', 'failed', 'skipped', 'created_at']
+    list_filter = ['status']
+    search_fields = ['source_name']
+
+
+@admin.register(AIStoreInsight)
+class AIStoreInsightAdmin(admin.ModelAdmin):
+    list_display = ['store', 'model_id', 'data_version', 'generated_at']
+    search_fields = ['store__name']
+
+
+@admin.register(AIUsageMetric)
+class AIUsageMetricAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'name', 'hop', 'duration_ms', 'input_tokens', 'output_tokens',
+                    'rows', 'payload_bytes', 'created_at']
+    list_filter = ['kind', 'ok']
+    search_fields = ['name']
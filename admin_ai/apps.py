@@ -8,3 +8,4 @@ class AdminAiConfig(AppConfig):
     def ready(self):
         # Import tool registry so built-in tools self-register on app load.
         from . import tools  # noqa: F401
+        from . import signals  # noqa: F401
@@ -0,0 +1,241 @@
+"""Streaming, structure-aware chunking of KB uploads.
+
+    iter_blocks(file)                          -> Block stream: headings and body text
+    chunk_blocks(blocks, max_tokens, overlap)  -> (content, metadata) stream
+    chunk_file(file)                           -> chunk_blocks(iter_blocks(file))
+
+The upload view used to read the whole file, join every PDF page / DOCX
+paragraph / CSV row into one string and split it on blank lines with a
+1,200-character budget, so a single long paragraph became one giant chunk and
+a 10 MB upload lived in memory several times over. Now each format is read
+lazily — text and CSV line by line from the upload's 64 KB chunks(), PDFs page
+by page — and chunks come out as a generator that ingest.create_job writes in
+batches, so memory stays flat in the file size.
+
+Chunks are sized in estimated tokens (history.estimate_tokens, the same
+estimate the chat history budget uses). Each chunk starts with the heading
+path it sits under ("Returns > Restocking fee"); Markdown `#` lines, DOCX
+Heading / Title styles and a CSV's header row count as headings, so every CSV
+chunk repeats the column names. A paragraph over budget is cut at sentence
+ends, then at spaces. Consecutive chunks of one section share the last
+`overlap` tokens so a fact on a boundary is retrievable from both sides.
+
+python-docx parses the whole document.xml when it opens a .docx; that format
+cannot be streamed, only its paragraphs are walked lazily.
+"""
+import codecs
+import csv
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .history import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CHUNK_TOKENS         = int(os.environ.get('AI_KB_CHUNK_TOKENS', '300'))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('AI_KB_CHUNK_OVERLAP_TOKENS', '40'))
+
+_HEADING_LINE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*$')
+_SENTENCE_END = re.compile(r'(?<=[.!?؟。;])\s+|\n+')
+_SPACE = re.compile(r'\s+')
+
+
+class Block(NamedTuple):
+    text: str
+    heading: int = 0            # heading level, 0 = body text
+    page: Optional[int] = None  # 1-based PDF page
+
+
+# ---------- readers ----------
+
+def _lines(file) -> Iterator[str]:
+    """Decoded lines of an uploaded file, read in its chunks() pieces."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='ignore')
+    pending = ''
+    for data in file.chunks():
+        pending += decoder.decode(data)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending.rstrip('\r')
+
+
+def _paragraphs(lines: Iterable[str], page: Optional[int] = None) -> Iterator[Block]:
+    """Blank-line separated paragraphs; Markdown heading lines are headings."""
+    current: List[str] = []
+    for line in lines:
+        heading = _HEADING_LINE.match(line.strip())
+        if heading or not line.strip():
+            if current:
+                yield Block('\n'.join(current), page=page)
+                current = []
+            if heading:
+                yield Block(heading.group(2), heading=len(heading.group(1)), page=page)
+            continue
+        current.append(line.strip())
+    if current:
+        yield Block('\n'.join(current), page=page)
+
+
+def _csv_blocks(file) -> Iterator[Block]:
+    rows = csv.reader(_lines(file))
+    header = next(rows, None)
+    if header is None:
+        return
+    yield Block(', '.join(header), heading=1)
+    for row in rows:
+        if any(cell.strip() for cell in row):
+            yield Block(', '.join(row))
+
+
+def _pdf_blocks(file) -> Iterator[Block]:
+    try:
+        from pypdf import PdfReader
+        file.seek(0)
+        reader = PdfReader(file)
+        for number, page in enumerate(reader.pages, 1):
+            yield from _paragraphs((page.extract_text() or '').splitlines(), page=number)
+    except Exception as e:  # noqa: BLE001 — keep what was read before the bad page
+        logger.warning("PDF parse failed: %s", e)
+
+
+def _docx_heading_level(style_name: str) -> int:
+    if style_name == 'Title':
+        return 1
+    match = re.match(r'Heading (\d)', style_name)
+    return int(match.group(1)) if match else 0
+
+
+def _docx_blocks(file) -> Iterator[Block]:
+    try:
+        from docx import Document
+        file.seek(0)
+        doc = Document(file)
+        for para in doc.paragraphs:
+            text = para.text.strip()
+            if text:
+                style = para.style.name if para.style is not None else ''
+                yield Block(text, heading=_docx_heading_level(style or ''))
+    except Exception as e:  # noqa: BLE001
+        logger.warning("DOCX parse failed: %s", e)
+
+
+def iter_blocks(file) -> Iterator[Block]:
+    """Headings and body paragraphs of an uploaded PDF / DOCX / CSV / text file."""
+    name = (file.name or '').lower()
+    if name.endswith('.pdf'):
+        return _pdf_blocks(file)
+    if name.endswith('.docx'):
+        return _docx_blocks(file)
+    if name.endswith('.csv'):
+        return _csv_blocks(file)
+    return _paragraphs(_lines(file))     # .txt, .md and anything else: UTF-8 text
+
+
+# ---------- chunking ----------
+
+def _split(text: str, limit: int) -> List[str]:
+    """Pieces of `text` of at most `limit` tokens, cut at sentence ends where
+    possible, then at spaces, then anywhere."""
+    if estimate_tokens(text) <= limit:
+        return [text]
+    for pattern in (_SENTENCE_END, _SPACE):
+        units = [u for u in pattern.split(text) if u]
+        if len(units) > 1:
+            break
+    else:
+        size = max(1, limit * 4)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    pieces, buf = [], ''
+    for unit in units:
+        if estimate_tokens(unit) > limit:
+            if buf:
+                pieces.append(buf)
+                buf = ''
+            pieces.extend(_split(unit, limit))
+            continue
+        joined = f'{buf} {unit}' if buf else unit
+        if estimate_tokens(joined) > limit:
+            pieces.append(buf)
+            buf = unit
+        else:
+            buf = joined
+    if buf:
+        pieces.append(buf)
+    return pieces
+
+
+def _tail(text: str, tokens: int) -> str:
+    """The last words of `text` fitting in `tokens`."""
+    if tokens <= 0:
+        return ''
+    words = text.split()
+    kept: List[str] = []
+    size = 0
+    for word in reversed(words):
+        size += len(word) + 1
+        if size > tokens * 4:
+            break
+        kept.append(word)
+    return ' '.join(reversed(kept))
+
+
+def chunk_blocks(blocks: Iterable[Block], max_tokens: int = CHUNK_TOKENS,
+                 overlap: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Pack blocks into chunks of at most ~max_tokens, headings first."""
+    headings: List[Tuple[int, str]] = []
+    path, budget = '', max_tokens
+    parts: List[str] = []
+    size = 0
+    fresh = False               # parts hold more than the carried-over overlap
+    pages: List[int] = []
+
+    def emit():
+        body = '\n\n'.join(parts)
+        meta: Dict[str, Any] = {}
+        if path:
+            meta['heading'] = path
+        if pages:
+            meta['page'] = pages[0]
+            if pages[-1] != pages[0]:
+                meta['page_end'] = pages[-1]
+        return (f'{path}\n\n{body}' if path else body), meta
+
+    for block in blocks:
+        if block.heading:
+            if fresh:
+                yield emit()
+            parts, size, fresh, pages = [], 0, False, []
+            while headings and headings[-1][0] >= block.heading:
+                headings.pop()
+            headings.append((block.heading, block.text))
+            path = ' > '.join(text for _, text in headings)
+            budget = max(16, max_tokens - estimate_tokens(path))
+            continue
+
+        carry = min(overlap, budget // 4)
+        for piece in _split(block.text, budget - carry):
+            tokens = estimate_tokens(piece)
+            if fresh and size + tokens > budget:
+                yield emit()
+                tail = _tail(parts[-1], carry)
+                parts, size, fresh = ([tail], estimate_tokens(tail), False) if tail else ([], 0, False)
+                pages = pages[-1:]
+            parts.append(piece)
+            size += tokens
+            fresh = True
+            if block.page is not None and (not pages or pages[-1] != block.page):
+                pages.append(block.page)
+    if fresh:
+        yield emit()
+
+
+def chunk_file(file, max_tokens: int = CHUNK_TOKENS,
+               overlap: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(content, metadata) chunks of an uploaded file, produced lazily."""
+    return chunk_blocks(iter_blocks(file), max_tokens, overlap)
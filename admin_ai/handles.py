@@ -0,0 +1,88 @@
+"""Server-side result handles for large read-tool results.
+
+    wrap(tool_name, args, data, context) -> data, or a page-1 envelope with a handle
+    page(handle, page, context)          -> the envelope for another page (fetch_more)
+
+A list tool (list_products, list_invoices, get_activity_log, …) may return up
+to 200 fully expanded rows. Sent whole, every row goes into the model context
+and is stored again in AIMessage.tool_calls. Now, when a read tool returns more
+than PAGE_ROWS rows, the model gets
+
+    {'rows': [first PAGE_ROWS], 'summary': {total, columns}, 'handle': '…',
+     'page': 1, 'pages': n, 'next': 'fetch_more(handle=…, page=2)'}
+
+and the full list stays in Django's cache under the handle for HANDLE_TTL
+seconds. The `fetch_more` tool serves later pages from there instead of
+re-running the query. Handles belong to the user who created them.
+
+With the stock LocMemCache handles are per process, so a later turn served by
+another worker may find one gone; fetch_more then tells the model to call the
+original tool again. Point CACHES at a shared backend to avoid that.
+"""
+import os
+import secrets
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import cache
+
+from .registry import ToolValidationError
+
+PAGE_ROWS  = int(os.environ.get('AI_TOOL_PAGE_ROWS', '20'))
+HANDLE_TTL = int(os.environ.get('AI_TOOL_HANDLE_TTL', '1800'))   # seconds
+
+_KEY = 'admin_ai:handle:{}'
+
+
+def _user_id(context) -> Optional[Any]:
+    return getattr(getattr(context, 'user', None), 'pk', None)
+
+
+def _columns(rows: List[Any]) -> List[str]:
+    first = rows[0] if rows else None
+    return list(first.keys()) if isinstance(first, dict) else []
+
+
+def _envelope(handle: str, entry: Dict[str, Any], page_no: int) -> Dict[str, Any]:
+    rows = entry['rows']
+    pages = max(1, -(-len(rows) // PAGE_ROWS))
+    start = (page_no - 1) * PAGE_ROWS
+    out = {
+        'rows': rows[start:start + PAGE_ROWS],
+        'summary': {'total': len(rows), 'columns': _columns(rows), 'tool': entry['tool']},
+        'handle': handle,
+        'page': page_no,
+        'pages': pages,
+    }
+    if page_no < pages:
+        out['next'] = f'fetch_more(handle="{handle}", page={page_no + 1})'
+    return out
+
+
+def wrap(tool_name: str, args: Dict[str, Any], data: Any, context) -> Any:
+    """Page `data` behind a handle if it is a list longer than PAGE_ROWS.
+    Anything else — and any cache failure — returns `data` unchanged."""
+    if not isinstance(data, list) or len(data) <= PAGE_ROWS:
+        return data
+    handle = secrets.token_urlsafe(9)
+    entry = {'tool': tool_name, 'args': args, 'user_id': _user_id(context), 'rows': data}
+    try:
+        cache.set(_KEY.format(handle), entry, HANDLE_TTL)
+    except Exception:  # noqa: BLE001 — no handle, the model just sees every row
+        return data
+    return _envelope(handle, entry, 1)
+
+
+def page(handle: str, page_no: int, context) -> Dict[str, Any]:
+    entry = cache.get(_KEY.format(handle or ''))
+    if entry is None or entry.get('user_id') != _user_id(context):
+        raise ToolValidationError(
+            f"Result handle {handle!r} has expired or is unknown — call the original tool again."
+        )
+    try:
+        page_no = int(page_no)
+    except (TypeError, ValueError):
+        raise ToolValidationError("'page' must be an integer.")
+    pages = max(1, -(-len(entry['rows']) // PAGE_ROWS))
+    if not 1 <= page_no <= pages:
+        raise ToolValidationError(f"'page' must be between 1 and {pages}.")
+    return _envelope(handle, entry, page_no)
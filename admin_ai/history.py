@@ -0,0 +1,216 @@
+"""Conversation history for Gemini requests, under a token budget.
+
+    build_history(conversation, exclude_id=None)     -> [{role, parts}]  (what the next hop sees)
+    maybe_summarize(conversation, service, model_id) -> bool             (fold old turns, persist)
+
+Replaying every prior message — including each tool call's full result, up to
+200 rows apiece — made input tokens grow without bound. Now:
+
+  * Messages up to `AIConversation.summarized_until` are represented by the
+    stored `summary` only. The summary is updated after a turn finishes, so it
+    is computed once per fold, never on the request path.
+  * Tool results from earlier turns are compacted: lists capped at
+    HISTORY_MAX_ROWS, long strings cut, and anything still over
+    HISTORY_MAX_RESULT_CHARS replaced by a preview. The model can re-run the
+    tool if it needs the full rows again.
+  * Whole turns (a user message plus the model's answer) are kept newest-first
+    until HISTORY_TOKEN_BUDGET is reached; the newest turn is always kept.
+    Older unsummarized turns that don't fit are left out of the request.
+
+Tokens are estimated at ~4 characters each — no tokenizer round trip.
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+from django.utils import timezone
+
+from .models import AIConversation, AIMessage
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET     = int(os.environ.get('AI_HISTORY_TOKEN_BUDGET', '8000'))
+HISTORY_MAX_ROWS         = 10
+HISTORY_MAX_STRING       = 500
+HISTORY_MAX_RESULT_CHARS = 4000
+# Fold once unsummarized history passes this share of the budget, keeping the
+# newest KEEP_RECENT_TURNS turns verbatim.
+SUMMARIZE_AT      = 0.75
+KEEP_RECENT_TURNS = 2
+SUMMARY_MAX_CHARS = 6000
+
+SUMMARY_INSTRUCTION = (
+    "You maintain the running summary of an admin's conversation with an ERP "
+    "assistant. Merge the previous summary with the new turns into one concise "
+    "summary (bullet points, at most ~300 words). Keep every concrete fact the "
+    "assistant may need later: store names and IDs, product / invoice / customer "
+    "identifiers, figures, decisions taken and actions performed, and open "
+    "questions. Drop pleasantries and raw tool output."
+)
+
+
+def estimate_tokens(obj: Any) -> int:
+    text = obj if isinstance(obj, str) else json.dumps(obj, default=str, ensure_ascii=False)
+    return len(text) // 4 + 1
+
+
+def compact(value: Any, max_rows: int = HISTORY_MAX_ROWS, max_string: int = HISTORY_MAX_STRING) -> Any:
+    """Recursively cap list lengths and string sizes, noting what was cut."""
+    if isinstance(value, dict):
+        return {k: compact(v, max_rows, max_string) for k, v in value.items()}
+    if isinstance(value, list):
+        head = [compact(v, max_rows, max_string) for v in value[:max_rows]]
+        if len(value) > max_rows:
+            head.append(f'… {len(value) - max_rows} more rows elided')
+        return head
+    if isinstance(value, str) and len(value) > max_string:
+        return value[:max_string] + '…'
+    return value
+
+
+def elide_result(result: Any) -> Dict[str, Any]:
+    """A past tool result, small enough to replay."""
+    small = compact(result or {})
+    text = json.dumps(small, default=str, ensure_ascii=False)
+    if len(text) <= HISTORY_MAX_RESULT_CHARS:
+        return small if isinstance(small, dict) else {'result': small}
+    return {
+        'elided': True,
+        'note': 'Large result from an earlier turn — call the tool again for the full data.',
+        'preview': text[:HISTORY_MAX_RESULT_CHARS],
+    }
+
+
+def _message_contents(m: AIMessage) -> List[Dict[str, Any]]:
+    """One stored message → Gemini contents.
+
+    A model message that used tools becomes function_call + function_response
+    turns before its text. Without them the model loses IDs it discovered
+    (store UUIDs etc.) between turns and re-queries or hallucinates them.
+    """
+    role = 'model' if m.role.upper() == 'MODEL' else 'user'
+    contents: List[Dict[str, Any]] = []
+    if role == 'model' and m.tool_calls:
+        tool_events = [tc for tc in m.tool_calls if tc.get('event') == 'tool']
+        if tool_events:
+            contents.append({'role': 'model', 'parts': [
+                {'function_call': {'name': tc['name'], 'args': tc.get('args') or {}}}
+                for tc in tool_events
+            ]})
+            contents.append({'role': 'user', 'parts': [
+                {'function_response': {'name': tc['name'], 'response': elide_result(tc.get('result'))}}
+                for tc in tool_events
+            ]})
+    if m.content:
+        contents.append({'role': role, 'parts': [{'text': m.content}]})
+    return contents
+
+
+def _turns(messages: List[AIMessage]) -> List[List[AIMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[AIMessage]] = []
+    for m in messages:
+        if m.role == AIMessage.Role.USER or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    return turns
+
+
+def _unsummarized(conversation: AIConversation, exclude_id=None) -> List[AIMessage]:
+    qs = conversation.messages.exclude(role=AIMessage.Role.SYSTEM)
+    if conversation.summarized_until:
+        qs = qs.filter(created_at__gt=conversation.summarized_until)
+    if exclude_id:
+        qs = qs.exclude(pk=exclude_id)
+    return list(qs)
+
+
+def _summary_contents(summary: str) -> List[Dict[str, Any]]:
+    if not summary:
+        return []
+    return [
+        {'role': 'user', 'parts': [{'text': f"Summary of our conversation so far:\n\n{summary}"}]},
+        {'role': 'model', 'parts': [{'text': 'Understood — continuing from that summary.'}]},
+    ]
+
+
+def build_history(conversation: AIConversation, exclude_id=None,
+                  budget: int = HISTORY_TOKEN_BUDGET) -> List[Dict[str, Any]]:
+    """Summary + newest whole turns that fit the budget, in Gemini's {role, parts} format.
+
+    `exclude_id` skips a message already stored for the turn being answered
+    (the view persists the prompt first; chat_stream appends it itself).
+    """
+    head = _summary_contents(conversation.summary)
+    used = estimate_tokens(head)
+    kept: List[List[Dict[str, Any]]] = []
+    for turn in reversed(_turns(_unsummarized(conversation, exclude_id))):
+        contents = [c for m in turn for c in _message_contents(m)]
+        cost = estimate_tokens(contents)
+        if kept and used + cost > budget:
+            break
+        kept.append(contents)
+        used += cost
+    return head + [c for contents in reversed(kept) for c in contents]
+
+
+def _render_for_summary(turns: List[List[AIMessage]]) -> str:
+    lines: List[str] = []
+    for turn in turns:
+        for m in turn:
+            speaker = 'Admin' if m.role == AIMessage.Role.USER else 'Assistant'
+            for tc in (m.tool_calls or []):
+                if tc.get('event') != 'tool':
+                    continue
+                result = json.dumps(compact(tc.get('result'), max_rows=3, max_string=200),
+                                    default=str, ensure_ascii=False)
+                lines.append(f"[tool {tc.get('name')}({json.dumps(tc.get('args') or {}, default=str)})"
+                             f" → {result[:600]}]")
+            if m.content:
+                lines.append(f"{speaker}: {m.content}")
+    return '\n'.join(lines)
+
+
+def maybe_summarize(conversation: AIConversation, service, model_id: str,
+                    budget: int = HISTORY_TOKEN_BUDGET) -> bool:
+    """Fold all but the newest turns into the stored summary once unsummarized
+    history passes SUMMARIZE_AT of the budget. Returns True if it folded.
+
+    Called after a turn's reply is saved, so the next request starts from a
+    small history. A failed summarization changes nothing; the budget in
+    build_history still bounds the request.
+
+    It runs on a background thread, possibly while the next turn's fold is
+    running too: it starts from the stored summary, not the instance's, and
+    saves only if no other fold moved `summarized_until` meanwhile.
+    """
+    conversation.refresh_from_db(fields=['summary', 'summarized_until'])
+    folded_until = conversation.summarized_until
+    turns = _turns(_unsummarized(conversation))
+    if len(turns) <= KEEP_RECENT_TURNS:
+        return False
+    contents = [c for turn in turns for m in turn for c in _message_contents(m)]
+    if estimate_tokens(_summary_contents(conversation.summary) + contents) < budget * SUMMARIZE_AT:
+        return False
+
+    fold = turns[:-KEEP_RECENT_TURNS]
+    prompt = (f"Previous summary:\n{conversation.summary or '(none)'}\n\n"
+              f"New turns:\n{_render_for_summary(fold)}")
+    try:
+        summary = service.summarize(model_id, SUMMARY_INSTRUCTION, prompt)
+    except Exception:  # noqa: BLE001 — summaries are an optimization, never an error
+        logger.warning("History summary failed for conversation %s", conversation.pk, exc_info=True)
+        return False
+    if not summary:
+        return False
+
+    summary, until = summary[:SUMMARY_MAX_CHARS], fold[-1][-1].created_at
+    saved = (AIConversation.objects
+             .filter(pk=conversation.pk, summarized_until=folded_until)
+             .update(summary=summary, summarized_until=until, updated_at=timezone.now()))
+    if not saved:
+        return False        # another fold got there first; its summary stands
+    conversation.summary, conversation.summarized_until = summary, until
+    return True
@@ -0,0 +1,290 @@
+"""Knowledge-base ingestion pipeline.
+
+    create_job(source_name, contents, ...)  -> AIIngestJob   (chunks bulk-created in batches, text-only)
+    run_job(job_id, embedder=None, ...)     -> AIIngestJob   (embeds in batches, bulk_update)
+    start_job(job)                          -> None          (run_job on a daemon thread after commit)
+    finish_text_only(job, note)             -> AIIngestJob   (DONE without embedding: no key, --no-embed)
+    reembed_job(user=None)                  -> AIIngestJob | None  (chunks of another embedding model)
+    embed_texts(embedder, texts)            -> vectors       (AIEmbeddingCache first, then the API)
+
+Chunk rows are written in one bulk_create so the upload request returns as soon
+as the text is stored; embedding — the slow, network-bound half — goes through
+GeminiService.embed_batch (multi-content requests, bounded concurrency, retry
+with backoff) and lands with bulk_update. Progress is counted on the job row.
+
+`contents` may be a generator (chunking.chunk_file) and is written
+BULK_BATCH_SIZE rows at a time, so an upload is never materialised whole.
+Chunks are deduplicated by content_hash: one already stored under the same
+source, or repeated within the upload, is skipped (job.skipped). With
+`replace=True` (document re-upload, `ingest_erp_catalog --force`) the source's
+chunks that are no longer in `contents` are deleted afterwards, so an edited
+document keeps its unchanged chunks and their vectors.
+
+Every vector computed here is kept in AIEmbeddingCache under (EMBEDDING_MODEL,
+content_hash), and every chunk needing a vector looks there first; only new or
+changed text reaches the embedding API. Chunks remember which model embedded
+them. After EMBEDDING_MODEL changes, retrieval ignores the old vectors and
+reembed_job re-embeds those chunks in the background, batch by batch, instead
+of wiping the KB.
+
+run_job embeds only chunks that still lack a current vector, so a job cut
+short by a restart can simply run again (`manage.py recover_jobs`, core.jobs).
+
+`embedder` is anything with GeminiService's `embed_batch(texts, on_progress=)`
+signature; tests pass a stub instead of calling Gemini.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import jobs
+from .models import AIEmbeddingCache, AIIngestJob, AIKnowledgeChunk
+from .retrieval import bump_kb_version
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+
+
+def embedding_model() -> str:
+    from .services import EMBEDDING_MODEL
+    return EMBEDDING_MODEL
+
+
+# ---------- embedding cache ----------
+
+def cached_vectors(hashes: Iterable[str], model: Optional[str] = None) -> Dict[str, List[float]]:
+    """{content_hash: vector} of the hashes AIEmbeddingCache has for `model`."""
+    return dict(AIEmbeddingCache.objects
+                .filter(model=model or embedding_model(), content_hash__in=set(hashes))
+                .values_list('content_hash', 'embedding'))
+
+
+def remember(vectors: Dict[str, List[float]], model: Optional[str] = None) -> None:
+    """Add {content_hash: vector} to AIEmbeddingCache; existing keys win."""
+    model = model or embedding_model()
+    AIEmbeddingCache.objects.bulk_create(
+        [AIEmbeddingCache(model=model, content_hash=h, embedding=v) for h, v in vectors.items()],
+        batch_size=BULK_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def embed_texts(embedder, texts: List[str], on_progress=None) -> List[Optional[List[float]]]:
+    """One vector (or None on failure) per text: cached ones as they are, the
+    rest from `embedder.embed_batch`, which are then cached. `on_progress`
+    counts both."""
+    hashes = [AIKnowledgeChunk.hash_content(t) for t in texts]
+    known = cached_vectors(hashes)
+    vectors: List[Optional[List[float]]] = [known.get(h) for h in hashes]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    hits = len(texts) - len(missing)
+    if missing:
+        def progress(done, failed):
+            if on_progress:
+                on_progress(hits + done, failed)
+
+        fresh = embedder.embed_batch([texts[i] for i in missing], on_progress=progress)
+        learned = {}
+        for i, vector in zip(missing, fresh):
+            if vector:
+                vectors[i] = vector
+                learned[hashes[i]] = vector
+        if learned:
+            remember(learned)
+    elif on_progress:
+        on_progress(hits, 0)
+    return vectors
+
+
+# ---------- jobs ----------
+
+def _store(batch: List[AIKnowledgeChunk]) -> int:
+    """bulk_create one batch, taking vectors of known text from the cache.
+    Returns how many chunks got one that way."""
+    model = embedding_model()
+    known = cached_vectors((c.content_hash for c in batch), model)
+    reused = 0
+    for chunk in batch:
+        vector = known.get(chunk.content_hash)
+        if vector is not None:
+            chunk.embedding, chunk.embedding_model = vector, model
+            reused += 1
+    AIKnowledgeChunk.objects.bulk_create(batch, batch_size=BULK_BATCH_SIZE)
+    return reused
+
+
+def create_job(source_name: str, contents: Iterable[Any], *, source_type: str = 'document',
+               industries: Optional[List[str]] = None,
+               metadata: Optional[List[Dict[str, Any]]] = None,
+               replace: bool = False, user=None) -> AIIngestJob:
+    """Store every new chunk (without embeddings) and a QUEUED job covering them.
+
+    Each item of `contents` is a text, or a (text, metadata) pair as
+    chunking.chunk_file yields them; `metadata` is the per-item list for
+    plain texts. `replace` makes `contents` the whole of `source_name`:
+    chunks it no longer contains are deleted, kept ones move to their new
+    position.
+    """
+    stored = list(AIKnowledgeChunk.objects.filter(source_name=source_name)
+                  .values_list('content_hash', 'pk'))
+    existing = {digest: pk for digest, pk in reversed(stored)}    # first row per hash
+    seen = set()
+    kept: Dict[Any, tuple] = {}         # pk -> (chunk_index, metadata) of re-sent chunks
+    chunk_ids: List[str] = []
+    batch: List[AIKnowledgeChunk] = []
+    skipped = reused = 0
+    with transaction.atomic():
+        for idx, item in enumerate(contents):
+            content, meta = item if isinstance(item, tuple) else (item, metadata[idx] if metadata else {})
+            digest = AIKnowledgeChunk.hash_content(content)
+            if digest in seen or digest in existing:
+                if digest in existing and digest not in seen:
+                    kept[existing[digest]] = (idx, meta or {})
+                seen.add(digest)
+                skipped += 1
+                continue
+            seen.add(digest)
+            batch.append(AIKnowledgeChunk(
+                source_name=source_name,
+                source_type=source_type,
+                chunk_index=idx,
+                content=content,
+                content_hash=digest,
+                industries=list(industries or []),
+                metadata=meta or {},
+            ))
+            if len(batch) >= BULK_BATCH_SIZE:
+                reused += _store(batch)
+                chunk_ids.extend(str(c.id) for c in batch)
+                batch = []
+        if batch:
+            reused += _store(batch)
+            chunk_ids.extend(str(c.id) for c in batch)
+        if replace:
+            _replace(source_name, [pk for _, pk in stored], kept)
+        job = AIIngestJob.objects.create(
+            source_name=source_name,
+            total=len(chunk_ids),
+            embedded=reused,
+            skipped=skipped,
+            chunk_ids=chunk_ids,
+            created_by=user,
+        )
+    bump_kb_version()   # bulk writes skip post_save
+    return job
+
+
+def _replace(source_name: str, stored: List[Any], kept: Dict[Any, tuple]) -> None:
+    gone = [pk for pk in stored if pk not in kept]
+    for start in range(0, len(gone), BULK_BATCH_SIZE):
+        AIKnowledgeChunk.objects.filter(pk__in=gone[start:start + BULK_BATCH_SIZE]).delete()
+    moved = []
+    for chunk in AIKnowledgeChunk.objects.filter(pk__in=list(kept)).only('pk', 'chunk_index', 'metadata'):
+        idx, meta = kept[chunk.pk]
+        if (chunk.chunk_index, chunk.metadata) != (idx, meta):
+            chunk.chunk_index, chunk.metadata = idx, meta
+            moved.append(chunk)
+    AIKnowledgeChunk.objects.bulk_update(moved, ['chunk_index', 'metadata'], batch_size=BULK_BATCH_SIZE)
+    if gone:
+        logger.info("Replaced %s: %d stale chunks removed, %d kept", source_name, len(gone), len(kept))
+
+
+def run_job(job_id, embedder=None, on_progress=None) -> AIIngestJob:
+    """Embed the job's chunks that have no vector from the current model.
+    Never raises: failures end up on the job row.
+
+    `on_progress(done, failed)` is called after each batch (the management
+    command echoes it; the upload view's caller polls the job row instead).
+    """
+    job = AIIngestJob.objects.get(pk=job_id)
+    job.status = AIIngestJob.Status.RUNNING
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        model = embedding_model()
+        pending = list(AIKnowledgeChunk.objects
+                       .filter(pk__in=job.chunk_ids)
+                       .exclude(embedding__isnull=False, embedding_model=model)
+                       .order_by('chunk_index').values_list('pk', flat=True))
+        # Chunks that came with a cached vector, or were embedded by an
+        # earlier, interrupted run of this job.
+        reused = len(job.chunk_ids) - len(pending)
+        if pending and embedder is None:
+            from .services import GeminiService, NoApiKey
+            try:
+                embedder = GeminiService.from_settings()
+            except NoApiKey:
+                return finish_text_only(job, 'No Gemini key — chunks saved as text only.')
+
+        done = failed = 0
+
+        def progress(batch_done, batch_failed):
+            job.embedded, job.failed = reused + done + batch_done, failed + batch_failed
+            job.save(update_fields=['embedded', 'failed', 'updated_at'])
+            if on_progress:
+                on_progress(job.embedded, job.failed)
+
+        # One slice of rows in memory at a time; embed_batch batches requests itself.
+        for start in range(0, len(pending), BULK_BATCH_SIZE):
+            chunks = list(AIKnowledgeChunk.objects
+                          .filter(pk__in=pending[start:start + BULK_BATCH_SIZE])
+                          .order_by('chunk_index'))
+            vectors = embed_texts(embedder, [c.content for c in chunks], on_progress=progress)
+            embedded = []
+            for chunk, vector in zip(chunks, vectors):
+                if vector:
+                    chunk.embedding, chunk.embedding_model = vector, model
+                    embedded.append(chunk)
+            AIKnowledgeChunk.objects.bulk_update(embedded, ['embedding', 'embedding_model'],
+                                                 batch_size=BULK_BATCH_SIZE)
+            done += len(embedded)
+            failed += len(chunks) - len(embedded)
+        if pending:
+            bump_kb_version()   # bulk_update skips post_save
+
+        job.embedded, job.failed = reused + done, failed
+        job.status = AIIngestJob.Status.DONE
+    except Exception as e:  # noqa: BLE001 — surface on the job, not in a dead thread
+        logger.exception("Ingest job %s failed", job_id)
+        job.status = AIIngestJob.Status.FAILED
+        job.error = f'{type(e).__name__}: {e}'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'embedded', 'failed', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def finish_text_only(job: AIIngestJob, note: str) -> AIIngestJob:
+    """Close a job whose chunks stay without vectors; `note` says why."""
+    job.status = AIIngestJob.Status.DONE
+    job.error = note
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def stale_chunks():
+    """Chunks with a vector from another model than EMBEDDING_MODEL."""
+    return (AIKnowledgeChunk.objects.filter(embedding__isnull=False)
+            .exclude(embedding_model=embedding_model()))
+
+
+def reembed_job(user=None) -> Optional[AIIngestJob]:
+    """A QUEUED job covering every stale chunk, or None when there is none.
+    The old vectors stay until each batch replaces them; retrieval skips them
+    meanwhile (lexical matches still find those chunks)."""
+    ids = [str(pk) for pk in stale_chunks().order_by('source_name', 'chunk_index')
+           .values_list('pk', flat=True)]
+    if not ids:
+        return None
+    return AIIngestJob.objects.create(
+        source_name=f're-embed → {embedding_model()}',
+        total=len(ids),
+        chunk_ids=ids,
+        created_by=user,
+    )
+
+
+def start_job(job: AIIngestJob) -> None:
+    """Run the job on a daemon thread once the chunk rows are committed."""
+    jobs.start(run_job, job, 'ai-ingest')
@@ -0,0 +1,303 @@
+"""V-Agent store insights: generated off the request path, served from a stored row.
+
+    get_insights(store)           -> (insights, generated_at)  (what VAInsightsView returns)
+    generate(store, service=None) -> AIStoreInsight             (gather + one Gemini call + save)
+    data_version(store)           -> str                        (cheap "did the data change?" key)
+
+Dashboard loads used to run ~7 aggregate queries plus a full Gemini generation
+for every user, every time. Now each store has one AIStoreInsight row:
+
+  * fresh (younger than TTL and same data_version) → returned as is;
+  * stale → still returned immediately, and ONE background regeneration is
+    started (a cache lock dedupes concurrent dashboard loads). A data change
+    younger than MIN_AGE doesn't count, so a busy till can't trigger an LLM
+    call per sale;
+  * missing → generated inline once (first load for a new store).
+
+`pregenerate_insights` refreshes every active store off-peak so most loads hit
+a fresh row.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import AIProfile, AISettings, AIStoreInsight
+
+logger = logging.getLogger(__name__)
+
+TTL     = timedelta(seconds=int(os.environ.get('AI_INSIGHTS_TTL', str(6 * 3600))))
+MIN_AGE = timedelta(seconds=int(os.environ.get('AI_INSIGHTS_MIN_AGE', str(30 * 60))))
+_LOCK_KEY = 'admin_ai:insights:gen:{}'
+_LOCK_TTL = 300   # seconds; a generation that takes longer than this may be repeated
+
+PROFILE_NAME = 'V-Agent'
+
+SYSTEM_PROMPT = """أنت V-Agent، مساعد ذكاء اصطناعي متخصص في تحليل بيانات المتاجر وإعطاء نصائح تجارية عملية ومفيدة.
+
+قواعد ثابتة:
+- تكلم بالعربية المصرية الواضحة مباشرةً لصاحب المتجر
+- كل نصيحة: عنوان قصير (5 كلمات أقصى) + 2-3 جمل عملية فقط
+- تنوع في النصائح في كل مرة، لا تكرر نفس النوع مرتين في نفس الرد
+- استند على الأرقام الحقيقية من البيانات المقدمة
+- أسلوب ودي، مشجع، ومباشر
+
+أنواع النصائح المتاحة (اختار 4 أنواع مختلفة في كل رد):
+• top_product — تحليل الأكثر مبيعاً وكيف تزيد الاستفادة منه
+• best_customer — أفضل العملاء وأفكار لمكافأتهم والاحتفاظ بهم
+• bundle_idea — اقتراح باقة أو عرض تجميعي بناءً على المنتجات
+• marketing — فكرة تسويقية مناسبة للمنتجات والموسم الحالي
+• stock_alert — تنبيه مخزون منخفض وأولوية الشراء
+• slow_mover — منتج راكد وطريقة ذكية لتصريفه
+• trend — مقارنة المبيعات واتجاه النمو أو التراجع
+
+رد بـ JSON فقط بدون أي نص خارجه — بالضبط 4 عناصر بهذا الشكل:
+[{"type":"top_product","title":"عنوان قصير","body":"النصيحة هنا"},{"type":"...","title":"...","body":"..."},...]"""
+
+
+def get_or_create_profile() -> AIProfile:
+    profile, _ = AIProfile.objects.get_or_create(
+        name=PROFILE_NAME,
+        defaults={
+            'is_active': False,
+            'system_instruction': SYSTEM_PROMPT,
+            'model_id': 'gemini-2.5-flash',
+            'temperature': 0.9,
+            'max_output_tokens': 1200,
+            'enabled_tools': [],
+            'global_knowledge': False,
+        },
+    )
+    return profile
+
+
+def data_version(store) -> str:
+    """Changes when sales or stock change (or the day rolls over), without the
+    full gather_context: the store's newest invoice change, one index lookup on
+    (store, updated_at), and its newest stock change, one (branch, updated_at)
+    lookup per branch."""
+    from core.models import Branch
+    from finance.models import SalesInvoice
+    from inventory.models import StockLevel
+
+    sales = SalesInvoice.all_objects.filter(store=store).aggregate(last=Max('updated_at'))
+    newest_stock = (StockLevel.objects.filter(branch=OuterRef('pk'))
+                    .order_by('-updated_at').values('updated_at')[:1])
+    stock = Branch.all_objects.filter(store=store).aggregate(last=Max(Subquery(newest_stock)))
+    raw = f"{timezone.localdate()}|{sales['last']}|{stock['last']}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def gather_context(store) -> str:
+    """The store's last-30-days snapshot the model writes insights from."""
+    from datetime import date, timedelta
+    from django.db.models import Count, F, Sum
+
+    from django.utils import timezone as tz
+    from finance.models import SalesInvoice, SalesInvoiceItem
+    from inventory.models import StockLevel, StorageStock
+    from users.models import Customer
+
+    now   = tz.now()
+    ago30 = now - timedelta(days=30)
+    ago60 = now - timedelta(days=60)
+
+    posted = SalesInvoice.Status.POSTED
+
+    top_products = list(
+        SalesInvoiceItem.objects
+        .filter(
+            invoice__store=store, invoice__status=posted,
+            invoice__date__gte=ago30,
+        )
+        .values('variant__product__name')
+        .annotate(qty=Sum('quantity'), rev=Sum(F('quantity') * F('unit_price')))
+        .order_by('-qty')[:6]
+    )
+
+    top_customers = list(
+        SalesInvoice.objects
+        .filter(
+            store=store, status=posted, date__gte=ago30,
+            is_deleted=False, customer__isnull=False,
+        )
+        .values('customer__name')
+        .annotate(spent=Sum('grand_total'), visits=Count('id'))
+        .order_by('-spent')[:4]
+    )
+
+    now_sales = SalesInvoice.objects.filter(
+        store=store, status=posted, date__gte=ago30, is_deleted=False,
+    ).aggregate(total=Sum('grand_total'), cnt=Count('id'))
+
+    prev_sales = SalesInvoice.objects.filter(
+        store=store, status=posted,
+        date__gte=ago60, date__lt=ago30, is_deleted=False,
+    ).aggregate(total=Sum('grand_total'), cnt=Count('id'))
+
+    low_stock = list(
+        StockLevel.objects
+        .filter(
+            variant__product__store=store,
+            variant__is_deleted=False,
+            variant__reorder_level__gt=0,
+            quantity__lte=F('variant__reorder_level'),
+        )
+        .values('variant__product__name', 'quantity', 'variant__reorder_level')[:8]
+    )
+
+    storage_items = list(
+        StorageStock.objects
+        .filter(store=store, is_deleted=False, quantity_remaining__gt=0)
+        .values('variant__product__name')
+        .annotate(total=Sum('quantity_remaining'))
+        .order_by('-total')[:5]
+    )
+
+    customer_count = Customer.objects.filter(store=store, is_deleted=False).count()
+
+    lines = [
+        f"اسم المتجر: {store.name}",
+        f"تاريخ اليوم: {now.strftime('%Y-%m-%d')}",
+        "",
+        "=== المبيعات آخر 30 يوم ===",
+        f"الإجمالي: {now_sales['total'] or 0:.2f}  |  الفواتير: {now_sales['cnt'] or 0}",
+        f"الفترة السابقة (60-30 يوم): {prev_sales['total'] or 0:.2f}  |  الفواتير: {prev_sales['cnt'] or 0}",
+        f"إجمالي العملاء: {customer_count}",
+        "",
+        "=== أكثر المنتجات مبيعاً ===",
+    ]
+    for p in top_products:
+        lines.append(f"- {p['variant__product__name']}: {p['qty']} قطعة، إيراد {p['rev']:.2f}")
+
+    lines += ["", "=== أفضل العملاء ==="]
+    if top_customers:
+        for c in top_customers:
+            lines.append(f"- {c['customer__name']}: {c['spent']:.2f} ({c['visits']} زيارة)")
+    else:
+        lines.append("لا توجد مبيعات بعملاء مسجلين في هذه الفترة")
+
+    lines += ["", "=== المخزون المنخفض ==="]
+    if low_stock:
+        for item in low_stock:
+            lines.append(f"- {item['variant__product__name']}: متاح {item['quantity']}، حد الطلب {item['variant__reorder_level']}")
+    else:
+        lines.append("لا توجد منتجات دون حد الطلب")
+
+    if storage_items:
+        lines += ["", "=== البضاعة في التخزين ==="]
+        for s in storage_items:
+            lines.append(f"- {s['variant__product__name']}: {s['total']} قطعة")
+
+    return "\n".join(lines)
+
+
+def _parse(raw: str) -> list:
+    raw = raw or '[]'
+    # Strip markdown fences if present
+    if raw.strip().startswith('```'):
+        raw = raw.strip().lstrip('`').split('\n', 1)[-1].rsplit('```', 1)[0]
+
+    insights = json.loads(raw)
+    if not isinstance(insights, list):
+        raise ValueError("unexpected shape")
+
+    # Normalise and cap at 4
+    return [
+        {
+            'type': str(item.get('type', 'insight')),
+            'title': str(item.get('title', '')),
+            'body': str(item.get('body', '')),
+        }
+        for item in insights[:4]
+        if item.get('title') and item.get('body')
+    ]
+
+
+def generate(store, service=None) -> AIStoreInsight:
+    """Gather the store snapshot, ask Gemini for 4 insights, store them.
+    Raises NoApiKey / GeminiError / ValueError on failure."""
+    from google import genai as _genai
+    from .services import GeminiService
+
+    if service is None:
+        service = GeminiService(AISettings.load().gemini_api_key)
+    version = data_version(store)
+    profile = get_or_create_profile()
+    store_context = gather_context(store)
+
+    user_prompt = (
+        f"بناءً على بيانات المتجر التالية، قدم 4 نصائح تجارية متنوعة ومفيدة:\n\n"
+        f"{store_context}\n\n"
+        f"تذكر: رد بـ JSON فقط كما هو محدد، 4 عناصر، أنواع مختلفة."
+    )
+    model_id = profile.model_id or 'gemini-2.5-flash'
+    response = service.client.models.generate_content(
+        model=model_id,
+        contents=user_prompt,
+        config=_genai.types.GenerateContentConfig(
+            system_instruction=profile.system_instruction or SYSTEM_PROMPT,
+            temperature=profile.temperature if profile.temperature is not None else 0.9,
+            max_output_tokens=profile.max_output_tokens or 1200,
+            response_mime_type='application/json',
+        ),
+    )
+    row, _ = AIStoreInsight.objects.update_or_create(
+        store=store,
+        defaults={
+            'insights': _parse(response.text),
+            'data_version': version,
+            'model_id': model_id,
+            'generated_at': timezone.now(),
+        },
+    )
+    return row
+
+
+def is_stale(row: AIStoreInsight, version: str = None, now=None) -> bool:
+    now = now or timezone.now()
+    age = now - row.generated_at
+    if age >= TTL:
+        return True
+    return age >= MIN_AGE and version is not None and version != row.data_version
+
+
+def _refresh(store_id):
+    from core.models import Store
+    try:
+        generate(Store.all_objects.get(pk=store_id))
+    except Exception:  # noqa: BLE001 — the stale row keeps being served
+        logger.exception("V-Agent background refresh failed for store %s", store_id)
+    finally:
+        cache.delete(_LOCK_KEY.format(store_id))
+        connections.close_all()
+
+
+def refresh_in_background(store) -> bool:
+    """Start one regeneration thread per store; False if one is already running."""
+    try:
+        if not cache.add(_LOCK_KEY.format(store.pk), 1, _LOCK_TTL):
+            return False
+    except Exception:
+        return False
+    threading.Thread(target=_refresh, args=(store.pk,), daemon=True,
+                     name=f'vagent-{store.pk}').start()
+    return True
+
+
+def get_insights(store):
+    """(insights, generated_at) for the widget. Blocks on Gemini only when the
+    store has never had insights generated."""
+    row = AIStoreInsight.objects.filter(store=store).first()
+    if row is None:
+        row = generate(store)
+    elif is_stale(row, data_version(store)):
+        refresh_in_background(store)
+    return row.insights, row.generated_at
@@ -3,19 +3,24 @@ Ingest the ERP usage catalog into AIKnowledgeChunk with Gemini embeddings.
 
 Usage:
     python manage.py ingest_erp_catalog
-    python manage.py ingest_erp_catalog --force   # re-ingest even if chunks exist
+    python manage.py ingest_erp_catalog --force   # re-sync even if chunks exist
     python manage.py ingest_erp_catalog --no-embed # skip embeddings (text-only)
 
 The source file is .claude/docs/erp-catalog.md in the monorepo root.
 Splits on '## ' headings — each heading becomes one chunk.
+
+--force syncs the KB with the file instead of wiping it: unchanged sections
+keep their chunks and vectors, removed ones are deleted, and only new or
+edited sections are embedded (vectors already in AIEmbeddingCache are reused).
 """
 import os
-import time
 
 from django.core.management.base import BaseCommand
 
-from admin_ai.models import AIKnowledgeChunk, AISettings
-from admin_ai.services import GeminiService, GeminiError
+from admin_ai import ingest
+from core import jobs
+from admin_ai.models import AIIngestJob, AIKnowledgeChunk, AISettings
+from admin_ai.services import GeminiService
 
 SOURCE_NAME = "erp-catalog.md"
 INDUSTRIES  = ["retail", "erp", "vendorya"]
@@ -57,7 +62,7 @@ class Command(BaseCommand):
     help = "Ingest the ERP catalog into the AI knowledge base."
 
     def add_arguments(self, parser):
-        parser.add_argument("--force",    action="store_true", help="Re-ingest even if chunks already exist.")
+        parser.add_argument("--force",    action="store_true", help="Re-sync even if chunks already exist.")
         parser.add_argument("--no-embed", action="store_true", help="Skip embedding generation.")
 
     def handle(self, *args, **options):
@@ -69,48 +74,56 @@ class Command(BaseCommand):
         existing = AIKnowledgeChunk.objects.filter(source_name=SOURCE_NAME, is_deleted=False).count()
         if existing and not options["force"]:
             self.stdout.write(self.style.WARNING(
-                f"{existing} chunks already in KB. Use --force to re-ingest."
+                f"{existing} chunks already in KB. Use --force to re-sync."
             ))
             return
 
-        if options["force"] and existing:
-            AIKnowledgeChunk.objects.filter(source_name=SOURCE_NAME).delete()
-            self.stdout.write(f"Removed {existing} old chunks.")
-
         text = open(catalog_path, encoding="utf-8").read()
         sections = _split_catalog(text)
         self.stdout.write(f"Found {len(sections)} sections in catalog.")
 
-        service = None
-        if not options["no_embed"]:
-            settings_obj = AISettings.load()
-            if settings_obj.has_key:
-                service = GeminiService(settings_obj.gemini_api_key)
-                self.stdout.write("Gemini embedding enabled.")
-            else:
-                self.stdout.write(self.style.WARNING("No Gemini key — saving text only (no embeddings)."))
-
-        for idx, heading, content in sections:
-            chunk = AIKnowledgeChunk.objects.create(
-                source_name=SOURCE_NAME,
-                source_type="manual",
-                chunk_index=idx,
-                content=f"# {heading}\n\n{content}",
-                industries=INDUSTRIES,
-                metadata={"heading": heading},
-            )
-
-            if service:
-                try:
-                    chunk.embedding = service.embed(chunk.content)
-                    chunk.save(update_fields=["embedding"])
-                    self.stdout.write(f"  [{idx:02d}] {heading} — embedded ✓")
-                except GeminiError as e:
-                    self.stdout.write(self.style.WARNING(f"  [{idx:02d}] {heading} — embed failed: {e}"))
-                time.sleep(0.3)  # stay within Gemini free-tier RPM
-            else:
-                self.stdout.write(f"  [{idx:02d}] {heading} — saved (no embed)")
+        job = ingest.create_job(
+            SOURCE_NAME,
+            [f"# {heading}\n\n{content}" for _, heading, content in sections],
+            source_type="manual",
+            industries=INDUSTRIES,
+            metadata=[{"heading": heading} for _, heading, _ in sections],
+            replace=True,
+        )
+        if existing:
+            kept = job.skipped
+            self.stdout.write(f"{kept} unchanged sections kept, {existing - kept} removed, "
+                              f"{job.total} new or changed.")
+
+        if options["no_embed"]:
+            ingest.finish_text_only(job, "Embedding skipped (--no-embed) — chunks saved as text only.")
+            self.stdout.write(self.style.SUCCESS(
+                f"\nDone. {job.total} chunks saved (no embeddings) from '{SOURCE_NAME}'."
+            ))
+            return
 
+        settings_obj = AISettings.load()
+        if not settings_obj.has_key:
+            ingest.finish_text_only(job, "No Gemini key — chunks saved as text only.")
+            self.stdout.write(self.style.WARNING("No Gemini key — saving text only (no embeddings)."))
+            return
+
+        service = GeminiService(settings_obj.gemini_api_key)
+        self.stdout.write(f"Embedding {job.total - job.embedded} chunks in batches "
+                          f"({job.embedded} from the embedding cache)…")
+
+        def report(done, failed):
+            self.stdout.write(f"  {done + failed}/{job.total} (failed {failed})")
+
+        try:
+            job = ingest.run_job(job.pk, embedder=service, on_progress=report)
+        except KeyboardInterrupt:
+            jobs.mark_failed(job, "Interrupted — run ingest_erp_catalog --force again to finish.")
+            raise
+        if job.status != AIIngestJob.Status.DONE:
+            self.stderr.write(self.style.ERROR(f"Embedding failed: {job.error}"))
+            return
         self.stdout.write(self.style.SUCCESS(
-            f"\nDone. {len(sections)} chunks ingested into KB from '{SOURCE_NAME}'."
+            f"\nDone. {job.total} chunks ingested into KB from '{SOURCE_NAME}' "
+            f"({job.embedded} embedded, {job.failed} failed)."
         ))
@@ -0,0 +1,83 @@
+"""Throughput and peak memory of the KB upload chunker.
+
+Runs chunking.chunk_file over each file given, or over synthetic text and CSV
+uploads of --size MB (the upload cap is 10 MB), and reports MB/s, chunks,
+average chunk size in estimated tokens, and the peak Python heap allocation
+seen by tracemalloc. Peak memory should stay roughly flat as --size grows;
+nothing is written to the database.
+
+    manage.py kb_chunk_benchmark
+    manage.py kb_chunk_benchmark --size 10 manual.pdf price-list.csv
+"""
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_ai import chunking
+from admin_ai.history import estimate_tokens
+
+
+def _synthetic(directory, size_mb):
+    paths = []
+    text_path = os.path.join(directory, 'synthetic.txt')
+    with open(text_path, 'w', encoding='utf-8') as fh:
+        section = 0
+        while fh.tell() < size_mb * 1024 * 1024:
+            section += 1
+            fh.write(f'# Section {section}\n\n')
+            for para in range(8):
+                fh.write(' '.join(f'Rule {section}.{para}.{s} applies to returns and stock.'
+                                  for s in range(12 + para * 6)) + '\n\n')
+    paths.append(text_path)
+
+    csv_path = os.path.join(directory, 'synthetic.csv')
+    with open(csv_path, 'w', encoding='utf-8') as fh:
+        fh.write('sku,name,category,price,reorder_level\n')
+        row = 0
+        while fh.tell() < size_mb * 1024 * 1024:
+            row += 1
+            fh.write(f'SKU-{row:07d},Product {row} منتج,Category {row % 40},{row % 500}.25,{row % 20}\n')
+    paths.append(csv_path)
+    return paths
+
+
+class Command(BaseCommand):
+    help = "Benchmark the streaming KB chunker: throughput and peak memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Files to chunk (default: synthetic).')
+        parser.add_argument('--size', type=int, default=10, help='Synthetic file size in MB.')
+        parser.add_argument('--max-tokens', type=int, default=chunking.CHUNK_TOKENS)
+        parser.add_argument('--overlap', type=int, default=chunking.CHUNK_OVERLAP_TOKENS)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = options['files'] or _synthetic(tmp, options['size'])
+            for path in paths:
+                if not os.path.exists(path):
+                    raise CommandError(f'No such file: {path}')
+                self._run(path, options['max_tokens'], options['overlap'])
+
+    def _run(self, path, max_tokens, overlap):
+        size = os.path.getsize(path)
+        tokens = []
+        with open(path, 'rb') as fh:
+            upload = File(fh, name=os.path.basename(path))
+            tracemalloc.start()
+            started = time.perf_counter()
+            for content, _ in chunking.chunk_file(upload, max_tokens, overlap):
+                tokens.append(estimate_tokens(content))
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        mb = size / (1024 * 1024)
+        self.stdout.write(
+            f"{os.path.basename(path):24} {mb:6.2f} MB  {mb / elapsed if elapsed else 0:6.2f} MB/s  "
+            f"{len(tokens):6} chunks  avg {statistics.mean(tokens) if tokens else 0:5.0f} tok  "
+            f"max {max(tokens, default=0):4} tok  peak heap {peak / (1024 * 1024):6.2f} MB"
+        )
@@ -0,0 +1,104 @@
+"""Offline recall / latency evaluation of KB retrieval on a fixed query set.
+
+Each line of the query file is JSON: {"query": "...", "expect": ["...", ...]}.
+A retrieved chunk is relevant when its content (or source name) contains one
+of the `expect` strings, case-insensitively; recall@k is the share of queries
+with at least one relevant chunk in the top k. Each query runs four ways:
+
+    vector   retrieval.nearest() under MAX_DISTANCE — the old chat path
+    lexical  retrieval.lexical(), full-text only
+    hybrid   retrieval.hybrid(), both arms fused with RRF in one statement
+    chat     what kb_context does: lexical shortcut, else hybrid
+
+Query embeddings are fetched once up front (needs the Gemini key) and are not
+part of the timings; the `chat` row reports how many queries skipped the
+embedding call altogether.
+
+    manage.py kb_eval
+    manage.py kb_eval --k 8 --industry pharmacy --verbose
+"""
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_ai import retrieval
+from admin_ai.models import AIKnowledgeChunk
+from admin_ai.services import GeminiError, GeminiService, NoApiKey
+
+_DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks',
+                                'kb_eval.jsonl')
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    ids = fn()
+    return ids, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = "Evaluate KB retrieval (vector / lexical / hybrid) on a fixed query set."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', default=_DEFAULT_QUERIES, help='JSONL query set.')
+        parser.add_argument('--k', type=int, default=4)
+        parser.add_argument('--industry', action='append', default=[],
+                            help='Industry tag to filter on (repeatable). Omit for the whole KB.')
+        parser.add_argument('--verbose', action='store_true', help='Print every query.')
+
+    def handle(self, *args, **options):
+        with open(options['queries'], encoding='utf-8') as fh:
+            cases = [json.loads(line) for line in fh if line.strip()]
+        if not cases:
+            raise CommandError('Query set is empty.')
+        k, industries = options['k'], options['industry'] or None
+        try:
+            service = GeminiService.from_settings()
+            vectors = [service.embed(case['query']) for case in cases]
+        except (NoApiKey, GeminiError) as e:
+            raise CommandError(f'Could not embed the query set: {e}')
+
+        runs = {
+            'vector': lambda q, v: [pk for pk, d in retrieval.nearest(v, k, industries)
+                                    if d < retrieval.MAX_DISTANCE],
+            'lexical': lambda q, v: [pk for pk, _ in retrieval.lexical(q, k, industries)],
+            'hybrid': lambda q, v: [h.id for h in retrieval.hybrid(q, v, k, industries)],
+            'chat': lambda q, v: (retrieval.lexical_shortcut(q, k, industries)
+                                  or [h.id for h in retrieval.hybrid(q, v, k, industries)]),
+        }
+        results = {name: [] for name in runs}
+        shortcuts = 0
+        for case, vector in zip(cases, vectors):
+            for name, run in runs.items():
+                results[name].append(_timed(lambda: run(case['query'], vector)))
+            shortcuts += bool(retrieval.lexical_shortcut(case['query'], k, industries))
+
+        ids = {pk for rows in results.values() for found, _ in rows for pk in found}
+        text = {str(pk): f'{source}\n{content}'.lower() for pk, source, content in
+                AIKnowledgeChunk.objects.filter(pk__in=ids)
+                .values_list('pk', 'source_name', 'content')}
+
+        def relevant(case, found):
+            expect = [e.lower() for e in case['expect']]
+            return any(e in text.get(pk, '') for pk in found for e in expect)
+
+        scope = ', '.join(industries) if industries else 'whole KB'
+        self.stdout.write(f"{len(cases)} queries, k={k}, scope: {scope}")
+        for name, rows in results.items():
+            latencies = sorted(ms for _, ms in rows)
+            recall = statistics.mean(relevant(c, found) for c, (found, _) in zip(cases, rows))
+            empty = sum(not found for found, _ in rows)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            line = (f"  {name:7} recall@{k} {recall:6.3f}   empty {empty:3}   "
+                    f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+            if name == 'chat':
+                line += f"   embedding skipped {shortcuts}/{len(cases)}"
+            self.stdout.write(line)
+
+        if options['verbose']:
+            for i, case in enumerate(cases):
+                marks = ' '.join(f"{name}={'✓' if relevant(case, results[name][i][0]) else '·'}"
+                                 for name in runs)
+                self.stdout.write(f"  {marks}  {case['query']}")
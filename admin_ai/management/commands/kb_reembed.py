@@ -0,0 +1,59 @@
+"""Re-embed KB chunks whose vectors came from another embedding model.
+
+After AI_EMBEDDING_MODEL changes, retrieval ignores vectors of the old model
+(lexical matches still find those chunks). This runs ingest.reembed_job in the
+foreground, batch by batch; vectors already in AIEmbeddingCache for the new
+model cost no API call. It can be stopped and run again — finished batches
+are not repeated; the stopped run's job is marked FAILED. POST
+/api/admin/ai/kb/reembed/ does the same on a background thread; a run cut
+short there by a restart is finished by `manage.py recover_jobs`.
+
+    manage.py kb_reembed --dry-run
+    manage.py kb_reembed
+    manage.py kb_reembed --prune-cache     # then drop other models' cache rows
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_ai import ingest
+from admin_ai.models import AIEmbeddingCache, AIIngestJob
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Re-embed knowledge-base chunks embedded with another model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count stale chunks.')
+        parser.add_argument('--prune-cache', action='store_true',
+                            help="Delete embedding-cache rows of other models afterwards.")
+
+    def handle(self, *args, **options):
+        model = ingest.embedding_model()
+        stale = ingest.stale_chunks().count()
+        self.stdout.write(f"{stale} chunks embedded with another model than {model}.")
+        if options['dry_run']:
+            return
+
+        if stale:
+            job = ingest.reembed_job()
+
+            def report(done, failed):
+                self.stdout.write(f"  {done + failed}/{job.total} (failed {failed})")
+
+            try:
+                job = ingest.run_job(job.pk, on_progress=report)
+            except KeyboardInterrupt:
+                jobs.mark_failed(job, "Interrupted — run kb_reembed again to finish.")
+                raise
+            if job.status != AIIngestJob.Status.DONE:
+                raise CommandError(f"Re-embedding failed: {job.error}")
+            if job.error:
+                raise CommandError(job.error)
+            self.stdout.write(self.style.SUCCESS(
+                f"Re-embedded {job.embedded} chunks ({job.failed} failed)."))
+
+        if options['prune_cache']:
+            if ingest.stale_chunks().exists():
+                raise CommandError("Some chunks are still stale; not pruning the cache.")
+            deleted, _ = AIEmbeddingCache.objects.exclude(model=model).delete()
+            self.stdout.write(f"Pruned {deleted} cache rows of other models.")
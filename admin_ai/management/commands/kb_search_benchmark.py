@@ -0,0 +1,95 @@
+"""Recall / latency of (industry-filtered) KB vector search vs exact search.
+
+Query vectors are sampled from stored chunk embeddings, so no Gemini key is
+needed. Each query runs three ways:
+
+    exact   index scans disabled — a sequential scan, the ground truth
+    ann     retrieval.nearest(): HNSW + iterative scan, ef_search = AI_KB_EF_SEARCH
+    legacy  HNSW at pgvector's default ef_search (40), no iterative scan —
+            what filtered retrieval did before
+
+and the report gives recall@k against exact, how many queries came back with
+fewer than k rows, and p50 / p95 latency.
+
+    manage.py kb_search_benchmark --industry pharmacy
+    manage.py kb_search_benchmark --queries 100 --k 8 --ef-search 200
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from pgvector.django import CosineDistance
+
+from admin_ai import retrieval
+from admin_ai.models import AIKnowledgeChunk
+from admin_ai.services import EMBEDDING_MODEL
+
+
+def _ranked(vector, k, industries, settings):
+    qs = AIKnowledgeChunk.objects.filter(is_deleted=False, embedding__isnull=False,
+                                         embedding_model=EMBEDDING_MODEL)
+    if industries:
+        qs = qs.filter(industries__overlap=industries)
+    qs = (qs.annotate(distance=CosineDistance('embedding', vector))
+          .order_by('distance').values_list('id', flat=True)[:k])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for statement in settings:
+                try:
+                    with transaction.atomic():
+                        cursor.execute(statement)
+                except DatabaseError:
+                    pass        # e.g. hnsw.iterative_scan on pgvector < 0.8
+        started = time.perf_counter()
+        ids = [str(pk) for pk in qs]
+        return ids, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark filtered KB vector search (HNSW) against exact search."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--industry', action='append', default=[],
+                            help='Industry tag to filter on (repeatable). Omit for the whole KB.')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--k', type=int, default=4)
+        parser.add_argument('--ef-search', type=int, default=retrieval.EF_SEARCH)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        k, industries = options['k'], options['industry'] or None
+        pool = list(AIKnowledgeChunk.objects
+                    .filter(is_deleted=False, embedding__isnull=False, embedding_model=EMBEDDING_MODEL)
+                    .values_list('embedding', flat=True)[:5000])
+        if not pool:
+            raise CommandError('No embedded chunks to sample queries from.')
+        random.Random(options['seed']).shuffle(pool)
+        queries = [list(v) for v in pool[:options['queries']]]
+
+        runs = {
+            'exact': ['SET LOCAL enable_indexscan = off'],
+            'ann': [f"SET LOCAL hnsw.ef_search = {max(options['ef_search'], k)}",
+                    "SET LOCAL hnsw.iterative_scan = 'relaxed_order'"],
+            'legacy': ['SET LOCAL hnsw.ef_search = 40', "SET LOCAL hnsw.iterative_scan = 'off'"],
+        }
+        results = {name: [] for name in runs}
+        for vector in queries:
+            for name, settings in runs.items():
+                results[name].append(_ranked(vector, k, industries, settings))
+
+        truth = [set(ids) for ids, _ in results['exact']]
+        scope = ', '.join(industries) if industries else 'whole KB'
+        self.stdout.write(f"{len(queries)} queries, k={k}, scope: {scope}, "
+                          f"{len(pool)} embedded chunks sampled")
+        for name, rows in results.items():
+            latencies = sorted(ms for _, ms in rows)
+            recall = statistics.mean(
+                len(set(ids) & want) / len(want) if want else 1.0
+                for (ids, _), want in zip(rows, truth)
+            )
+            short = sum(len(ids) < min(k, len(want)) for (ids, _), want in zip(rows, truth))
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(f"  {name:7} recall@{k} {recall:6.3f}   short results {short:3}   "
+                              f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
@@ -0,0 +1,59 @@
+"""Pre-generate V-Agent insights for every active store (run off-peak, e.g. nightly cron).
+
+Stores whose stored insights are still fresh (see admin_ai.insights.is_stale)
+are skipped unless --force. Generation runs on --workers threads — each store is
+a few aggregate queries plus one Gemini call, so the work is network-bound.
+
+    python manage.py pregenerate_insights
+    python manage.py pregenerate_insights --workers 2 --force
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from admin_ai import insights
+from admin_ai.models import AISettings, AIStoreInsight
+from admin_ai.services import GeminiService
+from core.models import Store
+
+
+def _generate(store_id, service):
+    try:
+        insights.generate(Store.all_objects.get(pk=store_id), service=service)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Pre-generate V-Agent insights for all active stores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Stores generated concurrently.')
+        parser.add_argument('--force', action='store_true', help='Regenerate even fresh insights.')
+
+    def handle(self, *args, **options):
+        settings_row = AISettings.load()
+        if not settings_row.has_key:
+            raise CommandError('No Gemini key configured.')
+        service = GeminiService(settings_row.gemini_api_key)
+
+        stores = list(Store.objects.filter(is_active=True).order_by('name'))
+        rows = {r.store_id: r for r in AIStoreInsight.objects.filter(store__in=stores)}
+        due = [s for s in stores
+               if options['force'] or s.pk not in rows
+               or insights.is_stale(rows[s.pk], insights.data_version(s))]
+        self.stdout.write(f"{len(due)}/{len(stores)} active stores need insights.")
+
+        ok = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(_generate, s.pk, service): s for s in due}
+            for future in as_completed(futures):
+                store = futures[future]
+                try:
+                    future.result()
+                    ok += 1
+                except Exception as e:  # noqa: BLE001 — one store never stops the run
+                    failed += 1
+                    self.stderr.write(f"  {store.name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Done: {ok} generated, {failed} failed."))
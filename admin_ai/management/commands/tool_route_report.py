@@ -0,0 +1,64 @@
+"""Compare keyword vs semantic tool routing on a recorded prompt set.
+
+Each line of the prompt file is JSON: {"prompt": "..."}. For every prompt it
+computes the declared tool list the keyword router would send (all tools on no
+match) and the one route_tools sends now, and prints the average number of
+declared tools and estimated declaration input tokens for both.
+
+    manage.py tool_route_report
+    manage.py tool_route_report --prompts my_prompts.jsonl --verbose
+"""
+import json
+import os
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_ai import router
+from admin_ai.history import estimate_tokens
+from admin_ai.registry import registry
+from admin_ai.services import GeminiService, NoApiKey
+
+_DEFAULT_PROMPTS = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks',
+                                'route_prompts.jsonl')
+
+
+class Command(BaseCommand):
+    help = "Report declared tools / input tokens per prompt: keyword vs semantic routing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', default=_DEFAULT_PROMPTS, help='JSONL prompt set.')
+        parser.add_argument('--verbose', action='store_true', help='Print every prompt.')
+
+    def handle(self, *args, **options):
+        with open(options['prompts'], encoding='utf-8') as fh:
+            prompts = [json.loads(line)['prompt'] for line in fh if line.strip()]
+        if not prompts:
+            raise CommandError('Prompt set is empty.')
+        try:
+            service = GeminiService.from_settings()
+        except NoApiKey:
+            raise CommandError('Semantic routing needs the Gemini key (Misc settings page).')
+
+        rows = {'keyword': [], 'semantic': []}
+        fallbacks = 0
+        for prompt in prompts:
+            before = router.keyword_route(prompt)
+            after = router.semantic_route(service, prompt)
+            if after is None:
+                fallbacks += 1
+                after = before
+            for label, names in (('keyword', before), ('semantic', after)):
+                declarations = registry.declarations_for(names)
+                rows[label].append((len(declarations), estimate_tokens(declarations)))
+            if options['verbose']:
+                self.stdout.write(f"  {prompt[:50]:50}  {rows['keyword'][-1][0]:3} → "
+                                  f"{rows['semantic'][-1][0]:3} tools")
+
+        self.stdout.write(f"{len(prompts)} prompts, {len(registry.all())} registered tools.")
+        for label, data in rows.items():
+            tools = statistics.mean(n for n, _ in data)
+            tokens = statistics.mean(t for _, t in data)
+            self.stdout.write(f"  {label:9} avg {tools:5.1f} tools · ~{tokens:7.0f} declaration tokens")
+        self.stdout.write(self.style.SUCCESS(
+            f"Semantic router fell back to keywords on {fallbacks}/{len(prompts)} prompts."))
@@ -0,0 +1,208 @@
+"""Usage metering for chat turns: what each hop and each tool call cost.
+
+    HopClock                      -> times one Gemini call (first chunk, end, usage)
+    tool_metrics(result, ms, hop) -> {hop, duration_ms, rows, bytes, ok}
+    record(message, hops, tools)  -> AIUsageMetric rows next to the model message
+    summary(since)                -> aggregates for GET /api/admin/ai/usage/
+
+chat_stream yields an internal `hop` event after every Gemini call and puts a
+`metrics` dict on every `tool` event. The view keeps both in its _TurnLog and
+writes them with record() when the turn is stored, so "which tool is slow",
+"which tool floods the context" and "where do the tokens go" are answered from
+one small table instead of by replaying conversations.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from django.db.models import Aggregate, Avg, Count, FloatField, Max, Q, Sum
+from django.utils import timezone
+
+from .models import AIMessage, AIUsageMetric
+
+
+class Percentile(Aggregate):
+    """PERCENTILE_CONT(fraction) WITHIN GROUP (ORDER BY expr) — Postgres only."""
+    function = 'PERCENTILE_CONT'
+    name = 'Percentile'
+    output_field = FloatField()
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+class HopClock:
+    """Wall-clock and token usage of one streamed Gemini call."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.started = clock()
+        self.first_chunk: Optional[float] = None
+        self.usage = None
+
+    def chunk(self, chunk) -> None:
+        if self.first_chunk is None:
+            self.first_chunk = self._clock()
+        # Streamed chunks carry the call's running usage; the last one wins.
+        usage = getattr(chunk, 'usage_metadata', None)
+        if usage:
+            self.usage = usage
+
+    def event(self, hop: int, model_id: str, tool_calls: int) -> Dict[str, Any]:
+        now = self._clock()
+        return {
+            'event': 'hop',
+            'hop': hop,
+            'model': model_id,
+            'duration_ms': _ms(now - self.started),
+            'ttft_ms': _ms(self.first_chunk - self.started) if self.first_chunk is not None else None,
+            'input_tokens': getattr(self.usage, 'prompt_token_count', 0) or 0,
+            'output_tokens': getattr(self.usage, 'candidates_token_count', 0) or 0,
+            'tool_calls': tool_calls,
+        }
+
+
+def _ms(seconds: float) -> int:
+    return max(0, int(round(seconds * 1000)))
+
+
+def count_rows(data: Any) -> Optional[int]:
+    """Rows a tool returned: a list's length, or the longest list inside a dict
+    result ({'results': [...], 'count': n}). None for scalar results."""
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        lengths = [len(v) for v in data.values() if isinstance(v, list)]
+        return max(lengths) if lengths else None
+    return None
+
+
+def tool_metrics(result: Dict[str, Any], duration_ms: float, hop: int) -> Dict[str, Any]:
+    ok = isinstance(result, dict) and result.get('ok') is not False and 'error' not in result
+    data = result.get('data') if isinstance(result, dict) else result
+    return {
+        'hop': hop,
+        'duration_ms': int(round(duration_ms)),
+        'rows': count_rows(data),
+        'bytes': len(json.dumps(result, default=str).encode()),
+        'ok': ok,
+    }
+
+
+def record(message: AIMessage, hops: List[Dict[str, Any]],
+           tools: List[Dict[str, Any]]) -> List[AIUsageMetric]:
+    """Store one turn's hop events and metered tool events against `message`."""
+    rows = [
+        AIUsageMetric(
+            message=message, kind=AIUsageMetric.Kind.HOP, hop=h.get('hop', 0),
+            name=(h.get('model') or '')[:100], duration_ms=h.get('duration_ms') or 0,
+            ttft_ms=h.get('ttft_ms'), input_tokens=h.get('input_tokens') or 0,
+            output_tokens=h.get('output_tokens') or 0,
+        )
+        for h in hops
+    ]
+    for ev in tools:
+        m = ev.get('metrics')
+        if not m:
+            continue
+        rows.append(AIUsageMetric(
+            message=message, kind=AIUsageMetric.Kind.TOOL, hop=m.get('hop', 0),
+            name=(ev.get('name') or '')[:100], ok=m.get('ok', True),
+            duration_ms=m.get('duration_ms') or 0, rows=m.get('rows'),
+            payload_bytes=m.get('bytes'),
+        ))
+    return AIUsageMetric.objects.bulk_create(rows) if rows else []
+
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
+
+def summary(since, top: int = 10) -> Dict[str, Any]:
+    """Hop / tool aggregates for metrics created at or after `since`."""
+    qs = AIUsageMetric.objects.filter(created_at__gte=since)
+    hops = qs.filter(kind=AIUsageMetric.Kind.HOP)
+    tools = qs.filter(kind=AIUsageMetric.Kind.TOOL)
+
+    totals = hops.aggregate(
+        turns=Count('message', distinct=True),
+        hops=Count('id'),
+        input_tokens=Sum('input_tokens'),
+        output_tokens=Sum('output_tokens'),
+        avg_ms=Avg('duration_ms'),
+        p95_ms=Percentile('duration_ms', 0.95),
+        avg_ttft_ms=Avg('ttft_ms'),
+        p95_ttft_ms=Percentile('ttft_ms', 0.95),
+    )
+    tool_calls = tools.count()
+
+    by_model = [{
+        'model': r['name'],
+        'hops': r['hops'],
+        'input_tokens': r['input_tokens'] or 0,
+        'output_tokens': r['output_tokens'] or 0,
+        'avg_ms': _round(r['avg_ms']),
+        'p95_ms': _round(r['p95_ms']),
+        'avg_ttft_ms': _round(r['avg_ttft_ms']),
+    } for r in hops.values('name').annotate(
+        hops=Count('id'),
+        input_tokens=Sum('input_tokens'),
+        output_tokens=Sum('output_tokens'),
+        avg_ms=Avg('duration_ms'),
+        p95_ms=Percentile('duration_ms', 0.95),
+        avg_ttft_ms=Avg('ttft_ms'),
+    ).order_by('-input_tokens')]
+
+    by_tool = [{
+        'tool': r['name'],
+        'calls': r['calls'],
+        'errors': r['errors'],
+        'total_ms': r['total_ms'] or 0,
+        'avg_ms': _round(r['avg_ms']),
+        'p95_ms': _round(r['p95_ms']),
+        'avg_rows': _round(r['avg_rows']),
+        'avg_bytes': _round(r['avg_bytes'], 0),
+        'max_bytes': r['max_bytes'],
+    } for r in tools.values('name').annotate(
+        calls=Count('id'),
+        errors=Count('id', filter=Q(ok=False)),
+        total_ms=Sum('duration_ms'),
+        avg_ms=Avg('duration_ms'),
+        p95_ms=Percentile('duration_ms', 0.95),
+        avg_rows=Avg('rows'),
+        avg_bytes=Avg('payload_bytes'),
+        max_bytes=Max('payload_bytes'),
+    ).order_by('-total_ms')]
+
+    heaviest = [{
+        'message_id': str(r['message_id']),
+        'conversation_id': str(r['message__conversation_id']),
+        'title': r['message__conversation__title'],
+        'hops': r['hops'],
+        'input_tokens': r['input_tokens'] or 0,
+        'output_tokens': r['output_tokens'] or 0,
+    } for r in hops.values('message_id', 'message__conversation_id', 'message__conversation__title')
+        .annotate(hops=Count('id'), input_tokens=Sum('input_tokens'), output_tokens=Sum('output_tokens'))
+        .order_by('-input_tokens')[:top]]
+
+    return {
+        'turns': totals['turns'],
+        'hops': totals['hops'],
+        'tool_calls': tool_calls,
+        'tokens': {
+            'input': totals['input_tokens'] or 0,
+            'output': totals['output_tokens'] or 0,
+        },
+        'latency': {
+            'avg_ms': _round(totals['avg_ms']),
+            'p95_ms': _round(totals['p95_ms']),
+            'avg_ttft_ms': _round(totals['avg_ttft_ms']),
+            'p95_ttft_ms': _round(totals['p95_ttft_ms']),
+        },
+        'by_model': by_model,
+        'by_tool': by_tool,
+        'heaviest_turns': heaviest,
+        'since': since,
+        'as_of': timezone.now(),
+    }
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.5 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_ai', '0006_aiingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiconversation',
+            name='summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='aiconversation',
+            name='summarized_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.5 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_ai', '0007_aiconversation_summary'),
+        ('core', '0027_storesettings_lockscreen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIStoreInsight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('insights', models.JSONField(blank=True, default=list, help_text='[{type, title, body}, ...] as returned to the widget.')),
+                ('data_version', models.CharField(blank=True, default='', max_length=40)),
+                ('model_id', models.CharField(blank=True, default='', max_length=100)),
+                ('generated_at', models.DateTimeField()),
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ai_insight', to='core.store')),
+            ],
+            options={
+                'verbose_name': 'AI Store Insight',
+                'verbose_name_plural': 'AI Store Insights',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.5 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_ai', '0008_aistoreinsight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIUsageMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('HOP', 'Model call'), ('TOOL', 'Tool call')], max_length=4)),
+                ('hop', models.PositiveSmallIntegerField(default=0)),
+                ('name', models.CharField(max_length=100)),
+                ('ok', models.BooleanField(default=True)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('ttft_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('input_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('payload_bytes', models.PositiveIntegerField(blank=True, null=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='admin_ai.aimessage')),
+            ],
+            options={
+                'verbose_name': 'AI Usage Metric',
+                'verbose_name_plural': 'AI Usage Metrics',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='admin_ai_ai_kind_121d7f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.5 on 2026-10-18 12:10
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """AIKnowledgeChunk.industries: jsonb → text[] (+ GIN), and AIProfile.industries.
+
+    jsonb has no direct cast to an array, so the tags are copied through a
+    temporary column.
+    """
+
+    dependencies = [
+        ('admin_ai', '0009_aiusagemetric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiknowledgechunk',
+            name='industry_tags',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE admin_ai_aiknowledgechunk
+                   SET industry_tags = ARRAY(SELECT left(jsonb_array_elements_text(industries), 50))
+                 WHERE jsonb_typeof(industries) = 'array';
+            """,
+            reverse_sql="""
+                UPDATE admin_ai_aiknowledgechunk
+                   SET industries = to_jsonb(industry_tags);
+            """,
+        ),
+        migrations.RemoveField(
+            model_name='aiknowledgechunk',
+            name='industries',
+        ),
+        migrations.RenameField(
+            model_name='aiknowledgechunk',
+            old_name='industry_tags',
+            new_name='industries',
+        ),
+        migrations.AlterField(
+            model_name='aiknowledgechunk',
+            name='industries',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, help_text='List of industry tags for filtering. Empty = no industry filter.', size=None),
+        ),
+        migrations.AddIndex(
+            model_name='aiknowledgechunk',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['industries'], name='ai_kb_industries_gin'),
+        ),
+        migrations.AddField(
+            model_name='aiprofile',
+            name='industries',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, help_text="Industry tags this profile's RAG is limited to when global_knowledge is off.", size=None),
+        ),
+    ]
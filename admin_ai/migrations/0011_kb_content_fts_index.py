@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    GIN full-text index on AIKnowledgeChunk.content for the lexical arm of
+    hybrid KB retrieval (admin_ai.retrieval). The 'simple' configuration does
+    no stemming or stop words, so Arabic text, model numbers and setting names
+    are indexed as written. No model changes — the queries use the same
+    to_tsvector('simple', content) expression.
+    """
+
+    dependencies = [
+        ('admin_ai', '0010_industries_array'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE INDEX IF NOT EXISTS ai_kb_content_fts "
+                "ON admin_ai_aiknowledgechunk USING GIN (to_tsvector('simple', content));",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS ai_kb_content_fts;",
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.5 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """AIKnowledgeChunk.content_hash (backfilled in SQL) and AIIngestJob.skipped."""
+
+    dependencies = [
+        ('admin_ai', '0011_kb_content_fts_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiknowledgechunk',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='sha256 of the content.', max_length=64),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE admin_ai_aiknowledgechunk "
+                "SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex');",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='aiingestjob',
+            name='skipped',
+            field=models.PositiveIntegerField(default=0, help_text='Chunks already in this source (same content) that were not stored again.'),
+        ),
+    ]
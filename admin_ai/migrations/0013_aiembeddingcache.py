@@ -0,0 +1,51 @@
+# Generated by Django 6.0.5 on 2026-10-18 15:30
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """AIKnowledgeChunk.embedding_model and the AIEmbeddingCache table.
+
+    Every stored vector so far came from text-embedding-004; existing chunks are
+    stamped with it and seed the cache (one row per distinct content hash).
+    """
+
+    dependencies = [
+        ('admin_ai', '0012_chunk_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiknowledgechunk',
+            name='embedding_model',
+            field=models.CharField(blank=True, default='', help_text='Embedding model that produced `embedding`.', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='AIEmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.CharField(max_length=100)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=768)),
+            ],
+            options={
+                'verbose_name': 'AI Embedding Cache Entry',
+                'verbose_name_plural': 'AI Embedding Cache',
+                'constraints': [models.UniqueConstraint(fields=('model', 'content_hash'), name='ai_embedding_cache_key')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE admin_ai_aiknowledgechunk SET embedding_model = 'text-embedding-004' "
+                "WHERE embedding IS NOT NULL;",
+                "INSERT INTO admin_ai_aiembeddingcache (created_at, updated_at, model, content_hash, embedding) "
+                "SELECT DISTINCT ON (content_hash) now(), now(), 'text-embedding-004', content_hash, embedding "
+                "FROM admin_ai_aiknowledgechunk WHERE embedding IS NOT NULL AND content_hash <> '' "
+                "ORDER BY content_hash;",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -4,9 +4,12 @@ All AI infrastructure is platform-level (sudo-only). No per-tenant scoping
 on these tables — when a sudo user "Acts As" a store, that context is
 applied at the *tool* layer, not the persistence layer.
 """
+import hashlib
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -144,6 +147,8 @@ class AIProfile(TimestampedModel, SoftDeleteModel):
     global_knowledge = models.BooleanField(default=True,
         help_text=_("If True, RAG queries the entire knowledge base. "
                     "If False, only chunks tagged with this profile's industries."))
+    industries = ArrayField(models.CharField(max_length=50), default=list, blank=True,
+        help_text=_("Industry tags this profile's RAG is limited to when global_knowledge is off."))
 
     # Model + sampling
     model_id          = models.CharField(max_length=120, blank=True, default='',
@@ -201,6 +206,10 @@ class AIConversation(TimestampedModel, SoftDeleteModel):
                                      related_name='conversations')
     title        = models.CharField(max_length=200, blank=True, default='',
                                     help_text=_("Auto-set to first user message if blank."))
+    # Rolling summary of every message up to `summarized_until` (admin_ai.history).
+    # Those messages are no longer replayed to Gemini — the summary stands in.
+    summary          = models.TextField(blank=True, default='')
+    summarized_until = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-updated_at']
@@ -259,7 +268,14 @@ class AIKnowledgeChunk(TimestampedModel, SoftDeleteModel):
 
     `industries` is a list of tags (e.g. ["retail", "fashion"]); a profile
     with `global_knowledge=False` only sees chunks tagged with one of its
-    industries.
+    industries. It is a text[] with a GIN index so that filter is an indexed
+    `&&` (overlap) the planner can combine with the HNSW scan (admin_ai.retrieval).
+    `content` also has a GIN full-text index (migration 0011, raw SQL) for the
+    lexical half of hybrid retrieval. `content_hash` (sha256 of the content,
+    kept up to date by save(); bulk writers set it themselves) lets ingestion
+    skip chunks it already has and reuse embeddings of identical text from
+    AIEmbeddingCache. `embedding_model` is the model that produced `embedding`;
+    vector search only uses rows of the current one.
     """
 
     id           = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -270,11 +286,15 @@ class AIKnowledgeChunk(TimestampedModel, SoftDeleteModel):
     chunk_index  = models.PositiveIntegerField(default=0,
         help_text=_("Position of this chunk inside its source document."))
     content      = models.TextField()
-    industries   = models.JSONField(default=list, blank=True,
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True,
+        help_text=_("sha256 of the content."))
+    industries   = ArrayField(models.CharField(max_length=50), default=list, blank=True,
         help_text=_("List of industry tags for filtering. Empty = no industry filter."))
     metadata     = models.JSONField(default=dict, blank=True)
 
     embedding    = VectorField(dimensions=EMBEDDING_DIM, null=True, blank=True)
+    embedding_model = models.CharField(max_length=100, blank=True, default='',
+        help_text=_("Embedding model that produced `embedding`."))
 
     class Meta:
         verbose_name = _("AI Knowledge Chunk")
@@ -287,7 +307,148 @@ class AIKnowledgeChunk(TimestampedModel, SoftDeleteModel):
                 ef_construction=64,
                 opclasses=['vector_cosine_ops'],
             ),
+            GinIndex(name='ai_kb_industries_gin', fields=['industries']),
         ]
 
     def __str__(self):
         return f"{self.source_name}#{self.chunk_index}"
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_content(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class AIEmbeddingCache(TimestampedModel):
+    """Embedding of a piece of text under one model, keyed by (model, sha256).
+
+    Every vector admin_ai.ingest computes lands here, so re-ingesting text the
+    KB has seen before — an unchanged catalog section, a re-uploaded document,
+    the same paragraph in two files — costs no embedding call. Rows outlive the
+    chunks they came from; `kb_reembed --prune-cache` drops other models' rows.
+    """
+
+    model        = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64)
+    embedding    = VectorField(dimensions=EMBEDDING_DIM)
+
+    class Meta:
+        verbose_name = _("AI Embedding Cache Entry")
+        verbose_name_plural = _("AI Embedding Cache")
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'content_hash'], name='ai_embedding_cache_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.content_hash[:12]}"
+
+
+class AIIngestJob(TimestampedModel):
+    """Progress row for one knowledge-base ingestion (document upload / catalog).
+
+    Chunks are written up front; the job then embeds them in batches on a
+    background thread and counts progress here so the KB tab can poll it.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED  = 'QUEUED',  _('Queued')
+        RUNNING = 'RUNNING', _('Running')
+        DONE    = 'DONE',    _('Done')
+        FAILED  = 'FAILED',  _('Failed')
+
+    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source_name = models.CharField(max_length=255)
+    status      = models.CharField(max_length=10, choices=Status.choices,
+                                   default=Status.QUEUED, db_index=True)
+    total       = models.PositiveIntegerField(default=0)
+    embedded    = models.PositiveIntegerField(default=0)
+    failed      = models.PositiveIntegerField(default=0)
+    skipped     = models.PositiveIntegerField(default=0,
+        help_text=_("Chunks already in this source (same content) that were not stored again."))
+    chunk_ids   = models.JSONField(default=list, blank=True,
+        help_text=_("AIKnowledgeChunk ids this job embeds."))
+    error       = models.TextField(blank=True, default='')
+    created_by  = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                    null=True, blank=True, related_name='ai_ingest_jobs')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = _("AI Ingest Job")
+        verbose_name_plural = _("AI Ingest Jobs")
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.status == self.Status.DONE else 0.0
+        return round((self.embedded + self.failed) / self.total, 4)
+
+    def __str__(self):
+        return f"{self.source_name} ({self.status})"
+
+
+class AIStoreInsight(TimestampedModel):
+    """Latest V-Agent insights for one store (admin_ai.insights).
+
+    The dashboard widget reads this row; it is regenerated in the background
+    when older than the TTL or when `data_version` (sales / stock fingerprint)
+    has moved on.
+    """
+
+    store        = models.OneToOneField(Store, on_delete=models.CASCADE, related_name='ai_insight')
+    insights     = models.JSONField(default=list, blank=True,
+        help_text=_("[{type, title, body}, ...] as returned to the widget."))
+    data_version = models.CharField(max_length=40, blank=True, default='')
+    model_id     = models.CharField(max_length=100, blank=True, default='')
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _("AI Store Insight")
+        verbose_name_plural = _("AI Store Insights")
+
+    def __str__(self):
+        return f"Insights for {self.store_id} @ {self.generated_at:%Y-%m-%d %H:%M}"
+
+
+class AIUsageMetric(TimestampedModel):
+    """One metered step of a chat turn (admin_ai.metering), attached to the
+    model message it produced.
+
+    HOP rows are Gemini calls: `name` is the model id, `duration_ms` the full
+    streamed call, `ttft_ms` the wait for its first chunk, plus that call's
+    tokens. TOOL rows are tool calls: `name` is the tool, with rows returned
+    and the JSON size of the result fed back to the model.
+    """
+
+    class Kind(models.TextChoices):
+        HOP  = 'HOP',  _('Model call')
+        TOOL = 'TOOL', _('Tool call')
+
+    message       = models.ForeignKey(AIMessage, on_delete=models.CASCADE, related_name='metrics')
+    kind          = models.CharField(max_length=4, choices=Kind.choices)
+    hop           = models.PositiveSmallIntegerField(default=0)
+    name          = models.CharField(max_length=100)
+    ok            = models.BooleanField(default=True)
+    duration_ms   = models.PositiveIntegerField(default=0)
+    ttft_ms       = models.PositiveIntegerField(null=True, blank=True)
+    input_tokens  = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    rows          = models.PositiveIntegerField(null=True, blank=True)
+    payload_bytes = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = _("AI Usage Metric")
+        verbose_name_plural = _("AI Usage Metrics")
+        indexes = [
+            models.Index(fields=['kind', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.name} {self.duration_ms}ms"
@@ -89,11 +89,15 @@ class ToolRegistry:
 
     def __init__(self):
         self._tools: Dict[str, ToolSpec] = {}
+        # frozenset(names) → rendered declarations. Rendering re-sanitizes every
+        # schema, and the router asks for the same few sets all day.
+        self._declarations: Dict[frozenset, List[Dict[str, Any]]] = {}
 
     def register(self, spec: ToolSpec) -> None:
         if spec.name in self._tools:
             raise ValueError(f"Tool {spec.name!r} already registered.")
         self._tools[spec.name] = spec
+        self._declarations.clear()
 
     def get(self, name: str) -> Optional[ToolSpec]:
         return self._tools.get(name)
@@ -108,13 +112,16 @@ class ToolRegistry:
         """Gemini `function_declarations` payload, filtered by `names`.
 
         Empty / None `names` means "all registered" — matches AIProfile.enabled_tools
-        semantics where an empty list means no filter.
+        semantics where an empty list means no filter. Declarations come back in
+        registration order and are cached per name set; the list is a fresh copy
+        but its dicts are shared, so don't mutate them.
         """
-        if not names:
-            specs = self.all()
-        else:
-            specs = [self._tools[n] for n in names if n in self._tools]
-        return [s.as_gemini_declaration() for s in specs]
+        key = frozenset(names or ())
+        cached = self._declarations.get(key)
+        if cached is None:
+            specs = [s for s in self.all() if not key or s.name in key]
+            cached = self._declarations[key] = [s.as_gemini_declaration() for s in specs]
+        return list(cached)
 
     def invoke(self, name: str, args: Dict[str, Any], context: ToolContext) -> Any:
         """Run a registered tool with the given args + context.
@@ -0,0 +1,392 @@
+"""Knowledge-base retrieval for the chat path, with two in-process caches.
+
+    kb_context(service, prompt, top_k, industries)  -> str | None   (what AIChatView injects)
+    hybrid(text, vector, top_k, industries)         -> [Hit]  (lexical + vector, RRF-fused)
+    lexical(text, top_k, industries)                -> [(id, ts_rank)]  (full-text only)
+    nearest(vector, top_k, industries)              -> [(id, distance)]  (filtered ANN)
+    embed_prompt(service, prompt)                   -> list[float]  (cached prompt embedding)
+    bump_kb_version()                                               (invalidate retrieval results)
+
+Admins ask the same few things all day ("today's sales", "low stock?"), and
+each turn used to pay an exists() query plus a network embedding call before
+the first token. Now:
+
+  prompt LRU     normalized prompt → embedding. The embedding of a string never
+                 changes, so this only expires on TTL / LRU eviction.
+  retrieval LRU  (KB version, embedding digest, prompt, top_k, scope) → ranked
+                 chunk ids that survived fusion / the distance cut-off. Any AIKnowledgeChunk write bumps the
+                 KB version (signals + ingest bulk writes), orphaning every entry.
+
+The KB version lives in Django's default cache like search/cache.py's catalog
+version; with LocMemCache it is per process, same as the LRUs themselves.
+
+Industry-scoped search (a profile with global_knowledge=False) filters on the
+GIN-indexed `industries` array inside the HNSW scan. A plain filtered HNSW
+`ORDER BY distance LIMIT k` only filters the ef_search candidates it visited,
+so a selective tag silently returned fewer than k rows. With pgvector ≥ 0.8 the
+scan runs with `hnsw.iterative_scan = relaxed_order`: it keeps walking the
+graph until k rows pass the filter (bounded by hnsw.max_scan_tuples), and the
+few rows relaxed ordering may swap are re-sorted here. Older pgvector ignores
+the setting and falls back to a larger ef_search. `kb_search_benchmark`
+measures recall and latency of this path against exact search.
+
+Pure cosine distance misses exact terms — a model number, an Arabic product
+name, a setting name — that a lexical match finds at once, and over-matches
+vague prompts. Chat retrieval is hybrid: one SQL statement runs a full-text arm
+(GIN index on to_tsvector('simple', content), terms OR-ed, ranked by ts_rank_cd)
+and the HNSW arm side by side, each keeping its best CANDIDATES rows, and fuses
+them with Reciprocal Rank Fusion, score = Σ 1 / (RRF_K + rank). A chunk is kept
+if it matched lexically or is under MAX_DISTANCE. The 'simple' configuration
+does no stemming or stop words, so it behaves the same for English, Arabic and
+identifiers like "SKU-1042" or "decimal_places".
+
+Short prompts (≤ LEXICAL_SHORTCUT_TERMS terms) whose terms *all* occur in some
+chunk are answered from the lexical arm alone, skipping the embedding call.
+`kb_eval` measures recall@k and latency of the vector, lexical, hybrid and
+chat paths on a fixed query set.
+"""
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_SIZE    = int(os.environ.get('AI_PROMPT_CACHE_SIZE', '512'))
+PROMPT_CACHE_TTL     = int(os.environ.get('AI_PROMPT_CACHE_TTL', '3600'))
+RETRIEVAL_CACHE_SIZE = int(os.environ.get('AI_RETRIEVAL_CACHE_SIZE', '512'))
+RETRIEVAL_CACHE_TTL  = int(os.environ.get('AI_RETRIEVAL_CACHE_TTL', '300'))
+
+# Chunks at cosine distance ≥ this are noise (less than 50% similarity).
+MAX_DISTANCE = 0.5
+
+# HNSW candidate list for filtered scans (pgvector default 40).
+EF_SEARCH = int(os.environ.get('AI_KB_EF_SEARCH', '100'))
+
+# Hybrid search: rows each arm contributes to the fusion, and the RRF constant.
+CANDIDATES = int(os.environ.get('AI_KB_CANDIDATES', '20'))
+RRF_K = 60
+
+# Prompts of at most this many terms may skip the embedding call (0 = never).
+LEXICAL_SHORTCUT_TERMS = int(os.environ.get('AI_KB_LEXICAL_SHORTCUT_TERMS', '4'))
+
+_VERSION_KEY = 'admin_ai:kbver'
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL. `None` is never stored."""
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if value is None or self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': round(self.hits / total, 4) if total else None}
+
+
+prompt_cache = LRUCache(PROMPT_CACHE_SIZE, PROMPT_CACHE_TTL)
+retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+
+def normalize(prompt):
+    """Case- and whitespace-insensitive form of a prompt."""
+    return ' '.join((prompt or '').lower().split())
+
+
+def kb_version():
+    try:
+        cache.add(_VERSION_KEY, 1, None)
+        return cache.get(_VERSION_KEY, 1)
+    except Exception:
+        return 0
+
+
+def bump_kb_version():
+    """Invalidate every cached retrieval result. Never raises."""
+    try:
+        cache.add(_VERSION_KEY, 1, None)
+        cache.incr(_VERSION_KEY)
+    except Exception:
+        pass
+
+
+def _digest(vector):
+    return hashlib.sha1(struct.pack(f'{len(vector)}f', *vector)).hexdigest()
+
+
+def embed_prompt(service, prompt) -> List[float]:
+    """service.embed(prompt), served from the prompt LRU when possible."""
+    from .services import EMBEDDING_MODEL
+    key = (EMBEDDING_MODEL, normalize(prompt))
+    vector = prompt_cache.get(key)
+    if vector is None:
+        vector = service.embed(prompt)
+        prompt_cache.put(key, vector or None)
+    return vector
+
+
+_iterative_scan = None      # pgvector ≥ 0.8? Probed once per process.
+
+
+def _tune_hnsw(cursor, ef_search):
+    """SET LOCAL the scan parameters for the current transaction."""
+    global _iterative_scan
+    from django.db import DatabaseError, transaction
+    cursor.execute('SET LOCAL hnsw.ef_search = %s', [int(ef_search)])
+    if _iterative_scan is False:
+        return
+    try:
+        with transaction.atomic():      # savepoint: an unknown GUC must not abort the turn
+            cursor.execute("SET LOCAL hnsw.iterative_scan = 'relaxed_order'")
+        _iterative_scan = True
+    except DatabaseError as e:
+        if 'unrecognized configuration parameter' not in str(e):
+            # Transient (lock timeout, cancelled statement...): probe again next time.
+            logger.warning("Could not set hnsw.iterative_scan: %s", e)
+            return
+        _iterative_scan = False
+        logger.info("pgvector < 0.8: no hnsw.iterative_scan, filtered KB search uses ef_search only")
+
+
+def nearest(vector, top_k, industries=None, ef_search=None):
+    """[(chunk id, cosine distance)] of the top_k nearest chunks, best first.
+
+    `industries` (a non-empty list) restricts to chunks tagged with any of
+    them. The scan stays on the HNSW index either way; see the module notes.
+    Vectors of another embedding model than EMBEDDING_MODEL are not comparable
+    and are skipped until ingest.reembed_job has replaced them.
+    """
+    from django.db import connection, transaction
+    from pgvector.django import CosineDistance
+    from .models import AIKnowledgeChunk
+    from .services import EMBEDDING_MODEL
+
+    qs = AIKnowledgeChunk.objects.filter(is_deleted=False, embedding__isnull=False,
+                                         embedding_model=EMBEDDING_MODEL)
+    if industries:
+        qs = qs.filter(industries__overlap=list(industries))
+    qs = (qs.annotate(distance=CosineDistance('embedding', vector))
+          .order_by('distance')
+          .values_list('id', 'distance')[:top_k])
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _tune_hnsw(cursor, ef_search or max(EF_SEARCH, top_k))
+        rows = list(qs)
+    rows.sort(key=lambda r: r[1])       # relaxed_order may swap near-ties
+    return [(str(pk), distance) for pk, distance in rows]
+
+
+class Hit(NamedTuple):
+    id: str
+    score: float                    # RRF score
+    lexical_rank: Optional[int]     # 1-based, None = no term matched
+    distance: Optional[float]       # None = outside the vector arm's candidates
+
+
+def _vector_literal(vector) -> str:
+    return '[' + ','.join(repr(float(x)) for x in vector) + ']'
+
+
+def _scope_sql(industries) -> str:
+    return ' AND c.industries && %(industries)s::varchar[]' if industries else ''
+
+
+# Any term may match; plainto_tsquery does the quoting, '&' → '|' widens it.
+_ANY_TERMS = "replace(plainto_tsquery('simple', %(text)s)::text, '&', '|')::tsquery"
+_ALL_TERMS = "plainto_tsquery('simple', %(text)s)"
+
+_LEXICAL_SQL = """
+SELECT c.id, ts_rank_cd(to_tsvector('simple', c.content), q.tsq) AS rank
+  FROM {table} c, (SELECT {tsquery} AS tsq) q
+ WHERE NOT c.is_deleted
+   AND to_tsvector('simple', c.content) @@ q.tsq{scope}
+ ORDER BY rank DESC, c.id
+ LIMIT %(limit)s
+"""
+
+_HYBRID_SQL = """
+WITH lexical AS (
+    SELECT id, row_number() OVER (ORDER BY rank DESC, id) AS rank
+      FROM ({lexical}) l
+), semantic AS (
+    SELECT id, distance, row_number() OVER (ORDER BY distance, id) AS rank
+      FROM (SELECT c.id, c.embedding <=> %(vector)s::vector AS distance
+              FROM {table} c
+             WHERE NOT c.is_deleted AND c.embedding IS NOT NULL
+               AND c.embedding_model = %(model)s{scope}
+             ORDER BY c.embedding <=> %(vector)s::vector
+             LIMIT %(limit)s) s
+)
+SELECT COALESCE(l.id, s.id),
+       COALESCE(1.0 / (%(rrf_k)s + l.rank), 0) + COALESCE(1.0 / (%(rrf_k)s + s.rank), 0) AS score,
+       l.rank, s.distance
+  FROM lexical l FULL OUTER JOIN semantic s ON s.id = l.id
+ WHERE l.id IS NOT NULL OR s.distance < %(max_distance)s
+ ORDER BY score DESC, s.distance NULLS LAST
+ LIMIT %(top_k)s
+"""
+
+
+def _table():
+    from .models import AIKnowledgeChunk
+    return AIKnowledgeChunk._meta.db_table
+
+
+def lexical(text, top_k, industries=None, match_all=False):
+    """[(chunk id, ts_rank_cd)] of full-text matches, best first. Any term
+    matches unless `match_all`."""
+    from django.db import connection
+    sql = _LEXICAL_SQL.format(table=_table(), tsquery=_ALL_TERMS if match_all else _ANY_TERMS,
+                              scope=_scope_sql(industries))
+    params = {'text': text or '', 'limit': int(top_k), 'industries': list(industries or [])}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(str(pk), float(rank)) for pk, rank in cursor.fetchall()]
+
+
+def hybrid(text, vector, top_k, industries=None, candidates=None) -> List[Hit]:
+    """Lexical and vector matches fused with RRF, best first — one round-trip.
+
+    Each arm keeps its best `candidates` rows (default CANDIDATES); rows that
+    only the vector arm found must still be under MAX_DISTANCE.
+    """
+    from django.db import connection, transaction
+    from .services import EMBEDDING_MODEL
+    limit = max(int(candidates or CANDIDATES), top_k)
+    scope = _scope_sql(industries)
+    lexical_sql = _LEXICAL_SQL.format(table=_table(), tsquery=_ANY_TERMS, scope=scope)
+    sql = _HYBRID_SQL.format(table=_table(), lexical=lexical_sql.strip(), scope=scope)
+    params = {
+        'text': text or '', 'vector': _vector_literal(vector), 'limit': limit,
+        'model': EMBEDDING_MODEL,
+        'industries': list(industries or []), 'rrf_k': RRF_K,
+        'max_distance': MAX_DISTANCE, 'top_k': int(top_k),
+    }
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _tune_hnsw(cursor, max(EF_SEARCH, limit))
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    return [Hit(str(pk), float(score), rank, float(distance) if distance is not None else None)
+            for pk, score, rank, distance in rows]
+
+
+def _scope_key(industries):
+    return tuple(sorted(industries)) if industries else ()
+
+
+def top_chunk_ids(vector, top_k, industries=None, text=None) -> List[str]:
+    """Ids of the top_k chunks for a prompt, best first: hybrid when `text`
+    is given, else the nearest chunks under MAX_DISTANCE."""
+    key = (kb_version(), _digest(vector), normalize(text), top_k, _scope_key(industries))
+    ids = retrieval_cache.get(key)
+    if ids is None:
+        if text:
+            ids = [hit.id for hit in hybrid(text, vector, top_k, industries)]
+        else:
+            ids = [pk for pk, distance in nearest(vector, top_k, industries)
+                   if distance < MAX_DISTANCE]
+        retrieval_cache.put(key, ids)
+    return ids
+
+
+def lexical_shortcut(prompt, top_k, industries=None) -> List[str]:
+    """Chunk ids matching every term of a short prompt, or [] to fall through
+    to hybrid search. A hit means the embedding call is not needed."""
+    terms = normalize(prompt).split()
+    if not terms or len(terms) > LEXICAL_SHORTCUT_TERMS:
+        return []
+    key = (kb_version(), 'lexical', normalize(prompt), top_k, _scope_key(industries))
+    ids = retrieval_cache.get(key)
+    if ids is None:
+        ids = [pk for pk, _ in lexical(prompt, top_k, industries, match_all=True)]
+        retrieval_cache.put(key, ids)
+    return ids
+
+
+def _kb_is_empty():
+    from .models import AIKnowledgeChunk
+    key = (kb_version(), 'empty')
+    empty = retrieval_cache.get(key)
+    if empty is None:
+        empty = not AIKnowledgeChunk.objects.filter(
+            is_deleted=False, embedding__isnull=False).exists()
+        retrieval_cache.put(key, empty)
+    return empty
+
+
+def profile_industries(profile) -> Optional[List[str]]:
+    """The industry scope of a profile's retrieval: None = whole KB.
+
+    A profile with global_knowledge off but no industries (every profile that
+    predates the field) searches the whole KB, as it did before scoping."""
+    if profile is None or profile.global_knowledge or not profile.industries:
+        return None
+    return list(profile.industries)
+
+
+def kb_context(service, prompt: str, top_k: int = 4,
+               industries: Optional[List[str]] = None) -> Optional[str]:
+    """Find the most relevant KB chunks for the prompt, return them as text.
+
+    `industries` scopes the search (profile_industries); None or an empty
+    list searches the whole KB.
+    Short exact-term prompts are answered lexically; everything else is
+    embedded and searched hybrid. Returns None (silently) when KB is empty,
+    embedding fails, or no chunk is close enough. This keeps the fast path free when the KB hasn't been
+    populated yet.
+    """
+    from .models import AIKnowledgeChunk
+    try:
+        if _kb_is_empty():
+            return None  # skip the embed call entirely
+        ids = (lexical_shortcut(prompt, top_k, industries)
+               or top_chunk_ids(embed_prompt(service, prompt), top_k, industries, text=prompt))
+        if not ids:
+            return None
+        chunks = {str(c.pk): c for c in AIKnowledgeChunk.objects.filter(pk__in=ids)}
+        parts = [f"[{chunks[pk].source_name}]\n{chunks[pk].content}"
+                 for pk in ids if pk in chunks]
+        return '\n\n'.join(parts) or None
+    except Exception:  # noqa: BLE001 — never break the chat over a KB miss
+        logger.warning("KB retrieval failed for prompt %r", prompt[:60], exc_info=True)
+        return None
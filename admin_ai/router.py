@@ -0,0 +1,187 @@
+"""Tool routing — send only the tools a prompt needs instead of all 48.
+
+    route_tools(service, prompt) -> list[str] | None   (None = send every tool)
+    keyword_route(prompt)        -> list[str] | None
+
+Semantic first: each ToolSpec's name + description is embedded once per process
+(one embed_batch call, rebuilt only if the registry changes) and a prompt picks
+its TOP_K nearest tools by cosine similarity, plus the ALWAYS_ON orientation
+tools. The prompt vector is retrieval.embed_prompt's — the same cached embedding
+KB retrieval uses — so routing adds no network call of its own.
+
+Keyword groups stay as the fallback when embeddings are unavailable or the best
+match scores under MIN_SCORE: the matched groups are sent, or all tools when
+nothing matched. A failed index build (embed_batch retries with backoff, a few
+seconds) is not retried on every turn: routing goes straight to keywords for
+RETRY_AFTER seconds first.
+"""
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from .registry import registry
+from .retrieval import embed_prompt
+
+logger = logging.getLogger(__name__)
+
+TOP_K     = int(os.environ.get('AI_ROUTER_TOP_K', '8'))
+MIN_SCORE = float(os.environ.get('AI_ROUTER_MIN_SCORE', '0.3'))
+RETRY_AFTER = float(os.environ.get('AI_ROUTER_RETRY_SECONDS', '300'))
+
+# "Always on" tools orient the model (who am I, what store am I on); fetch_more
+# pages any earlier result that came back behind a handle.
+ALWAYS_ON = [
+    'get_current_context', 'list_stores', 'get_store_info',
+    'get_store_stats', 'get_activity_log', 'search_knowledge_base',
+    'fetch_more',
+]
+
+TOOL_GROUPS: dict = {
+    'inventory': [
+        'list_branches', 'update_branch',
+        'list_products', 'get_product_detail',
+        'list_categories', 'create_category', 'update_category',
+        'list_attributes', 'create_attribute', 'update_attribute',
+        'bulk_update_attribute_value',
+        'list_suppliers', 'get_supplier_detail', 'create_supplier', 'update_supplier',
+        'list_stock_adjustments', 'create_stock_adjustment',
+        'create_product', 'update_product',
+    ],
+    'finance': [
+        'list_invoices', 'list_purchases', 'list_expenses',
+        'create_purchase_invoice', 'receive_purchase',
+        'create_sales_invoice', 'create_expense',
+    ],
+    'people': [
+        'list_customers', 'get_customer_detail', 'create_customer', 'update_customer',
+        'list_staff', 'create_staff_user', 'update_staff_user', 'deactivate_staff_user',
+    ],
+    'platform': [
+        'list_admin_users', 'list_subscription_plans', 'list_subscriptions',
+        'create_store', 'update_store', 'toggle_store_active',
+        'update_subscription_plan', 'update_subscription', 'send_in_app_notification',
+    ],
+}
+
+ROUTING_KEYWORDS: dict = {
+    'inventory': [
+        'product', 'stock', 'inventory', 'item', 'sku', 'barcode', 'laptop', 'phone',
+        'tablet', 'category', 'supplier', 'variant', 'adjustment', 'branch', 'attribute',
+        'season', 'low stock', 'reorder', 'import', 'export', 'quantity', 'cost price',
+        'sell price', 'how many', 'in stock',
+    ],
+    'finance': [
+        'invoice', 'sale', 'purchase', 'expense', 'shift', 'payment', 'revenue',
+        'profit', 'sell', 'sold', 'buy', 'paid', 'debt', 'receivable', 'payable',
+        'income', 'receipt', 'bill', 'cash', 'total',
+    ],
+    'people': [
+        'customer', 'staff', 'cashier', 'employee', 'user', 'client',
+        'worker', 'team', 'member', 'who works',
+    ],
+    'platform': [
+        'subscription', 'plan', 'billing', 'suspend', 'notification', 'notify',
+        'alert', 'all stores', 'list stores', 'admin user',
+    ],
+}
+
+
+def keyword_route(prompt: str) -> Optional[List[str]]:
+    """Orientation tools + every group whose keywords appear in the prompt.
+
+    Returns None when the intent is ambiguous — the caller then sends all
+    registered tools (safe fallback).
+    """
+    low = prompt.lower()
+    matched = [group for group, keywords in ROUTING_KEYWORDS.items()
+               if any(kw in low for kw in keywords)]
+    if not matched:
+        return None
+    names: List[str] = list(ALWAYS_ON)
+    for group in matched:
+        names.extend(TOOL_GROUPS[group])
+    return names
+
+
+# --- semantic ---------------------------------------------------------------
+
+class _ToolIndex:
+    def __init__(self, fingerprint, names, matrix):
+        self.fingerprint = fingerprint
+        self.names = names
+        self.matrix = matrix          # (n_tools, dim), rows L2-normalized
+
+
+_index: Optional[_ToolIndex] = None
+_index_lock = threading.Lock()
+_failed_until = 0.0       # time.monotonic() before which no rebuild is tried
+
+
+def _tool_text(spec) -> str:
+    return f"{spec.name.replace('_', ' ')}: {spec.description}"
+
+
+def _tool_index(service) -> Optional[_ToolIndex]:
+    """Embeddings of every registered tool, built on first use. None while
+    a failed build is cooling down."""
+    global _index, _failed_until
+    import numpy as np
+
+    specs = registry.all()
+    fingerprint = tuple((s.name, s.description) for s in specs)
+    if _index is not None and _index.fingerprint == fingerprint:
+        return _index
+    if time.monotonic() < _failed_until:
+        return None
+    with _index_lock:
+        if _index is not None and _index.fingerprint == fingerprint:
+            return _index
+        if time.monotonic() < _failed_until:
+            return None
+        try:
+            vectors = service.embed_batch([_tool_text(s) for s in specs])
+        except Exception:
+            _failed_until = time.monotonic() + RETRY_AFTER
+            raise
+        rows = [(s.name, v) for s, v in zip(specs, vectors) if v]
+        if not rows:
+            _failed_until = time.monotonic() + RETRY_AFTER
+            logger.warning("Tool router could not embed any tool; keywords for %ds", RETRY_AFTER)
+            return None
+        matrix = np.asarray([v for _, v in rows], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9
+        _index = _ToolIndex(fingerprint, [n for n, _ in rows], matrix)
+        logger.info("Tool router indexed %d tools", len(rows))
+        return _index
+
+
+def semantic_route(service, prompt: str, top_k: int = TOP_K) -> Optional[List[str]]:
+    """ALWAYS_ON + the top_k tools nearest the prompt, or None if no tool is a
+    confident match. Raises on embedding errors (route_tools falls back)."""
+    import numpy as np
+
+    index = _tool_index(service)
+    if index is None:
+        return None
+    vec = np.asarray(embed_prompt(service, prompt), dtype=np.float32)
+    if not vec.size:
+        return None
+    scores = index.matrix @ (vec / (np.linalg.norm(vec) + 1e-9))
+    best = np.argsort(-scores)[:top_k]
+    if scores[best[0]] < MIN_SCORE:
+        return None
+    names: List[str] = list(ALWAYS_ON)
+    names += [index.names[i] for i in best if index.names[i] not in names]
+    return names
+
+
+def route_tools(service, prompt: str) -> Optional[List[str]]:
+    """Semantic route, falling back to keyword groups (then to all tools)."""
+    try:
+        names = semantic_route(service, prompt)
+    except Exception:  # noqa: BLE001 — routing must never block a turn
+        logger.warning("Semantic tool routing failed; using keywords", exc_info=True)
+        names = None
+    return names if names is not None else keyword_route(prompt)
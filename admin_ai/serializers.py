@@ -2,7 +2,7 @@ from rest_framework import serializers
 
 from .models import (
     AISettings, AIProfile, AIModelCache,
-    AIConversation, AIMessage, AIKnowledgeChunk,
+    AIConversation, AIMessage, AIKnowledgeChunk, AIIngestJob,
 )
 
 
@@ -40,7 +40,7 @@ class AIProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model  = AIProfile
         fields = [
-            'id', 'name', 'avatar', 'is_active', 'global_knowledge',
+            'id', 'name', 'avatar', 'is_active', 'global_knowledge', 'industries',
             'model_id', 'vision_resolution', 'max_output_tokens', 'thinking_level',
             'top_p', 'top_k', 'temperature', 'google_grounding',
             'system_instruction', 'enabled_tools',
@@ -92,5 +92,15 @@ class AIKnowledgeChunkSerializer(serializers.ModelSerializer):
     class Meta:
         model  = AIKnowledgeChunk
         fields = ['id', 'source_name', 'source_type', 'chunk_index',
-                  'content', 'industries', 'metadata', 'created_at']
-        read_only_fields = ['created_at']
+                  'content', 'industries', 'metadata', 'embedding_model', 'created_at']
+        read_only_fields = ['embedding_model', 'created_at']
+
+
+class AIIngestJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model  = AIIngestJob
+        fields = ['id', 'source_name', 'status', 'total', 'embedded', 'failed', 'skipped',
+                  'progress', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
@@ -9,24 +9,41 @@ Public surface:
     .ping()                                     -> bool   (cheap connectivity check)
     .refresh_models()                           -> int    (rows written to AIModelCache)
     .chat_stream(profile, history, prompt, ...) -> generator yielding event dicts
+    .chat_stream_async(...)                     -> async generator, same events (ASGI)
     .embed(text)                                -> list[float] (text-embedding-004)
+    .embed_batch(texts, on_progress=None)       -> list[list[float] | None]
+    .summarize(model_id, instruction, text)     -> str    (one-shot, non-streaming)
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any, Dict, Iterable, List, Optional
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
 
 import requests
 
+from asgiref.sync import sync_to_async
+from django.db import connections
 from django.utils import timezone
 
-from .models import AISettings, AIModelCache, AIProfile
+from core.tenancy import clear_current_request, set_current_store
+
+from . import handles, metering
+from .models import EMBEDDING_DIM, AISettings, AIModelCache, AIProfile
 from .registry import registry, ToolContext, ToolError
 
 logger = logging.getLogger(__name__)
 
-EMBEDDING_MODEL = 'text-embedding-004'
+# Changing the model leaves stored vectors stale: retrieval ignores them until
+# `manage.py kb_reembed` (or POST kb/reembed/) has re-embedded them. Vectors are
+# requested at EMBEDDING_DIM so the pgvector column fits any model.
+EMBEDDING_MODEL = os.environ.get('AI_EMBEDDING_MODEL', 'text-embedding-004')
+_EMBED_CONFIG = {'output_dimensionality': EMBEDDING_DIM}
 DEFAULT_PING_MODEL = 'gemini-2.5-flash'
 
 # Max tool round-trips inside a single user turn. Each hop = one Gemini call +
@@ -34,6 +51,19 @@ DEFAULT_PING_MODEL = 'gemini-2.5-flash'
 # multi-step answer rarely needs more than 3-4.
 MAX_TOOL_HOPS = 8
 
+# Read-only tools (ToolSpec.write == False) requested in the same hop run
+# concurrently on at most TOOL_WORKERS threads, each capped at TOOL_TIMEOUT
+# seconds. Write tools stay strictly sequential, in the order the model asked.
+TOOL_WORKERS = int(os.environ.get('AI_TOOL_WORKERS', '4'))
+TOOL_TIMEOUT = float(os.environ.get('AI_TOOL_TIMEOUT', '20'))
+
+# Batched embeddings: up to EMBED_BATCH_SIZE texts per request (the API's
+# batch cap), EMBED_WORKERS requests in flight, EMBED_RETRIES attempts each with
+# exponential backoff — rate limits (429) and 5xx are retried, other 4xx aren't.
+EMBED_BATCH_SIZE = 100
+EMBED_WORKERS    = int(os.environ.get('AI_EMBED_WORKERS', '3'))
+EMBED_RETRIES    = 4
+
 
 # ---------- exceptions ----------
 
@@ -175,13 +205,14 @@ class GeminiService:
     # ---- embeddings ----
 
     def embed(self, text: str) -> List[float]:
-        """Embed a single string with text-embedding-004 (768-dim)."""
+        """Embed a single string with EMBEDDING_MODEL (EMBEDDING_DIM-dim)."""
         if not text:
             return []
         try:
             result = self.client.models.embed_content(
                 model=EMBEDDING_MODEL,
                 contents=text,
+                config=_EMBED_CONFIG,
             )
         except Exception as e:  # noqa: BLE001
             raise GeminiError(f"Embedding failed: {e}") from e
@@ -193,6 +224,77 @@ class GeminiService:
         values = getattr(embeddings[0], 'values', None) or []
         return list(values)
 
+    def embed_batch(
+        self,
+        texts: List[str],
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = EMBED_WORKERS,
+        on_progress=None,
+    ) -> List[Optional[List[float]]]:
+        """Embed many strings with multi-content requests.
+
+        Returns one vector per input, in input order. Blank inputs, and every
+        input of a batch that still failed after retries, come back as None —
+        the caller keeps those chunks text-only instead of losing the rest.
+        `on_progress(done, failed)` is called on the calling thread after each
+        batch, so it may safely touch the DB.
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        indexes = [i for i, t in enumerate(texts) if t and t.strip()]
+        batches = [indexes[i:i + batch_size] for i in range(0, len(indexes), batch_size)]
+        if not batches:
+            return vectors
+
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches))),
+                                thread_name_prefix='ai-embed') as pool:
+            futures = {pool.submit(self._embed_with_retry, [texts[i] for i in batch]): batch
+                       for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    for i, values in zip(batch, future.result()):
+                        vectors[i] = values
+                    done += len(batch)
+                except GeminiError as e:
+                    logger.warning("Embedding batch of %d failed: %s", len(batch), e)
+                    failed += len(batch)
+                if on_progress:
+                    on_progress(done, failed)
+        return vectors
+
+    def _embed_with_retry(self, contents: List[str]) -> List[List[float]]:
+        for attempt in range(EMBED_RETRIES):
+            try:
+                result = self.client.models.embed_content(model=EMBEDDING_MODEL, contents=contents,
+                                                           config=_EMBED_CONFIG)
+                embeddings = getattr(result, 'embeddings', None) or []
+                if len(embeddings) != len(contents):
+                    raise GeminiError(
+                        f"Expected {len(contents)} embeddings, got {len(embeddings)}.")
+                return [list(getattr(e, 'values', None) or []) for e in embeddings]
+            except Exception as e:  # noqa: BLE001
+                code = getattr(e, 'code', None)
+                permanent = isinstance(code, int) and 400 <= code < 500 and code != 429
+                if permanent or attempt == EMBED_RETRIES - 1:
+                    raise GeminiError(f"Embedding failed: {e}") from e
+                time.sleep(min(8.0, 0.5 * 2 ** attempt) + random.uniform(0, 0.25))
+
+    # ---- summaries ----
+
+    def summarize(self, model_id: str, instruction: str, text: str) -> str:
+        """One non-streaming call: condense `text` following `instruction`."""
+        try:
+            resp = self.client.models.generate_content(
+                model=model_id,
+                contents=[{'role': 'user', 'parts': [{'text': text}]}],
+                config={'system_instruction': instruction, 'temperature': 0.2,
+                        'max_output_tokens': 1024},
+            )
+        except Exception as e:  # noqa: BLE001
+            raise GeminiError(f"Summary failed: {e}") from e
+        return (getattr(resp, 'text', None) or '').strip()
+
     # ---- chat ----
 
     def chat_stream(
@@ -209,10 +311,16 @@ class GeminiService:
 
         Yields dicts with these shapes:
             {'event': 'token',  'text': '...'}
-            {'event': 'tool',   'name': '...', 'args': {...}, 'result': {...}}
+            {'event': 'tool',   'name': '...', 'args': {...}, 'result': {...},
+                                'metrics': {hop, duration_ms, rows, bytes, ok}}
+            {'event': 'hop',    'hop': n, 'model': '...', 'duration_ms': ..., 'ttft_ms': ...,
+                                'input_tokens': ..., 'output_tokens': ..., 'tool_calls': n}
             {'event': 'done',   'usage': {...}}
             {'event': 'error',  'message': '...'}
 
+        `hop` events are metering (admin_ai.metering) — the view stores them
+        rather than forwarding them to the browser.
+
         `history` is a list of `{role, content}` from prior turns (already
         flattened by the view layer). `attachments` is a list of
         `{mime_type, data}` dicts for inline image / audio bytes.
@@ -237,6 +345,7 @@ class GeminiService:
         usage_totals = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
 
         for hop in range(MAX_TOOL_HOPS):
+            clock = metering.HopClock()
             try:
                 stream = self.client.models.generate_content_stream(
                     model=profile.model_id,
@@ -250,15 +359,15 @@ class GeminiService:
             pending_calls: List[Dict[str, Any]] = []
             hop_text_parts: List[str] = []
             for chunk in stream:
+                clock.chunk(chunk)
                 for fc in self._extract_function_calls(chunk):
                     pending_calls.append(fc)
                 text = getattr(chunk, 'text', None)
                 if text:
                     hop_text_parts.append(text)
                     yield {'event': 'token', 'text': text}
-                usage = getattr(chunk, 'usage_metadata', None)
-                if usage:
-                    self._accumulate_usage(usage_totals, usage)
+            self._accumulate_usage(usage_totals, clock.usage)
+            yield clock.event(hop, profile.model_id, len(pending_calls))
 
             # No tool calls this hop → the model gave its final answer. Done.
             if not pending_calls:
@@ -267,51 +376,138 @@ class GeminiService:
             # Echo the model's turn (any narration + its function calls) back
             # into the transcript, then run each tool and append the results
             # as function_response parts so the next hop can use them.
-            model_parts: List[Dict[str, Any]] = []
-            if hop_text_parts:
-                model_parts.append({'text': ''.join(hop_text_parts)})
-            model_parts.extend(
-                {'function_call': {'name': fc.get('name'), 'args': fc.get('args') or {}}}
-                for fc in pending_calls
-            )
-            contents.append({'role': 'model', 'parts': model_parts})
-
-            response_parts: List[Dict[str, Any]] = []
-            for fc in pending_calls:
-                tool_result = self._invoke_tool(fc, tool_context)
-                yield {
-                    'event': 'tool',
-                    'name': fc.get('name'),
-                    'args': fc.get('args') or {},
-                    'result': tool_result,
-                }
-                response_parts.append({
-                    'function_response': {
-                        'name': fc.get('name'),
-                        'response': self._jsonable(tool_result),
-                    }
-                })
-            contents.append({'role': 'user', 'parts': response_parts})
+            contents.append(self._model_turn(hop_text_parts, pending_calls))
+
+            # Results land in call order (Gemini pairs each function_response
+            # with its function_call); tool events stream as each one finishes.
+            results: List[Optional[Dict[str, Any]]] = [None] * len(pending_calls)
+            for index, tool_result, elapsed_ms in self._run_tools(pending_calls, tool_context):
+                results[index] = tool_result
+                yield self._tool_event(pending_calls[index], tool_result, elapsed_ms, hop)
+            contents.append(self._response_turn(pending_calls, results))
         else:
-            # Ran out of hops without a final answer — tell the user instead of
-            # ending on a silent half-step.
-            yield {
-                'event': 'token',
-                'text': f"\n\n_(Stopped after {MAX_TOOL_HOPS} tool steps without "
-                        f"finishing. Try narrowing the request.)_",
-            }
+            yield self._out_of_hops_event()
+
+        yield {'event': 'done', 'usage': usage_totals}
+
+    async def chat_stream_async(
+        self,
+        profile: AIProfile,
+        history: List[Dict[str, Any]],
+        prompt: str,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        tool_context: Optional[ToolContext] = None,
+        tool_names: Optional[List[str]] = None,
+        kb_context: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """chat_stream for ASGI: same events, same tool loop, no thread pinned.
+
+        Gemini is streamed through the SDK's async client (`client.aio`). Tools
+        are sync ORM code, so they run via sync_to_async: writes on the
+        request's thread-sensitive executor (strict order), reads concurrently
+        on worker threads. Cancelling the consumer (client disconnect) stops
+        the loop at the next await; tool threads already running finish on
+        their own.
+        """
+        if not profile.model_id:
+            yield {'event': 'error', 'message': 'Active profile has no model selected.'}
+            return
+
+        try:
+            contents = self._build_contents(history, prompt, attachments)
+            config  = self._build_generate_config(profile, tool_names=tool_names,
+                                                  kb_context=kb_context)
+        except Exception as e:  # noqa: BLE001
+            yield {'event': 'error', 'message': f'Bad request: {e}'}
+            return
+
+        usage_totals = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+
+        for hop in range(MAX_TOOL_HOPS):
+            clock = metering.HopClock()
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=profile.model_id,
+                    contents=contents,
+                    config=config,
+                )
+            except Exception as e:  # noqa: BLE001
+                yield {'event': 'error', 'message': f'Gemini call failed: {e}'}
+                return
+
+            pending_calls: List[Dict[str, Any]] = []
+            hop_text_parts: List[str] = []
+            async for chunk in stream:
+                clock.chunk(chunk)
+                pending_calls.extend(self._extract_function_calls(chunk))
+                text = getattr(chunk, 'text', None)
+                if text:
+                    hop_text_parts.append(text)
+                    yield {'event': 'token', 'text': text}
+            self._accumulate_usage(usage_totals, clock.usage)
+            yield clock.event(hop, profile.model_id, len(pending_calls))
+
+            if not pending_calls:
+                break
+
+            contents.append(self._model_turn(hop_text_parts, pending_calls))
+            results: List[Optional[Dict[str, Any]]] = [None] * len(pending_calls)
+            async for index, tool_result, elapsed_ms in self._run_tools_async(pending_calls, tool_context):
+                results[index] = tool_result
+                yield self._tool_event(pending_calls[index], tool_result, elapsed_ms, hop)
+            contents.append(self._response_turn(pending_calls, results))
+        else:
+            yield self._out_of_hops_event()
 
         yield {'event': 'done', 'usage': usage_totals}
 
     # ---- internals ----
 
+    @staticmethod
+    def _model_turn(hop_text_parts: List[str], pending_calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Echo of the model's turn (any narration + its function calls), so the
+        next hop sees its own request next to the tool results."""
+        model_parts: List[Dict[str, Any]] = []
+        if hop_text_parts:
+            model_parts.append({'text': ''.join(hop_text_parts)})
+        model_parts.extend(
+            {'function_call': {'name': fc.get('name'), 'args': fc.get('args') or {}}}
+            for fc in pending_calls
+        )
+        return {'role': 'model', 'parts': model_parts}
+
+    def _response_turn(self, pending_calls, results) -> Dict[str, Any]:
+        return {'role': 'user', 'parts': [
+            {'function_response': {
+                'name': fc.get('name'),
+                'response': self._jsonable(tool_result),
+            }}
+            for fc, tool_result in zip(pending_calls, results)
+        ]}
+
+    @staticmethod
+    def _tool_event(fc: Dict[str, Any], result: Dict[str, Any],
+                    elapsed_ms: float, hop: int) -> Dict[str, Any]:
+        return {'event': 'tool', 'name': fc.get('name'), 'args': fc.get('args') or {},
+                'result': result, 'metrics': metering.tool_metrics(result, elapsed_ms, hop)}
+
+    @staticmethod
+    def _out_of_hops_event() -> Dict[str, Any]:
+        # Ran out of hops without a final answer — tell the user instead of
+        # ending on a silent half-step.
+        return {
+            'event': 'token',
+            'text': f"\n\n_(Stopped after {MAX_TOOL_HOPS} tool steps without "
+                    f"finishing. Try narrowing the request.)_",
+        }
+
     def _build_contents(
         self,
         history: List[Dict[str, Any]],
         prompt: str,
         attachments: Optional[List[Dict[str, Any]]],
     ) -> List[Dict[str, Any]]:
-        # history is already [{role, parts}] Gemini-format from _flatten_history.
+        # history is already [{role, parts}] Gemini-format from history.build_history.
         contents: List[Dict[str, Any]] = list(history)
 
         parts: List[Dict[str, Any]] = [{'text': prompt}]
@@ -386,7 +582,12 @@ class GeminiService:
     @staticmethod
     def _accumulate_usage(totals: Dict[str, Any], usage) -> None:
         """Sum token usage across every hop so the saved count reflects the
-        real cost of a multi-step turn, not just the final Gemini call."""
+        real cost of a multi-step turn, not just the final Gemini call.
+
+        `usage` is the hop's final usage_metadata (HopClock.usage) — streamed
+        chunks repeat the running count, so adding every chunk over-counted."""
+        if not usage:
+            return
         totals['input_tokens']  += getattr(usage, 'prompt_token_count', 0) or 0
         totals['output_tokens'] += getattr(usage, 'candidates_token_count', 0) or 0
         totals['total_tokens']  += getattr(usage, 'total_token_count', 0) or 0
@@ -407,6 +608,120 @@ class GeminiService:
             return {'result': coerced}
         return coerced
 
+    @staticmethod
+    def _is_read_only(fc: Dict[str, Any]) -> bool:
+        spec = registry.get(fc.get('name'))
+        return spec is not None and not spec.write
+
+    def _run_tools(self, calls: List[Dict[str, Any]], context: Optional[ToolContext]):
+        """Yield (index, result, elapsed_ms) for every call of one hop, as each
+        completes. elapsed_ms is measured on the thread that ran the tool.
+
+        Consecutive read-only calls form a batch that runs on a bounded thread
+        pool; a write call is a barrier — everything before it has finished
+        before it starts, and nothing after it starts until it returns. So a
+        hop of reads costs the slowest read, not the sum, while writes keep
+        the exact order the model chose.
+        """
+        batch: List[int] = []
+        for index, fc in enumerate(calls):
+            if self._is_read_only(fc):
+                batch.append(index)
+                continue
+            yield from self._run_read_batch(calls, batch, context)
+            batch = []
+            yield (index, *self._timed_invoke(fc, context))
+        yield from self._run_read_batch(calls, batch, context)
+
+    def _run_read_batch(self, calls, indexes: List[int], context: Optional[ToolContext]):
+        if not indexes:
+            return
+        if len(indexes) == 1:
+            yield (indexes[0], *self._timed_invoke(calls[indexes[0]], context))
+            return
+        # Chunks of TOOL_WORKERS so every call gets its full timeout from the
+        # moment it actually starts, not from when it was queued.
+        for start in range(0, len(indexes), TOOL_WORKERS):
+            chunk = indexes[start:start + TOOL_WORKERS]
+            pool = ThreadPoolExecutor(max_workers=len(chunk), thread_name_prefix='ai-tool')
+            try:
+                futures = {pool.submit(self._invoke_tool_in_thread, calls[i], context): i
+                           for i in chunk}
+                pending = set(futures)
+                deadline = time.monotonic() + TOOL_TIMEOUT
+                while pending:
+                    done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                         return_when=FIRST_COMPLETED)
+                    if not done:
+                        break
+                    for future in done:
+                        yield (futures[future], *future.result())
+                for future in pending:
+                    yield (futures[future], *self._timeout_result(calls[futures[future]]))
+            finally:
+                # Don't block the stream on a timed-out tool; its thread finishes
+                # (and closes its DB connection) on its own.
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_tools_async(self, calls: List[Dict[str, Any]], context: Optional[ToolContext]):
+        """Async twin of _run_tools: same batching, barrier and timeout rules."""
+        batch: List[int] = []
+        for index, fc in enumerate(calls):
+            if self._is_read_only(fc):
+                batch.append(index)
+                continue
+            async for item in self._run_read_batch_async(calls, batch, context):
+                yield item
+            batch = []
+            # thread_sensitive: writes run one at a time on the request's sync thread.
+            yield (index, *await sync_to_async(self._timed_invoke)(fc, context))
+        async for item in self._run_read_batch_async(calls, batch, context):
+            yield item
+
+    async def _run_read_batch_async(self, calls, indexes: List[int], context: Optional[ToolContext]):
+        limit = asyncio.Semaphore(TOOL_WORKERS)
+        invoke = sync_to_async(self._invoke_tool_in_thread, thread_sensitive=False)
+
+        async def run(index):
+            async with limit:
+                try:
+                    return (index, *await asyncio.wait_for(invoke(calls[index], context), TOOL_TIMEOUT))
+                except asyncio.TimeoutError:
+                    return (index, *self._timeout_result(calls[index]))
+
+        tasks = [asyncio.ensure_future(run(i)) for i in indexes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:      # client went away mid-batch
+                task.cancel()
+
+    @staticmethod
+    def _timeout_result(fc: Dict[str, Any]):
+        """(result, elapsed_ms) for a tool that blew its TOOL_TIMEOUT."""
+        name = fc.get('name')
+        logger.warning("Tool %s timed out after %ss", name, TOOL_TIMEOUT)
+        return ({'ok': False, 'error': f'Tool {name!r} timed out after {TOOL_TIMEOUT:g}s.'},
+                TOOL_TIMEOUT * 1000)
+
+    def _invoke_tool_in_thread(self, fc: Dict[str, Any], context: Optional[ToolContext]):
+        """_timed_invoke on a worker thread. Arms the tenant scope the request
+        thread had, and closes the DB connection this thread opened instead of
+        leaking it (Django connections are per-thread)."""
+        set_current_store(getattr(context, 'store', None))
+        try:
+            return self._timed_invoke(fc, context)
+        finally:
+            clear_current_request()
+            connections.close_all()
+
+    def _timed_invoke(self, fc: Dict[str, Any], context: Optional[ToolContext]):
+        """(result, elapsed_ms) of _invoke_tool."""
+        started = time.monotonic()
+        result = self._invoke_tool(fc, context)
+        return result, (time.monotonic() - started) * 1000
+
     def _invoke_tool(self, fc: Dict[str, Any], context: Optional[ToolContext]) -> Dict[str, Any]:
         name = fc.get('name')
         args = fc.get('args') or {}
@@ -414,6 +729,9 @@ class GeminiService:
             return {'error': 'No tool context — refusing to execute write tools.'}
         try:
             result = registry.invoke(name, args, context)
+            if self._is_read_only(fc):
+                # Long lists go back as a first page + handle (admin_ai.handles).
+                result = handles.wrap(name, args, result, context)
             return {'ok': True, 'data': result}
         except ToolError as e:
             return {'ok': False, 'error': str(e)}
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AIKnowledgeChunk
+from .retrieval import bump_kb_version
+
+
+@receiver(post_save, sender=AIKnowledgeChunk)
+@receiver(post_delete, sender=AIKnowledgeChunk)
+def invalidate_kb_retrieval(sender, **kwargs):
+    """Any chunk write (incl. soft delete via save) can change top-k results."""
+    bump_kb_version()
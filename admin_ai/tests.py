@@ -0,0 +1,688 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from admin_ai import chunking, handles, history, ingest, insights, metering, retrieval, router
+from admin_ai.models import (
+    EMBEDDING_DIM, AIConversation, AIEmbeddingCache, AIIngestJob, AIKnowledgeChunk, AIMessage,
+    AIStoreInsight, AIUsageMetric,
+)
+from admin_ai.registry import ToolContext, ToolRegistry, ToolSpec
+from admin_ai.services import EMBEDDING_MODEL, GeminiService
+from core import jobs
+
+
+def _spec(name, func, write=False):
+    return ToolSpec(name=name, description='', parameters={}, func=func, write=write)
+
+
+class ParallelToolTests(SimpleTestCase):
+    """Read-only tools of one hop run concurrently; writes keep their order."""
+
+    def setUp(self):
+        self.log = []
+        reg = ToolRegistry()
+
+        def slow_read(context, tag):
+            time.sleep(0.2)
+            self.log.append(tag)
+            return tag
+
+        def write(context, tag):
+            self.log.append(tag)
+            return tag
+
+        reg.register(_spec('read', slow_read))
+        reg.register(_spec('write', write, write=True))
+        patcher = mock.patch('admin_ai.services.registry', reg)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = GeminiService.__new__(GeminiService)   # no API client needed
+        self.ctx = ToolContext(user=None, store=None)
+
+    def _run(self, calls):
+        return list(self.service._run_tools(calls, self.ctx))
+
+    def test_reads_overlap(self):
+        calls = [{'name': 'read', 'args': {'tag': t}} for t in 'abc']
+        started = time.monotonic()
+        results = self._run(calls)
+        self.assertLess(time.monotonic() - started, 0.45)
+        self.assertEqual(sorted(i for i, _, _ in results), [0, 1, 2])
+        self.assertTrue(all(r['ok'] for _, r, _ in results))
+        self.assertTrue(all(ms >= 200 for _, _, ms in results))
+
+    def test_write_is_a_barrier(self):
+        calls = [{'name': 'read', 'args': {'tag': 'r1'}},
+                 {'name': 'read', 'args': {'tag': 'r2'}},
+                 {'name': 'write', 'args': {'tag': 'w'}},
+                 {'name': 'read', 'args': {'tag': 'r3'}}]
+        self._run(calls)
+        self.assertEqual(self.log.index('w'), 2)
+        self.assertEqual(self.log[-1], 'r3')
+
+    def test_timeout_reports_error(self):
+        calls = [{'name': 'read', 'args': {'tag': t}} for t in 'ab']
+        with mock.patch('admin_ai.services.TOOL_TIMEOUT', 0.05):
+            results = {i: r for i, r, _ in self._run(calls)}
+        self.assertIn('timed out', results[0]['error'])
+
+    def test_async_runner_keeps_the_same_rules(self):
+        from asgiref.sync import async_to_sync
+
+        async def collect(calls):
+            return [item async for item in self.service._run_tools_async(calls, self.ctx)]
+
+        calls = [{'name': 'read', 'args': {'tag': 'r1'}},
+                 {'name': 'read', 'args': {'tag': 'r2'}},
+                 {'name': 'write', 'args': {'tag': 'w'}}]
+        started = time.monotonic()
+        results = async_to_sync(collect)(calls)
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertEqual(self.log[-1], 'w')
+        self.assertEqual(sorted(i for i, _, _ in results), [0, 1, 2])
+
+
+class _StubEmbedder:
+    """embed_batch stand-in: deterministic vectors, optional failing texts."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = 0
+        self.texts = []
+
+    def embed_batch(self, texts, on_progress=None):
+        self.calls += 1
+        self.texts.extend(texts)
+        vectors = [None if t in self.fail_on else [float(len(t))] + [0.0] * (EMBEDDING_DIM - 1)
+                   for t in texts]
+        if on_progress:
+            on_progress(sum(v is not None for v in vectors), sum(v is None for v in vectors))
+        return vectors
+
+
+class IngestPipelineTests(TestCase):
+    def test_chunks_bulk_created_then_embedded(self):
+        job = ingest.create_job('manual.pdf', ['alpha', 'beta', 'gamma'], industries=['retail'])
+        self.assertEqual(job.status, AIIngestJob.Status.QUEUED)
+        self.assertEqual(AIKnowledgeChunk.objects.filter(embedding__isnull=True).count(), 3)
+
+        embedder = _StubEmbedder()
+        job = ingest.run_job(job.pk, embedder=embedder)
+        self.assertEqual(embedder.calls, 1)
+        self.assertEqual((job.status, job.embedded, job.failed), (AIIngestJob.Status.DONE, 3, 0))
+        self.assertEqual(AIKnowledgeChunk.objects.filter(embedding__isnull=False).count(), 3)
+        self.assertEqual(list(AIKnowledgeChunk.objects.order_by('chunk_index')
+                              .values_list('chunk_index', flat=True)), [0, 1, 2])
+
+    def test_failed_embeddings_keep_text(self):
+        job = ingest.create_job('notes.txt', ['ok', 'broken'])
+        job = ingest.run_job(job.pk, embedder=_StubEmbedder(fail_on={'broken'}))
+        self.assertEqual((job.embedded, job.failed, job.progress), (1, 1, 1.0))
+        self.assertTrue(AIKnowledgeChunk.objects.filter(content='broken', embedding__isnull=True).exists())
+
+    def test_reupload_skips_known_chunks_and_reuses_embeddings(self):
+        job = ingest.create_job('a.txt', ['alpha', 'beta'])
+        ingest.run_job(job.pk, embedder=_StubEmbedder())
+
+        again = ingest.create_job('a.txt', iter([('alpha', {}), ('gamma', {}), ('gamma', {})]))
+        self.assertEqual((again.total, again.skipped, again.embedded), (1, 2, 0))
+        copy = ingest.create_job('b.txt', ['beta'])
+        self.assertEqual((copy.total, copy.embedded), (1, 1))
+
+        embedder = _StubEmbedder()
+        copy = ingest.run_job(copy.pk, embedder=embedder)
+        self.assertEqual(embedder.calls, 0)
+        self.assertEqual((copy.embedded, copy.progress), (1, 1.0))
+
+    def test_orphaned_job_resumes_where_it_stopped(self):
+        job = ingest.create_job('a.md', ['alpha', 'beta'])
+        AIKnowledgeChunk.objects.filter(content='alpha').update(
+            embedding=[1.0] + [0.0] * (EMBEDDING_DIM - 1), embedding_model=EMBEDDING_MODEL)
+        AIIngestJob.objects.filter(pk=job.pk).update(
+            status=AIIngestJob.Status.RUNNING, embedded=7,
+            updated_at=timezone.now() - 2 * jobs.STALE_AFTER)
+        embedder = _StubEmbedder()
+
+        def run(pk):
+            return ingest.run_job(pk, embedder=embedder)
+
+        self.assertEqual(jobs.recover(AIIngestJob, run), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.embedded, job.failed), (AIIngestJob.Status.DONE, 2, 0))
+        self.assertEqual(embedder.texts, ['beta'])
+        self.assertEqual(jobs.recover(AIIngestJob, run), [])
+
+
+class EmbeddingCacheTests(TestCase):
+    """Re-ingestion embeds only new text; a model switch re-embeds instead of wiping."""
+
+    def test_replace_keeps_unchanged_and_embeds_only_new(self):
+        ingest.run_job(ingest.create_job('cat.md', ['intro', 'returns', 'fees']).pk,
+                       embedder=_StubEmbedder())
+        job = ingest.create_job('cat.md', ['intro', 'fees v2', 'returns'], replace=True)
+        self.assertEqual((job.total, job.skipped), (1, 2))
+        self.assertEqual(sorted(AIKnowledgeChunk.objects.filter(source_name='cat.md')
+                                .values_list('content', 'chunk_index')),
+                         [('fees v2', 1), ('intro', 0), ('returns', 2)])
+
+        embedder = _StubEmbedder()
+        ingest.run_job(job.pk, embedder=embedder)
+        self.assertEqual(embedder.texts, ['fees v2'])
+        self.assertEqual(AIEmbeddingCache.objects.count(), 4)
+
+        # Text seen before (even under a deleted chunk) comes from the cache.
+        job = ingest.create_job('other.md', ['fees'])
+        self.assertEqual(job.embedded, 1)
+
+    def test_model_switch_reembeds_stale_chunks(self):
+        ingest.run_job(ingest.create_job('a.md', ['alpha', 'beta']).pk, embedder=_StubEmbedder())
+        self.assertIsNone(ingest.reembed_job())
+        with mock.patch('admin_ai.services.EMBEDDING_MODEL', 'new-embedder'):
+            self.assertEqual(ingest.stale_chunks().count(), 2)
+            embedder = _StubEmbedder()
+            job = ingest.run_job(ingest.reembed_job().pk, embedder=embedder)
+            self.assertEqual((job.embedded, job.failed), (2, 0))
+            self.assertEqual(sorted(embedder.texts), ['alpha', 'beta'])
+            self.assertFalse(ingest.stale_chunks().exists())
+        self.assertEqual(set(AIEmbeddingCache.objects.values_list('model', flat=True)),
+                         {EMBEDDING_MODEL, 'new-embedder'})
+
+
+class ChunkingTests(SimpleTestCase):
+    def _chunks(self, name, text, **kw):
+        return list(chunking.chunk_file(SimpleUploadedFile(name, text.encode()), **kw))
+
+    def test_headings_prefix_chunks(self):
+        chunks = self._chunks('faq.md', '# Returns\n\nWithin 14 days.\n\n## Fees\n\n10% restocking.\n')
+        self.assertEqual([meta for _, meta in chunks],
+                         [{'heading': 'Returns'}, {'heading': 'Returns > Fees'}])
+        self.assertEqual(chunks[1][0], 'Returns > Fees\n\n10% restocking.')
+
+    def test_long_paragraph_is_split_with_overlap(self):
+        text = ' '.join(f'Rule number {i} applies.' for i in range(200))
+        chunks = self._chunks('rules.txt', text, max_tokens=60, overlap=10)
+        self.assertGreater(len(chunks), 5)
+        self.assertTrue(all(history.estimate_tokens(c) <= 60 for c, _ in chunks))
+        first, second = chunks[0][0], chunks[1][0]
+        self.assertIn(' '.join(first.split()[-4:]), second)     # e.g. "Rule number 7 applies."
+
+    def test_csv_chunks_repeat_header(self):
+        rows = '\n'.join(f'SKU-{i},Item {i}' for i in range(100))
+        chunks = self._chunks('items.csv', f'sku,name\n{rows}\n', max_tokens=40, overlap=0)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(c.startswith('sku, name\n\n') for c, _ in chunks))
+        self.assertIn('SKU-99, Item 99', chunks[-1][0])
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RetrievalCacheTests(SimpleTestCase):
+    def test_lru_evicts_oldest_and_expires(self):
+        clock = _Clock()
+        lru = retrieval.LRUCache(maxsize=2, ttl=10, clock=clock)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')                      # a is now most recent
+        lru.put('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        clock.now = 11
+        self.assertIsNone(lru.get('a'))
+
+    def test_prompt_embedding_reused_across_phrasing(self):
+        retrieval.prompt_cache.clear()
+        service = mock.Mock()
+        service.embed.return_value = [0.1, 0.2]
+        retrieval.embed_prompt(service, "What are today's sales")
+        vec = retrieval.embed_prompt(service, "  what are TODAY'S sales ")
+        self.assertEqual(vec, [0.1, 0.2])
+        self.assertEqual(service.embed.call_count, 1)
+
+
+class KBVersionTests(TestCase):
+    def test_chunk_write_bumps_version(self):
+        before = retrieval.kb_version()
+        AIKnowledgeChunk.objects.create(source_name='x.txt', content='hello')
+        self.assertGreater(retrieval.kb_version(), before)
+
+
+class HistoryBudgetTests(TestCase):
+    def setUp(self):
+        from users.models import User
+        user = User.objects.create_user(username='sudo-h', password='x')
+        self.conv = AIConversation.objects.create(user=user, title='t')
+
+    def _turn(self, n, rows=0):
+        AIMessage.objects.create(conversation=self.conv, role=AIMessage.Role.USER, content=f'question {n}')
+        calls = [{'event': 'tool', 'name': 'list_products', 'args': {},
+                  'result': {'ok': True, 'data': [{'name': f'p{i}'} for i in range(rows)]}}] if rows else []
+        AIMessage.objects.create(conversation=self.conv, role=AIMessage.Role.MODEL,
+                                 content=f'answer {n}', tool_calls=calls)
+
+    def test_old_tool_results_are_compacted(self):
+        self._turn(1, rows=200)
+        contents = history.build_history(self.conv)
+        response = contents[1]['parts'][0]['function_response']['response']
+        self.assertEqual(len(response['data']), history.HISTORY_MAX_ROWS + 1)
+        self.assertIn('190 more rows', response['data'][-1])
+
+    def test_budget_keeps_newest_turns(self):
+        for n in range(6):
+            self._turn(n)
+        contents = history.build_history(self.conv, budget=30)
+        texts = [p['text'] for c in contents for p in c['parts'] if 'text' in p]
+        self.assertEqual(texts[-1], 'answer 5')
+        self.assertNotIn('question 0', texts)
+
+    def test_summary_persisted_and_replaces_old_turns(self):
+        for n in range(5):
+            self._turn(n)
+        service = mock.Mock()
+        service.summarize.return_value = 'Admin asked questions 0-2.'
+        self.assertTrue(history.maybe_summarize(self.conv, service, 'gemini-x', budget=10))
+        self.conv.refresh_from_db()
+        self.assertEqual(self.conv.summary, 'Admin asked questions 0-2.')
+
+        texts = [p['text'] for c in history.build_history(self.conv) for p in c['parts']]
+        self.assertIn('Admin asked questions 0-2.', texts[0])
+        self.assertNotIn('question 2', texts)
+        self.assertIn('question 3', texts)
+
+    def test_fold_starts_from_the_stored_summary_and_never_overwrites_a_newer_one(self):
+        for n in range(5):
+            self._turn(n)
+        stale = AIConversation.objects.get(pk=self.conv.pk)
+        service = mock.Mock()
+        service.summarize.return_value = 'first fold'
+        self.assertTrue(history.maybe_summarize(self.conv, service, 'gemini-x', budget=10))
+        until = AIConversation.objects.get(pk=self.conv.pk).summarized_until
+
+        for n in range(5, 8):
+            self._turn(n)
+
+        def concurrent_fold(*args):
+            AIConversation.objects.filter(pk=self.conv.pk).update(
+                summary='other fold', summarized_until=until + timedelta(hours=1))
+            return 'second fold'
+
+        service.summarize.side_effect = concurrent_fold
+        self.assertFalse(history.maybe_summarize(stale, service, 'gemini-x', budget=10))
+        self.assertIn('first fold', service.summarize.call_args[0][2])   # not the stale ''
+        self.conv.refresh_from_db()
+        self.assertEqual(self.conv.summary, 'other fold')
+
+
+class SemanticRouterTests(SimpleTestCase):
+    """Tools are ranked by embedding similarity; weak matches fall back to keywords."""
+
+    AXES = ('stock', 'customer', 'plan')
+
+    def _vec(self, text):
+        return [1.0 if axis in text.lower() else 0.0 for axis in self.AXES]
+
+    def setUp(self):
+        reg = ToolRegistry()
+        for name, desc in (('list_products', 'Products and stock levels.'),
+                           ('list_customers', 'Customer directory.'),
+                           ('list_subscription_plans', 'Subscription plan catalog.')):
+            reg.register(ToolSpec(name=name, description=desc, parameters={}, func=None))
+        patcher = mock.patch('admin_ai.router.registry', reg)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        router._index, router._failed_until = None, 0.0
+        self.addCleanup(setattr, router, '_index', None)
+        self.addCleanup(setattr, router, '_failed_until', 0.0)
+        retrieval.prompt_cache.clear()
+
+        self.service = mock.Mock()
+        self.service.embed_batch.side_effect = lambda texts, **kw: [self._vec(t) for t in texts]
+        self.service.embed.side_effect = self._vec
+
+    def test_top_match_plus_orientation_tools(self):
+        names = router.semantic_route(self.service, 'which customer owes us', top_k=1)
+        self.assertEqual(names, list(router.ALWAYS_ON) + ['list_customers'])
+        router.semantic_route(self.service, 'stock please', top_k=1)
+        self.assertEqual(self.service.embed_batch.call_count, 1)   # index built once
+
+    def test_no_confident_match_uses_keywords(self):
+        self.assertIsNone(router.semantic_route(self.service, 'hello there'))
+        self.assertIsNone(router.route_tools(self.service, 'hello there'))
+        names = router.route_tools(mock.Mock(embed_batch=mock.Mock(side_effect=RuntimeError)),
+                                   'list the staff')
+        self.assertIn('list_staff', names)
+
+    def test_failed_index_build_is_not_retried_every_turn(self):
+        broken = mock.Mock(embed_batch=mock.Mock(side_effect=RuntimeError))
+        self.assertIn('list_staff', router.route_tools(broken, 'list the staff'))
+        self.assertIn('list_staff', router.route_tools(broken, 'list the staff'))
+        self.assertEqual(broken.embed_batch.call_count, 1)
+        self.assertFalse(broken.embed.called)
+
+        router._failed_until = 0.0      # cooldown over
+        names = router.route_tools(self.service, 'which customer owes us')
+        self.assertIn('list_customers', names)
+
+
+class DeclarationCacheTests(SimpleTestCase):
+    def test_cached_per_name_set(self):
+        reg = ToolRegistry()
+        for name in ('a', 'b'):
+            reg.register(ToolSpec(name=name, description='', parameters={}, func=None))
+        first = reg.declarations_for(['b', 'a'])
+        self.assertEqual([d['name'] for d in first], ['a', 'b'])
+        self.assertIs(reg.declarations_for(['a', 'b'])[0], first[0])
+        reg.register(ToolSpec(name='c', description='', parameters={}, func=None))
+        self.assertEqual(len(reg.declarations_for(None)), 3)
+
+
+class StoreInsightTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from core.models import Store
+        from users.models import User
+        self.owner = User.objects.create_user(username='va-owner', password='x')
+        self.store = Store.objects.create(name='VA', store_code='305', owner=self.owner)
+        self.owner.store = self.store
+        self.owner.role = User.Role.OWNER
+        self.owner.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_staleness(self):
+        from django.utils import timezone
+        now = timezone.now()
+        row = AIStoreInsight(store=self.store, data_version='v1', generated_at=now)
+        self.assertFalse(insights.is_stale(row, 'v1', now=now))
+        self.assertFalse(insights.is_stale(row, 'v2', now=now + insights.MIN_AGE / 2))
+        self.assertTrue(insights.is_stale(row, 'v2', now=now + insights.MIN_AGE))
+        self.assertTrue(insights.is_stale(row, 'v1', now=now + insights.TTL))
+
+    def test_widget_reads_stored_row_without_llm_call(self):
+        from django.utils import timezone
+        AIStoreInsight.objects.create(
+            store=self.store, data_version=insights.data_version(self.store),
+            generated_at=timezone.now(),
+            insights=[{'type': 'trend', 'title': 't', 'body': 'b'}])
+        with mock.patch.object(insights, 'generate') as generate:
+            r = self.client.get('/api/admin/ai/vagent/insights/')
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(r.json()['insights'][0]['type'], 'trend')
+        generate.assert_not_called()
+
+
+class UsageMeteringTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from users.models import User
+        self.admin = User.objects.create_user(username='ai-sudo', password='x', is_superadmin=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_hop_clock_times_first_chunk_and_keeps_last_usage(self):
+        clock = _Clock()
+        hop = metering.HopClock(clock=clock)
+        clock.now += 0.25
+        hop.chunk(mock.Mock(usage_metadata=mock.Mock(prompt_token_count=100, candidates_token_count=5)))
+        clock.now += 0.5
+        hop.chunk(mock.Mock(usage_metadata=mock.Mock(prompt_token_count=100, candidates_token_count=40)))
+        ev = hop.event(0, 'gemini-2.5-flash', tool_calls=2)
+        self.assertEqual((ev['ttft_ms'], ev['duration_ms']), (250, 750))
+        self.assertEqual((ev['input_tokens'], ev['output_tokens']), (100, 40))
+
+    def test_tool_metrics(self):
+        m = metering.tool_metrics({'ok': True, 'data': {'results': [1, 2, 3], 'count': 3}}, 12.4, hop=1)
+        self.assertEqual((m['rows'], m['duration_ms'], m['ok'], m['hop']), (3, 12, True, 1))
+        self.assertGreater(m['bytes'], 0)
+        self.assertFalse(metering.tool_metrics({'ok': False, 'error': 'x'}, 1, 0)['ok'])
+
+    def test_turn_metrics_stored_and_aggregated(self):
+        conv = AIConversation.objects.create(user=self.admin, title='stock check')
+        message = AIMessage.objects.create(conversation=conv, role=AIMessage.Role.MODEL)
+        hops = [{'event': 'hop', 'hop': 0, 'model': 'm', 'duration_ms': 900, 'ttft_ms': 300,
+                 'input_tokens': 1200, 'output_tokens': 20, 'tool_calls': 1},
+                {'event': 'hop', 'hop': 1, 'model': 'm', 'duration_ms': 600, 'ttft_ms': 200,
+                 'input_tokens': 3000, 'output_tokens': 150, 'tool_calls': 0}]
+        tools = [{'event': 'tool', 'name': 'list_products', 'args': {}, 'result': {},
+                  'metrics': {'hop': 0, 'duration_ms': 80, 'rows': 50, 'bytes': 9000, 'ok': True}}]
+        metering.record(message, hops, tools)
+        self.assertEqual(message.metrics.filter(kind=AIUsageMetric.Kind.TOOL).count(), 1)
+
+        r = self.client.get('/api/admin/ai/usage/', {'days': 1})
+        self.assertEqual(r.status_code, 200, r.content)
+        body = r.json()
+        self.assertEqual((body['turns'], body['hops'], body['tool_calls']), (1, 2, 1))
+        self.assertEqual(body['tokens'], {'input': 4200, 'output': 170})
+        self.assertEqual(body['by_tool'][0]['tool'], 'list_products')
+        self.assertEqual(body['by_tool'][0]['max_bytes'], 9000)
+        self.assertEqual(body['heaviest_turns'][0]['input_tokens'], 4200)
+        self.assertEqual(self.client.get('/api/admin/ai/usage/', {'days': 0}).status_code, 400)
+
+
+class ResultHandleTests(SimpleTestCase):
+    """Long read results go back as one page + a handle; fetch_more pages the rest."""
+
+    def setUp(self):
+        from types import SimpleNamespace
+        reg = ToolRegistry()
+        self.calls = 0
+
+        def list_rows(context, n=45):
+            self.calls += 1
+            return [{'id': i, 'name': f'row {i}'} for i in range(n)]
+
+        reg.register(_spec('list_rows', list_rows))
+        patcher = mock.patch('admin_ai.services.registry', reg)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = GeminiService.__new__(GeminiService)
+        self.ctx = ToolContext(user=SimpleNamespace(pk=1), store=None)
+
+    def test_short_results_are_untouched(self):
+        result = self.service._invoke_tool({'name': 'list_rows', 'args': {'n': 3}}, self.ctx)
+        self.assertEqual(len(result['data']), 3)
+
+    def test_long_result_is_paged_without_rerunning_the_tool(self):
+        first = self.service._invoke_tool({'name': 'list_rows', 'args': {}}, self.ctx)['data']
+        self.assertEqual(len(first['rows']), handles.PAGE_ROWS)
+        self.assertEqual((first['summary']['total'], first['pages']), (45, 3))
+
+        last = handles.page(first['handle'], 3, self.ctx)
+        self.assertEqual([r['id'] for r in last['rows']], [40, 41, 42, 43, 44])
+        self.assertNotIn('next', last)
+        self.assertEqual(self.calls, 1)
+
+    def test_handles_are_per_user_and_bounded(self):
+        from types import SimpleNamespace
+        from admin_ai.registry import ToolValidationError
+        first = self.service._invoke_tool({'name': 'list_rows', 'args': {}}, self.ctx)['data']
+        with self.assertRaises(ToolValidationError):
+            handles.page(first['handle'], 2, ToolContext(user=SimpleNamespace(pk=2), store=None))
+        with self.assertRaises(ToolValidationError):
+            handles.page(first['handle'], 4, self.ctx)
+        with self.assertRaises(ToolValidationError):
+            handles.page('missing', 1, self.ctx)
+
+
+class ReadToolQueryTests(TestCase):
+    """Read tools filter, aggregate and limit in SQL: a fixed number of queries
+    per call, whatever the row count, and `limit` rows whenever enough match."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from decimal import Decimal
+        from django.utils import timezone
+        from core.models import Address, Branch, Store
+        from finance.models import PurchaseInvoice, SalesInvoice
+        from inventory.models import Product, ProductVariant, StockLevel, Supplier
+        from users.models import Customer, User
+        owner = User.objects.create_user(username='tools-owner', password='x')
+        cls.store = Store.objects.create(name='Tools', store_code='406', owner=owner)
+        addr = Address.objects.create(store=cls.store, street_1='1', city='Cairo')
+        main = Branch.objects.create(store=cls.store, name='Main', address=addr)
+        other = Branch.objects.create(store=cls.store, name='Other', address=addr)
+        cls.supplier = Supplier.objects.create(
+            store=cls.store, name='Sup', code_prefix='406', prefix_locked=True)
+        for i in range(5):
+            p = Product.objects.create(store=cls.store, name=f'Bulk {i}', supplier=cls.supplier)
+            v = ProductVariant.objects.create(product=p)
+            StockLevel.objects.create(variant=v, branch=main, quantity=Decimal('100'))
+        for i in range(3):
+            p = Product.objects.create(store=cls.store, name=f'Low {i}', supplier=cls.supplier)
+            v = ProductVariant.objects.create(product=p)
+            StockLevel.objects.create(variant=v, branch=main, quantity=Decimal('1'))
+            StockLevel.objects.create(variant=v, branch=other, quantity=Decimal('50'))
+
+        owes = Customer.objects.create(store=cls.store, name='Owes', phone_number='0101')
+        settled = Customer.objects.create(store=cls.store, name='Settled', phone_number='0102')
+        Customer.objects.create(store=cls.store, name='Seeded', phone_number='0103',
+                                balance=Decimal('50'))
+        for customer, paid in ((owes, '100'), (settled, '300')):
+            SalesInvoice.objects.create(
+                store=cls.store, branch=main, customer=customer, date=timezone.now(),
+                status=SalesInvoice.Status.POSTED,
+                grand_total=Decimal('300'), paid_amount=Decimal(paid))
+        PurchaseInvoice.objects.create(
+            store=cls.store, branch=main, supplier=cls.supplier,
+            total_amount=Decimal('500'), paid_amount=Decimal('200'))
+
+    def _call(self, name, **args):
+        from admin_ai.registry import registry
+        return registry.invoke(name, args, ToolContext(user=None, store=self.store))
+
+    def test_query_counts(self):
+        cases = [
+            ('list_stores', {}, 1),
+            ('get_store_info', {}, 1),
+            ('get_store_stats', {}, 4),
+            ('list_branches', {}, 1),
+            ('list_products', {}, 2),
+            ('list_products', {'low_stock_only': True, 'search': 'o'}, 2),
+            ('list_categories', {}, 1),
+            ('list_suppliers', {}, 1),
+            ('get_supplier_detail', {'supplier_id': str(self.supplier.pk)}, 2),
+            ('list_customers', {'has_balance': True}, 1),
+            ('list_staff', {}, 1),
+            ('list_invoices', {}, 1),
+            ('list_purchases', {}, 1),
+            ('list_expenses', {}, 1),
+            ('list_stock_adjustments', {}, 1),
+            ('get_activity_log', {}, 1),
+        ]
+        for name, args, queries in cases:
+            with self.subTest(tool=name, args=args), self.assertNumQueries(queries):
+                self._call(name, **args)
+
+    def test_low_stock_filter_runs_before_the_limit(self):
+        rows = self._call('list_products', low_stock_only=True, limit=2)
+        self.assertEqual([r['name'] for r in rows], ['Low 0', 'Low 1'])
+        self.assertEqual(rows[0]['total_stock'], '51.000')
+        self.assertEqual(rows[0]['variant_count'], 1)
+
+    def test_balances_match_the_live_figures(self):
+        from finance.models import customer_outstanding
+        from users.models import Customer
+        rows = {r['name']: r['balance'] for r in self._call('list_customers', has_balance=True)}
+        self.assertEqual(set(rows), {'Owes', 'Seeded'})
+        for c in Customer.objects.filter(store=self.store, name__in=rows):
+            self.assertEqual(rows[c.name], str(customer_outstanding(c)))
+        self.assertEqual(self._call('list_suppliers')[0]['outstanding_balance'], '300.00')
+
+
+class FilteredRetrievalTests(TestCase):
+    """Industry-scoped search returns k chunks of that industry even when the
+    nearest neighbours overall all belong to another one."""
+
+    @staticmethod
+    def _vec(*head):
+        return list(head) + [0.0] * (EMBEDDING_DIM - len(head))
+
+    def setUp(self):
+        retrieval.retrieval_cache.clear()
+        for i in range(40):
+            AIKnowledgeChunk.objects.create(source_name='retail.md', chunk_index=i, content=f'r{i}',
+                                            industries=['retail'], embedding=self._vec(1.0, i / 100),
+                                            embedding_model=EMBEDDING_MODEL)
+        for i in range(3):
+            AIKnowledgeChunk.objects.create(source_name='pharma.md', chunk_index=i, content=f'p{i}',
+                                            industries=['pharmacy'], embedding=self._vec(0.2, 1.0, i / 10),
+                                            embedding_model=EMBEDDING_MODEL)
+
+    def test_filtered_search_returns_k_rows_of_that_industry(self):
+        hits = retrieval.nearest(self._vec(1.0), 3, industries=['pharmacy'])
+        self.assertEqual(len(hits), 3)
+        names = set(AIKnowledgeChunk.objects.filter(pk__in=[pk for pk, _ in hits])
+                    .values_list('source_name', flat=True))
+        self.assertEqual(names, {'pharma.md'})
+        self.assertEqual([d for _, d in hits], sorted(d for _, d in hits))
+
+    def test_profile_scope(self):
+        from admin_ai.models import AIProfile
+        profile = AIProfile(name='p', global_knowledge=False, industries=['pharmacy'])
+        self.assertEqual(retrieval.profile_industries(profile), ['pharmacy'])
+        profile.global_knowledge = True
+        self.assertIsNone(retrieval.profile_industries(profile))
+        # Scoped but untagged (the 0010 default) keeps the whole KB.
+        profile.global_knowledge, profile.industries = False, []
+        self.assertIsNone(retrieval.profile_industries(profile))
+
+    def test_only_a_missing_parameter_disables_iterative_scan(self):
+        from django.db import DatabaseError
+        cursor = mock.Mock()
+        with mock.patch.object(retrieval, '_iterative_scan', None):
+            cursor.execute.side_effect = [None, DatabaseError('canceling statement due to lock timeout')]
+            retrieval._tune_hnsw(cursor, 100)
+            self.assertIsNone(retrieval._iterative_scan)
+            cursor.execute.side_effect = [
+                None, DatabaseError('unrecognized configuration parameter "hnsw.iterative_scan"')]
+            retrieval._tune_hnsw(cursor, 100)
+            self.assertIs(retrieval._iterative_scan, False)
+
+
+class HybridRetrievalTests(TestCase):
+    """Exact terms are found lexically even when the embedding points elsewhere;
+    short exact-term prompts skip the embedding call."""
+
+    _vec = staticmethod(FilteredRetrievalTests._vec)
+
+    def setUp(self):
+        retrieval.retrieval_cache.clear()
+        retrieval.prompt_cache.clear()
+        self.model_no = AIKnowledgeChunk.objects.create(
+            source_name='scales.md', content='Scale model TX-4410 needs calibration weekly.',
+            embedding=self._vec(0.0, 1.0), embedding_model=EMBEDDING_MODEL)
+        AIKnowledgeChunk.objects.create(source_name='returns.md', content='Returns within 14 days.',
+                                        embedding=self._vec(1.0, 0.05), embedding_model=EMBEDDING_MODEL)
+        AIKnowledgeChunk.objects.create(source_name='arabic.md', content='سياسة المرتجع للعملاء',
+                                        embedding=self._vec(0.0, 0.0, 1.0), embedding_model=EMBEDDING_MODEL)
+
+    def test_lexical_match_outranks_distant_vector(self):
+        hits = retrieval.hybrid('how to calibrate TX-4410', self._vec(1.0), 3)
+        self.assertEqual(hits[0].id, str(self.model_no.pk))
+        self.assertEqual(hits[0].lexical_rank, 1)
+        # Returns is close to the vector, so the vector arm keeps it too.
+        self.assertEqual(len(hits), 2)
+
+    def test_arabic_term(self):
+        self.assertEqual(len(retrieval.lexical('المرتجع', 3)), 1)
+
+    def test_short_prompt_skips_embedding(self):
+        service = mock.Mock()
+        text = retrieval.kb_context(service, 'TX-4410')
+        self.assertIn('calibration', text)
+        service.embed.assert_not_called()
+
+        service.embed.return_value = self._vec(1.0)
+        text = retrieval.kb_context(service, 'what is the returns window')
+        self.assertIn('14 days', text)
+        service.embed.assert_called_once()
@@ -34,7 +34,10 @@ from decimal import Decimal, InvalidOperation
 from typing import Optional
 
 from django.db import transaction
-from django.db.models import Count, Q, Sum, F
+from django.db.models import (
+    Count, DecimalField, Exists, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce
 
 from .registry import tool, ToolValidationError
 
@@ -110,6 +113,21 @@ def _money(d) -> str:
     return str(Decimal(d or 0))
 
 
+_DEC = DecimalField(max_digits=14, decimal_places=3)
+
+
+def _subquery_sum(qs, group_by: str, expression):
+    """Coalesce((SELECT SUM(expression) … correlated via `qs`), 0) — an
+    aggregate over a reverse relation that doesn't multiply the outer rows."""
+    total = qs.order_by().values(group_by).annotate(t=Sum(expression, output_field=_DEC)).values('t')
+    return Coalesce(Subquery(total, output_field=_DEC), Value(Decimal('0'), output_field=_DEC))
+
+
+def _subquery_count(qs, group_by: str):
+    n = qs.order_by().values(group_by).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(n, output_field=IntegerField()), Value(0))
+
+
 # ============================================================================
 #  Context introspection
 # ============================================================================
@@ -187,9 +205,16 @@ def list_stores(context, include_inactive=False, search=None, limit=None):
     },
 )
 def get_store_info(context, store_id=None):
+    from core.models import Store
     store = _resolve_store(context, store_id)
-    from core.models import Branch
-    from users.models import User
+    # One query: owner, currency and settings joined, both counts annotated.
+    store = (Store.objects.filter(pk=store.pk)
+             .select_related('owner', 'currency', 'settings')
+             .annotate(
+                 branches_count=Count('branches', filter=Q(branches__is_deleted=False), distinct=True),
+                 staff_count=Count('staff', distinct=True),
+             )
+             .first())
     settings = getattr(store, 'settings', None)
     return {
         'id': str(store.id),
@@ -207,8 +232,8 @@ def get_store_info(context, store_id=None):
         },
         'timezone': store.timezone,
         'default_language': store.default_language,
-        'branches_count': Branch.objects.filter(store=store, is_deleted=False).count(),
-        'staff_count': User.objects.filter(store=store).count(),
+        'branches_count': store.branches_count,
+        'staff_count': store.staff_count,
         'settings': {
             'allow_negative_stock': getattr(settings, 'allow_negative_stock', None),
             'enable_agel_selling': getattr(settings, 'enable_agel_selling', None),
@@ -245,7 +270,8 @@ def get_store_stats(context, store_id=None):
     agg = today_invoices.aggregate(total=Sum('grand_total'), count=Count('id'))
     items_sold = today_invoices.aggregate(qty=Sum('items__quantity'))['qty'] or 0
 
-    open_shift = WorkShift.objects.filter(store=store, status=WorkShift.Status.OPEN).first()
+    open_shift = (WorkShift.objects.filter(store=store, status=WorkShift.Status.OPEN)
+                  .select_related('user').first())
 
     low_stock_count = (
         StockLevel.objects
@@ -413,7 +439,8 @@ def list_branches(context, store_id=None):
             'supplier_id': {'type': 'string'},
             'search': {'type': 'string', 'description': 'Name / SKU / barcode.'},
             'low_stock_only': {'type': 'boolean',
-                               'description': 'Only products with any stock level <= 5.'},
+                               'description': 'Only products with a branch stock level at or '
+                                              'below the variant\'s reorder level.'},
             'attrs': {
                 'type': 'string',
                 'description': 'Dynamic attribute filters as a JSON object string, '
@@ -425,21 +452,17 @@ def list_branches(context, store_id=None):
 )
 def list_products(context, store_id=None, category_id=None, supplier_id=None,
                   search=None, low_stock_only=False, attrs=None, limit=None):
-    from inventory.models import Product
+    from inventory.models import Product, ProductAttribute, ProductVariant, StockLevel
     store = _resolve_store(context, store_id)
-    qs = (Product.objects.filter(store=store)
-          .select_related('category', 'supplier')
-          .prefetch_related('variants', 'variants__stock_levels'))
+    qs = Product.objects.filter(store=store)
     if category_id:
         qs = qs.filter(category_id=category_id)
     if supplier_id:
         qs = qs.filter(supplier_id=supplier_id)
     if search:
-        qs = qs.filter(
-            Q(name__icontains=search)
-            | Q(variants__sku__icontains=search)
-            | Q(variants__barcode__icontains=search)
-        ).distinct()
+        variant_match = ProductVariant.objects.filter(product=OuterRef('pk')).filter(
+            Q(sku__icontains=search) | Q(barcode__icontains=search))
+        qs = qs.filter(Q(name__icontains=search) | Exists(variant_match))
     if isinstance(attrs, str) and attrs.strip():
         import json
         try:
@@ -448,32 +471,43 @@ def list_products(context, store_id=None, category_id=None, supplier_id=None,
             attrs = None
     if isinstance(attrs, dict):
         for k, v in attrs.items():
-            qs = qs.filter(
-                variants__attributes__definition__key=k,
-                variants__attributes__value=v,
-            ).distinct()
-
-    products = []
-    for p in qs.order_by('name')[:_clamp_limit(limit)]:
-        variants = list(p.variants.all())
-        total_stock = sum(
-            (sl.quantity for v in variants for sl in v.stock_levels.all()),
-            Decimal('0'),
-        )
-        if low_stock_only and total_stock > 5:
-            continue
-        products.append({
+            qs = qs.filter(Exists(ProductAttribute.objects.filter(
+                variant__product=OuterRef('pk'), variant__is_deleted=False,
+                definition__key=k, value=v,
+            )))
+    if low_stock_only:
+        # Same rule as get_store_stats' low_stock_count.
+        qs = qs.filter(Exists(StockLevel.objects.filter(
+            variant__product=OuterRef('pk'), variant__is_deleted=False,
+            quantity__lte=F('variant__reorder_level'),
+        )))
+
+    # Filters, totals and the limit all run in SQL, so `limit` rows come back
+    # whenever that many match; one more query fetches the shown SKUs.
+    qs = qs.annotate(
+        total_stock=_subquery_sum(
+            StockLevel.objects.filter(variant__product=OuterRef('pk'), variant__is_deleted=False),
+            'variant__product', 'quantity'),
+        variant_count=_subquery_count(
+            ProductVariant.objects.filter(product=OuterRef('pk')), 'product'),
+    )
+    page = (qs.select_related('category', 'supplier')
+            .prefetch_related(Prefetch('variants', queryset=ProductVariant.objects.only('id', 'product_id', 'sku')))
+            .order_by('name')[:_clamp_limit(limit)])
+    return [
+        {
             'id': str(p.id),
             'name': p.name,
             'type': p.product_type,
             'category': p.category.name if p.category_id else None,
             'supplier': p.supplier.name if p.supplier_id else None,
             'base_price': _money(p.base_price),
-            'variant_count': len(variants),
-            'total_stock': str(total_stock),
-            'skus': [v.sku for v in variants[:5]],
-        })
-    return products
+            'variant_count': p.variant_count,
+            'total_stock': str(p.total_stock),
+            'skus': [v.sku for v in list(p.variants.all())[:5]],
+        }
+        for p in page
+    ]
 
 
 @tool(
@@ -589,17 +623,22 @@ def list_attributes(context, store_id=None):
 )
 def list_suppliers(context, store_id=None, search=None, limit=None):
     from inventory.models import Supplier
+    from finance.models import PurchaseInvoice
     store = _resolve_store(context, store_id)
     qs = Supplier.objects.filter(store=store)
     if search:
         qs = qs.filter(Q(name__icontains=search) | Q(code_prefix__icontains=search))
-    qs = qs.order_by('name')[:_clamp_limit(limit)]
+    purchases = PurchaseInvoice.all_objects.filter(supplier=OuterRef('pk'), is_deleted=False)
+    qs = qs.annotate(
+        outstanding_balance=_subquery_sum(purchases, 'supplier', F('total_amount') - F('paid_amount')),
+    ).order_by('name')[:_clamp_limit(limit)]
     return [
         {
             'id': str(s.id),
             'name': s.name,
             'code_prefix': s.code_prefix,
             'contact_info': s.contact_info or '',
+            'outstanding_balance': _money(s.outstanding_balance),
         }
         for s in qs
     ]
@@ -624,14 +663,14 @@ def get_supplier_detail(context, supplier_id, store_id=None):
     s = Supplier.objects.filter(pk=supplier_id, store=store).first()
     if s is None:
         raise ToolValidationError(f"Supplier {supplier_id} not found in this store.")
-    purchases = PurchaseInvoice.objects.filter(supplier=s, is_deleted=False)
-    agg = purchases.aggregate(total=Sum('total_amount'), paid=Sum('paid_amount'))
+    agg = (PurchaseInvoice.objects.filter(supplier=s, is_deleted=False)
+           .aggregate(count=Count('id'), total=Sum('total_amount'), paid=Sum('paid_amount')))
     return {
         'id': str(s.id),
         'name': s.name,
         'code_prefix': s.code_prefix,
         'contact_info': s.contact_info or '',
-        'purchases_count': purchases.count(),
+        'purchases_count': agg['count'],
         'purchases_total': _money(agg['total']),
         'purchases_paid': _money(agg['paid']),
         'outstanding_balance': _money(
@@ -656,29 +695,25 @@ def get_supplier_detail(context, supplier_id, store_id=None):
 )
 def list_customers(context, store_id=None, search=None, has_balance=False, limit=None):
     from users.models import Customer
-    from finance.models import customer_outstanding
+    from finance.models import annotate_customer_outstanding
     store = _resolve_store(context, store_id)
     qs = Customer.objects.filter(store=store)
     if search:
         qs = qs.filter(Q(name__icontains=search) | Q(phone_number__icontains=search))
-    qs = qs.order_by('name')
-    cap = _clamp_limit(limit)
-    rows = []
-    # Balance is computed live (seed + invoice AR), so has_balance must filter
-    # in Python — no stored column to query against.
-    for c in qs:
-        bal = customer_outstanding(c)
-        if has_balance and bal == 0:
-            continue
-        rows.append({
+    # Live balance (seed + invoice AR) as an annotation: has_balance and the
+    # limit apply in SQL, one query however many customers are scanned.
+    qs = annotate_customer_outstanding(qs, 'live_balance')
+    if has_balance:
+        qs = qs.exclude(live_balance=0)
+    return [
+        {
             'id': str(c.id),
             'name': c.name,
             'phone': c.phone_number,
-            'balance': _money(bal),
-        })
-        if len(rows) >= cap:
-            break
-    return rows
+            'balance': _money(c.live_balance),
+        }
+        for c in qs.order_by('name')[:_clamp_limit(limit)]
+    ]
 
 
 @tool(
@@ -2214,7 +2249,7 @@ def send_in_app_notification(context, title, body='', type='GENERAL',
 
 @tool(
     name='search_knowledge_base',
-    description='Semantic search over the admin knowledge base. Use when you need '
+    description='Search the admin knowledge base (keywords and meaning). Use when you need '
                 'business rules, store policies, product specs, pricing guidelines, '
                 'SOPs, or any information that may have been uploaded as a document. '
                 'Returns the most relevant text excerpts ranked by relevance.',
@@ -2230,31 +2265,53 @@ def send_in_app_notification(context, title, body='', type='GENERAL',
     },
 )
 def search_knowledge_base(context, query, limit=None):
+    from admin_ai import retrieval
     from admin_ai.models import AIKnowledgeChunk
     from admin_ai.services import GeminiService, GeminiError, NoApiKey
 
     n = max(1, min(int(limit or 5), 10))
     try:
         service = GeminiService.from_settings()
-        vec = service.embed(query)
+        vec = retrieval.embed_prompt(service, query)
     except (NoApiKey, GeminiError) as e:
         raise ToolValidationError(f"Could not embed query: {e}")
 
-    from pgvector.django import CosineDistance
-    qs = (AIKnowledgeChunk.objects
-          .filter(is_deleted=False, embedding__isnull=False)
-          .annotate(distance=CosineDistance('embedding', vec))
-          .order_by('distance')[:n])
-
+    # Lexical + vector, RRF-fused: exact terms (model numbers, setting names)
+    # match even when the embedding is vague.
+    hits = retrieval.hybrid(query, vec, n)
+    chunks = {str(c.pk): c for c in AIKnowledgeChunk.objects.filter(pk__in=[h.id for h in hits])}
     results = [
         {
-            'source': c.source_name,
-            'content': c.content,
-            'relevance': round(1 - float(c.distance), 3),
+            'source': chunks[h.id].source_name,
+            'content': chunks[h.id].content,
+            'relevance': round(1 - h.distance, 3) if h.distance is not None else None,
+            'exact_match': h.lexical_rank is not None,
         }
-        for c in qs
-        if c.distance < 0.7  # skip anything too distant to be useful
+        for h in hits if h.id in chunks
     ]
     if not results:
         return [{'note': 'No relevant knowledge base entries found.'}]
     return results
+
+
+# ============================================================================
+#  Result paging
+# ============================================================================
+
+@tool(
+    name='fetch_more',
+    description='Get another page of a large earlier tool result. List tools return '
+                'only their first rows plus a `handle` and `pages`; pass that handle '
+                'and the page you want instead of calling the list tool again.',
+    parameters={
+        'type': 'object',
+        'properties': {
+            'handle': {'type': 'string', 'description': 'The `handle` from the earlier result.'},
+            'page': {'type': 'integer', 'description': '1-based page number.'},
+        },
+        'required': ['handle', 'page'],
+    },
+)
+def fetch_more(context, handle, page=2):
+    from admin_ai import handles
+    return handles.page(handle, page, context)
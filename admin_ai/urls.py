@@ -4,9 +4,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AISettingsView, AIStatusView,
     AIProfileViewSet, AIModelCacheViewSet,
-    AIConversationViewSet, AIChatView,
+    AIConversationViewSet, AIChatView, AIChatStreamView,
     AIKnowledgeChunkViewSet, AIToolListView,
-    VAInsightsView,
+    AIUsageStatsView, VAInsightsView,
 )
 
 router = DefaultRouter()
@@ -19,7 +19,9 @@ urlpatterns = [
     path('settings/', AISettingsView.as_view(), name='ai-settings'),
     path('status/',   AIStatusView.as_view(),   name='ai-status'),
     path('chat/',     AIChatView.as_view(),     name='ai-chat'),
+    path('chat/stream/', AIChatStreamView.as_view(), name='ai-chat-stream'),
     path('tools/',             AIToolListView.as_view(),  name='ai-tools'),
+    path('usage/',             AIUsageStatsView.as_view(), name='ai-usage'),
     path('vagent/insights/',   VAInsightsView.as_view(),  name='vagent-insights'),
     path('', include(router.urls)),
 ]
@@ -13,16 +13,31 @@ Routes (mounted under /api/admin/ai/):
     GET        /conversations/{id}/       -> one conversation with messages
     DELETE     /conversations/{id}/       -> soft-delete
     POST       /chat/                     -> SSE stream of a single user turn
+    POST       /chat/stream/              -> same, async (serve via ASGI)
     POST       /kb/                       -> upsert a knowledge chunk (embeds it)
+    POST       /kb/upload/                -> store a document's chunks, embed them in the background
+    GET        /kb/jobs/{id}/             -> progress of one upload's embedding job
+    GET        /usage/?days=7             -> per-model / per-tool latency, tokens, payload sizes
     GET        /kb/                       -> list chunks (sourced for KB tab)
     POST       /kb/search/                -> top-k semantic search
 """
+import asyncio
+import itertools
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from datetime import timedelta
 from typing import Any, Dict, List, Optional
 
+from asgiref.sync import sync_to_async
+from django.db import connections
 from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -34,76 +49,26 @@ from users.permissions import IsSuperAdmin
 
 from .models import (
     AISettings, AIProfile, AIModelCache,
-    AIConversation, AIMessage, AIKnowledgeChunk,
+    AIConversation, AIMessage, AIKnowledgeChunk, AIIngestJob,
 )
 from .serializers import (
     AISettingsSerializer, AIProfileSerializer, AIModelCacheSerializer,
     AIConversationSerializer, AIMessageSerializer, AIKnowledgeChunkSerializer,
+    AIIngestJobSerializer,
 )
+from . import chunking, ingest, insights, metering, retrieval, router
+from .history import build_history, maybe_summarize
 from .services import GeminiService, NoApiKey, GeminiError
 from .registry import registry, ToolContext
 
 logger = logging.getLogger(__name__)
 
-# ---------------------------------------------------------------------------
-#  Tool routing — send only the relevant tool group instead of all 48.
-#  "Always on" tools orient the model (who am I, what store am I on).
-#  Groups are activated by keyword match against the user's prompt.
-# ---------------------------------------------------------------------------
-
-_ALWAYS_ON = [
-    'get_current_context', 'list_stores', 'get_store_info',
-    'get_store_stats', 'get_activity_log', 'search_knowledge_base',
-]
-
-_TOOL_GROUPS: dict = {
-    'inventory': [
-        'list_branches', 'update_branch',
-        'list_products', 'get_product_detail',
-        'list_categories', 'create_category', 'update_category',
-        'list_attributes', 'create_attribute', 'update_attribute',
-        'bulk_update_attribute_value',
-        'list_suppliers', 'get_supplier_detail', 'create_supplier', 'update_supplier',
-        'list_stock_adjustments', 'create_stock_adjustment',
-        'create_product', 'update_product',
-    ],
-    'finance': [
-        'list_invoices', 'list_purchases', 'list_expenses',
-        'create_purchase_invoice', 'receive_purchase',
-        'create_sales_invoice', 'create_expense',
-    ],
-    'people': [
-        'list_customers', 'get_customer_detail', 'create_customer', 'update_customer',
-        'list_staff', 'create_staff_user', 'update_staff_user', 'deactivate_staff_user',
-    ],
-    'platform': [
-        'list_admin_users', 'list_subscription_plans', 'list_subscriptions',
-        'create_store', 'update_store', 'toggle_store_active',
-        'update_subscription_plan', 'update_subscription', 'send_in_app_notification',
-    ],
-}
-
-_ROUTING_KEYWORDS: dict = {
-    'inventory': [
-        'product', 'stock', 'inventory', 'item', 'sku', 'barcode', 'laptop', 'phone',
-        'tablet', 'category', 'supplier', 'variant', 'adjustment', 'branch', 'attribute',
-        'season', 'low stock', 'reorder', 'import', 'export', 'quantity', 'cost price',
-        'sell price', 'how many', 'in stock',
-    ],
-    'finance': [
-        'invoice', 'sale', 'purchase', 'expense', 'shift', 'payment', 'revenue',
-        'profit', 'sell', 'sold', 'buy', 'paid', 'debt', 'receivable', 'payable',
-        'income', 'receipt', 'bill', 'cash', 'total',
-    ],
-    'people': [
-        'customer', 'staff', 'cashier', 'employee', 'user', 'client',
-        'worker', 'team', 'member', 'who works',
-    ],
-    'platform': [
-        'subscription', 'plan', 'billing', 'suspend', 'notification', 'notify',
-        'alert', 'all stores', 'list stores', 'admin user',
-    ],
-}
+# Chat turns route tools + retrieve KB on this pool so it overlaps conversation loading.
+_PREP_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ai-prep')
+PREP_TIMEOUT = 10   # seconds; past this the turn goes ahead with keyword routing, no KB
+# History summaries (a blocking Gemini call) run here after the reply is
+# stored, so neither the SSE connection nor its worker waits for them.
+_SUMMARY_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ai-summary')
 
 
 def _gemini_or_error():
@@ -220,6 +185,49 @@ class AIConversationViewSet(viewsets.ModelViewSet):
 
 # ---------- chat (SSE) ----------
 
+@dataclass
+class ChatTurn:
+    """Everything a chat turn needs once the request has been validated."""
+    service: GeminiService
+    profile: AIProfile
+    conversation: AIConversation
+    prompt: str
+    attachments: List[Dict[str, Any]]
+    history: List[Dict[str, Any]]
+    tool_context: ToolContext
+    tool_names: Optional[List[str]]
+    kb_context: Optional[str]
+
+    def stream_kwargs(self) -> Dict[str, Any]:
+        return dict(profile=self.profile, history=self.history, prompt=self.prompt,
+                    attachments=self.attachments, tool_context=self.tool_context,
+                    tool_names=self.tool_names, kb_context=self.kb_context)
+
+
+class _TurnLog:
+    """What a streamed turn produced, for the stored model message."""
+
+    def __init__(self):
+        self.text: List[str] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.hops: List[Dict[str, Any]] = []
+        self.usage: Dict[str, Any] = {}
+
+    def record(self, ev: Dict[str, Any]) -> bool:
+        """Keep `ev`; returns False for metering events the browser doesn't get."""
+        kind = ev.get('event')
+        if kind == 'token':
+            self.text.append(ev.get('text', ''))
+        elif kind == 'tool':
+            self.tool_calls.append(ev)
+        elif kind == 'hop':
+            self.hops.append(ev)
+            return False
+        elif kind == 'done':
+            self.usage = ev.get('usage') or {}
+        return True
+
+
 class AIChatView(APIView):
     """Stream a single turn back as Server-Sent Events.
 
@@ -236,6 +244,29 @@ class AIChatView(APIView):
     permission_classes = [IsSuperAdmin]
 
     def post(self, request):
+        turn = self._start_turn(request)
+        if isinstance(turn, Response):
+            return turn
+
+        def event_stream():
+            # First frame: conversation id so the client can pin subsequent turns.
+            yield self._sse('meta', {'conversation_id': str(turn.conversation.id)})
+            log = _TurnLog()
+            try:
+                for ev in turn.service.chat_stream(**turn.stream_kwargs()):
+                    if log.record(ev):
+                        yield self._sse(ev.get('event'), ev)
+            except Exception as e:  # noqa: BLE001
+                logger.exception("Chat stream failed")
+                yield self._sse('error', {'message': str(e)})
+            self._finish_turn(turn, log)
+
+        return self._sse_response(event_stream())
+
+    def _start_turn(self, request):
+        """Validate the request and set the turn up: conversation, stored user
+        message, budgeted history, routed tools, KB context. Returns a ChatTurn,
+        or an error Response."""
         service, err = _gemini_or_error()
         if err:
             return err
@@ -249,6 +280,11 @@ class AIChatView(APIView):
             return Response({'error': 'No active AI profile configured.'},
                             status=status.HTTP_409_CONFLICT)
 
+        # Tool routing + KB retrieval (one prompt embedding, a vector query) run
+        # while we load the conversation and history below, not after them.
+        prep_future = _PREP_POOL.submit(self._prepare_turn, service, prompt,
+                                       retrieval.profile_industries(active_profile))
+
         # Resolve / create the conversation.
         conv_id = request.data.get('conversation_id')
         if conv_id:
@@ -266,7 +302,7 @@ class AIChatView(APIView):
 
         attachments = request.data.get('attachments') or []
         # Persist the user turn before we start streaming.
-        AIMessage.objects.create(
+        user_message = AIMessage.objects.create(
             conversation=conversation,
             role=AIMessage.Role.USER,
             content=prompt,
@@ -274,55 +310,50 @@ class AIChatView(APIView):
                          for a in attachments],
         )
 
-        history = self._flatten_history(conversation)
+        # Prior turns only — chat_stream appends this prompt (with attachments).
+        history = build_history(conversation, exclude_id=user_message.pk)
         tool_ctx = ToolContext(
             user=request.user,
             store=getattr(request.user, 'store', None),
             request=request,
         )
-        tool_names = self._route_tools(prompt)
-        kb_context = self._retrieve_kb_context(service, prompt)
-
-        def event_stream():
-            # First frame: conversation id so the client can pin subsequent turns.
-            yield self._sse('meta', {'conversation_id': str(conversation.id)})
-
-            collected_text: List[str] = []
-            tool_calls_log: List[Dict[str, Any]] = []
-            final_usage: Dict[str, Any] = {}
+        tool_names, kb_context = self._await_prepared(prep_future, prompt)
+        return ChatTurn(service, active_profile, conversation, prompt, attachments,
+                        history, tool_ctx, tool_names, kb_context)
 
-            try:
-                for ev in service.chat_stream(
-                    profile=active_profile,
-                    history=history,
-                    prompt=prompt,
-                    attachments=attachments,
-                    tool_context=tool_ctx,
-                    tool_names=tool_names,
-                    kb_context=kb_context,
-                ):
-                    kind = ev.get('event')
-                    if kind == 'token':
-                        collected_text.append(ev.get('text', ''))
-                    elif kind == 'tool':
-                        tool_calls_log.append(ev)
-                    elif kind == 'done':
-                        final_usage = ev.get('usage') or {}
-                    yield self._sse(kind, ev)
-            except Exception as e:  # noqa: BLE001
-                logger.exception("Chat stream failed")
-                yield self._sse('error', {'message': str(e)})
+    @staticmethod
+    def _finish_turn(turn: 'ChatTurn', log: '_TurnLog', summarize: bool = True) -> None:
+        # Persist the model turn at the end so resumes show full text.
+        message = AIMessage.objects.create(
+            conversation=turn.conversation,
+            role=AIMessage.Role.MODEL,
+            content=''.join(log.text),
+            tool_calls=log.tool_calls,
+            usage=log.usage,
+        )
+        try:
+            metering.record(message, log.hops, log.tool_calls)
+        except Exception:  # noqa: BLE001 — metering never costs the user their reply
+            logger.warning("Usage metrics not stored for message %s", message.pk, exc_info=True)
+        # Fold older turns into the stored summary in the background, so the
+        # next turn's request starts small without this one waiting for it.
+        if summarize:
+            _SUMMARY_POOL.submit(AIChatView._summarize, turn)
 
-            # Persist the model turn at the end so resumes show full text.
-            AIMessage.objects.create(
-                conversation=conversation,
-                role=AIMessage.Role.MODEL,
-                content=''.join(collected_text),
-                tool_calls=tool_calls_log,
-                usage=final_usage,
-            )
+    @staticmethod
+    def _summarize(turn: 'ChatTurn') -> None:
+        """maybe_summarize on a _SUMMARY_POOL thread; closes its DB connection."""
+        try:
+            maybe_summarize(turn.conversation, turn.service, turn.profile.model_id)
+        except Exception:  # noqa: BLE001 — nobody is waiting on this thread
+            logger.warning("History summary failed for conversation %s",
+                           turn.conversation.pk, exc_info=True)
+        finally:
+            connections.close_all()
 
-        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    @staticmethod
+    def _sse_response(stream) -> StreamingHttpResponse:
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
         response['Cache-Control'] = 'no-cache'
         response['X-Accel-Buffering'] = 'no'
         return response
@@ -332,100 +363,80 @@ class AIChatView(APIView):
         return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
     @staticmethod
-    def _flatten_history(conversation: AIConversation) -> List[Dict[str, Any]]:
-        """Return conversation history in Gemini's {role, parts} format.
-
-        For model messages that contain tool calls, we reconstruct the
-        function_call + function_response turn pairs Gemini expects. Without
-        this the model loses knowledge of discovered IDs (store UUIDs etc.)
-        between conversation turns, causing it to hallucinate or re-query.
-        """
-        contents: List[Dict[str, Any]] = []
-
-        for m in conversation.messages.exclude(role=AIMessage.Role.SYSTEM):
-            role = 'model' if m.role.upper() == 'MODEL' else 'user'
-
-            if role == 'model' and m.tool_calls:
-                tool_events = [tc for tc in m.tool_calls if tc.get('event') == 'tool']
-                if tool_events:
-                    # Reconstruct the model's function_call turn.
-                    contents.append({
-                        'role': 'model',
-                        'parts': [
-                            {'function_call': {'name': tc['name'], 'args': tc.get('args') or {}}}
-                            for tc in tool_events
-                        ],
-                    })
-                    # Reconstruct the user-side function_response turn.
-                    contents.append({
-                        'role': 'user',
-                        'parts': [
-                            {'function_response': {
-                                'name': tc['name'],
-                                'response': tc.get('result') or {},
-                            }}
-                            for tc in tool_events
-                        ],
-                    })
-                # Then the model's final text answer for this turn.
-                if m.content:
-                    contents.append({'role': 'model', 'parts': [{'text': m.content}]})
-            elif m.content:
-                contents.append({'role': role, 'parts': [{'text': m.content}]})
-
-        return contents
+    def _prepare_turn(service, prompt: str, industries=None):
+        """(tool_names, kb_context) for a prompt. Runs on a _PREP_POOL thread,
+        so it closes that thread's DB connection when done. `industries` is
+        the active profile's KB scope (None = whole KB)."""
+        try:
+            return (router.route_tools(service, prompt),
+                    retrieval.kb_context(service, prompt, industries=industries))
+        finally:
+            connections.close_all()
 
     @staticmethod
-    def _route_tools(prompt: str) -> Optional[List[str]]:
-        """Return a focused tool list based on the prompt's intent.
-
-        Returns None when the intent is ambiguous — the caller then sends all
-        registered tools (safe fallback). When a group matches, sends only the
-        orientation tools + that group: typically ~10 tools vs 48 (~70% saving).
-        """
-        low = prompt.lower()
-        matched: set = set()
-        for group, keywords in _ROUTING_KEYWORDS.items():
-            if any(kw in low for kw in keywords):
-                matched.add(group)
-
-        if not matched:
-            return None  # unclear intent → send all tools
+    def _await_prepared(future, prompt: str):
+        try:
+            return future.result(timeout=PREP_TIMEOUT)
+        except FutureTimeout:
+            logger.warning("Routing / KB retrieval exceeded %ss — keyword routing, no KB", PREP_TIMEOUT)
+            return router.keyword_route(prompt), None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AIChatStreamView(View):
+    """Async twin of AIChatView — POST /chat/stream/, same body, same SSE events.
+
+    Meant to be served by the ASGI app (vendorya_project/asgi.py): while Gemini
+    streams, the turn holds no worker thread, so a few long multi-hop chats
+    can't starve POS requests of sync workers. Auth (DRF + IsSuperAdmin) and
+    turn setup reuse AIChatView on the request's sync thread; tools run via
+    sync_to_async. When the client disconnects Django cancels the response
+    iterator: the partial reply is saved and the tool loop stops.
+    """
+    http_method_names = ['post', 'options']
 
-        names: List[str] = list(_ALWAYS_ON)
-        for group in matched:
-            names.extend(_TOOL_GROUPS[group])
-        return names
+    async def post(self, request):
+        turn = await sync_to_async(self._start)(request)
+        if not isinstance(turn, ChatTurn):
+            return turn
+        return AIChatView._sse_response(self._event_stream(turn))
 
     @staticmethod
-    def _retrieve_kb_context(service, prompt: str, top_k: int = 4) -> Optional[str]:
-        """Embed the prompt, find the most relevant KB chunks, return them as text.
+    def _start(request):
+        """DRF request cycle up to the handler, then AIChatView._start_turn.
+        Returns a ChatTurn or a rendered error response."""
+        view = AIChatView()
+        view.args, view.kwargs = (), {}
+        drf_request = view.initialize_request(request)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        try:
+            view.initial(drf_request)
+            turn = view._start_turn(drf_request)
+        except Exception as exc:  # noqa: BLE001 — DRF maps it (401/403/404/...)
+            turn = view.handle_exception(exc)
+        if isinstance(turn, ChatTurn):
+            return turn
+        response = view.finalize_response(drf_request, turn)
+        response.render()
+        return response
 
-        Returns None (silently) when KB is empty, embedding fails, or no chunk
-        is close enough (distance ≥ 0.5 = less than 50% cosine similarity).
-        This keeps the fast path free when the KB hasn't been populated yet.
-        """
+    @staticmethod
+    async def _event_stream(turn: ChatTurn):
+        yield AIChatView._sse('meta', {'conversation_id': str(turn.conversation.id)})
+        log = _TurnLog()
         try:
-            from .models import AIKnowledgeChunk
-            if not AIKnowledgeChunk.objects.filter(
-                    is_deleted=False, embedding__isnull=False).exists():
-                return None  # KB is empty — skip the embed call entirely
-
-            from .services import GeminiError
-            from pgvector.django import CosineDistance
-            vec = service.embed(prompt)
-            qs = (AIKnowledgeChunk.objects
-                  .filter(is_deleted=False, embedding__isnull=False)
-                  .annotate(distance=CosineDistance('embedding', vec))
-                  .order_by('distance')[:top_k])
-            relevant = [c for c in qs if c.distance < 0.5]
-            if not relevant:
-                return None
-            parts = [f"[{c.source_name}]\n{c.content}" for c in relevant]
-            return '\n\n'.join(parts)
-        except Exception:  # noqa: BLE001 — never break the chat over a KB miss
-            logger.warning("KB retrieval failed for prompt %r", prompt[:60], exc_info=True)
-            return None
+            async for ev in turn.service.chat_stream_async(**turn.stream_kwargs()):
+                if log.record(ev):
+                    yield AIChatView._sse(ev.get('event'), ev)
+        except asyncio.CancelledError:
+            # Client went away. Keep what was streamed (no summary fold), then stop.
+            await asyncio.shield(sync_to_async(AIChatView._finish_turn)(turn, log, summarize=False))
+            raise
+        except Exception as e:  # noqa: BLE001
+            logger.exception("Async chat stream failed")
+            yield AIChatView._sse('error', {'message': str(e)})
+        await sync_to_async(AIChatView._finish_turn)(turn, log)
 
 
 # ---------- knowledge base ----------
@@ -446,10 +457,13 @@ class AIKnowledgeChunkViewSet(viewsets.ModelViewSet):
             return
         chunk = serializer.save()
         try:
-            chunk.embedding = service.embed(chunk.content)
-            chunk.save(update_fields=['embedding'])
+            vector = ingest.embed_texts(service, [chunk.content])[0]
         except GeminiError as e:
             logger.warning("Embedding failed for chunk %s: %s", chunk.id, e)
+            return
+        if vector:
+            chunk.embedding, chunk.embedding_model = vector, ingest.embedding_model()
+            chunk.save(update_fields=['embedding', 'embedding_model'])
 
     @action(detail=False, methods=['post'])
     def upload(self, request):
@@ -458,6 +472,9 @@ class AIKnowledgeChunkViewSet(viewsets.ModelViewSet):
         Accepts multipart/form-data with:
           file       — PDF / DOCX / CSV / TXT
           industries — JSON array or comma-separated string of tags
+
+        Uploading a file name again replaces that document: unchanged chunks
+        and their vectors are kept, only new text is embedded.
         """
         file = request.FILES.get('file')
         if not file:
@@ -481,99 +498,44 @@ class AIKnowledgeChunkViewSet(viewsets.ModelViewSet):
             except (json.JSONDecodeError, ValueError):
                 industries = [t.strip() for t in industries.split(',') if t.strip()]
 
-        text = self._parse_file(file)
-        if not text:
+        # Parsed and chunked lazily; create_job writes the chunks in batches.
+        # Embeddings are computed in batches on a background job the KB tab
+        # polls via /kb/jobs/{id}/.
+        chunks = chunking.chunk_file(file)
+        first = next(chunks, None)
+        if first is None:
             return Response({'error': 'Could not extract text from the file.'},
                             status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        job = ingest.create_job(file.name, itertools.chain([first], chunks), source_type='document',
+                                industries=industries, replace=True, user=request.user)
+        ingest.start_job(job)
 
-        chunks = self._chunk_text(text)
-        service, _ = _gemini_or_error()
-
-        created_ids = []
-        for idx, chunk_text in enumerate(chunks):
-            chunk = AIKnowledgeChunk.objects.create(
-                source_name=file.name,
-                source_type='document',
-                chunk_index=idx,
-                content=chunk_text,
-                industries=industries,
-            )
-            if service:
-                try:
-                    chunk.embedding = service.embed(chunk_text)
-                    chunk.save(update_fields=['embedding'])
-                except GeminiError as e:
-                    logger.warning("Embedding skipped for chunk %s: %s", chunk.id, e)
-            created_ids.append(str(chunk.id))
-
-        return Response({'created': len(created_ids), 'ids': created_ids},
+        return Response({'created': job.total, 'skipped': job.skipped, 'ids': job.chunk_ids,
+                         'job': AIIngestJobSerializer(job).data},
                         status=status.HTTP_201_CREATED)
 
-    @staticmethod
-    def _parse_file(file) -> str:
-        name = (file.name or '').lower()
-        raw = file.read()
-
-        if name.endswith('.txt'):
-            return raw.decode('utf-8', errors='ignore')
-
-        if name.endswith('.csv'):
-            import csv
-            import io
-            text = raw.decode('utf-8', errors='ignore')
-            reader = csv.reader(io.StringIO(text))
-            return '\n'.join(', '.join(row) for row in reader)
-
-        if name.endswith('.pdf'):
-            try:
-                from pypdf import PdfReader
-                import io
-                reader = PdfReader(io.BytesIO(raw))
-                pages = [p.extract_text() or '' for p in reader.pages]
-                return '\n\n'.join(pages)
-            except Exception as e:
-                logger.warning("PDF parse failed: %s", e)
-                return ''
-
-        if name.endswith('.docx'):
-            try:
-                from docx import Document
-                import io
-                doc = Document(io.BytesIO(raw))
-                return '\n'.join(p.text for p in doc.paragraphs if p.text.strip())
-            except Exception as e:
-                logger.warning("DOCX parse failed: %s", e)
-                return ''
-
-        # Fallback: try UTF-8 plain text.
-        return raw.decode('utf-8', errors='ignore')
-
-    @staticmethod
-    def _chunk_text(text: str, chunk_size: int = 1200) -> list:
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        if not paragraphs:
-            return [text[:chunk_size]] if text.strip() else []
-
-        chunks = []
-        current: list = []
-        current_len = 0
-
-        for para in paragraphs:
-            if current_len + len(para) > chunk_size and current:
-                chunks.append('\n\n'.join(current))
-                current = [para]
-                current_len = len(para)
-            else:
-                current.append(para)
-                current_len += len(para)
-
-        if current:
-            chunks.append('\n\n'.join(current))
-
-        return chunks
+    @action(detail=False, methods=['get', 'post'])
+    def reembed(self, request):
+        """GET: how many chunks carry vectors of another embedding model.
+        POST: re-embed them with the current one on a background job."""
+        stale = ingest.stale_chunks().count()
+        if request.method == 'GET' or not stale:
+            return Response({'model': ingest.embedding_model(), 'stale': stale})
+        job = ingest.reembed_job(user=request.user)
+        ingest.start_job(job)
+        return Response({'model': ingest.embedding_model(), 'stale': stale,
+                         'job': AIIngestJobSerializer(job).data},
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[0-9a-f-]{36})')
+    def jobs(self, request, job_id=None):
+        job = get_object_or_404(AIIngestJob, pk=job_id)
+        return Response(AIIngestJobSerializer(job).data)
 
     @action(detail=False, methods=['post'])
     def search(self, request):
+        """Hybrid (lexical + vector, RRF) search by default; `mode` may also be
+        'vector' or 'lexical' to compare the arms."""
         query = (request.data.get('query') or '').strip()
         if not query:
             return Response({'error': 'query is required.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -583,29 +545,41 @@ class AIKnowledgeChunkViewSet(viewsets.ModelViewSet):
             return Response({'error': 'limit must be an integer.'},
                             status=status.HTTP_400_BAD_REQUEST)
         limit = max(1, min(limit, 50))   # clamp to a sane range
+        mode = request.data.get('mode') or 'hybrid'
+        if mode not in ('hybrid', 'vector', 'lexical'):
+            return Response({'error': "mode must be 'hybrid', 'vector' or 'lexical'."},
+                            status=status.HTTP_400_BAD_REQUEST)
         industries = request.data.get('industries') or []
+        if isinstance(industries, str):
+            industries = [t.strip() for t in industries.split(',') if t.strip()]
+        industries = industries or None
 
-        service, err = _gemini_or_error()
-        if err:
-            return err
-        try:
-            vec = service.embed(query)
-        except GeminiError as e:
-            return Response({'error': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+        if mode == 'lexical':
+            hits = [retrieval.Hit(pk, rank, i, None) for i, (pk, rank)
+                    in enumerate(retrieval.lexical(query, limit, industries), 1)]
+        else:
+            service, err = _gemini_or_error()
+            if err:
+                return err
+            try:
+                vec = retrieval.embed_prompt(service, query)
+            except GeminiError as e:
+                return Response({'error': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+            if mode == 'hybrid':
+                hits = retrieval.hybrid(query, vec, limit, industries)
+            else:
+                hits = [retrieval.Hit(pk, 1 - distance, None, distance)
+                        for pk, distance in retrieval.nearest(vec, limit, industries)]
 
-        from pgvector.django import CosineDistance
-        qs = AIKnowledgeChunk.objects.filter(is_deleted=False, embedding__isnull=False)
-        if industries:
-            qs = qs.filter(industries__overlap=industries)
-        qs = (qs
-              .annotate(distance=CosineDistance('embedding', vec))
-              .order_by('distance')[:limit])
+        chunks = {str(c.pk): c for c in AIKnowledgeChunk.objects.filter(pk__in=[h.id for h in hits])}
         return Response([
             {
-                **AIKnowledgeChunkSerializer(c).data,
-                'distance': float(c.distance),
+                **AIKnowledgeChunkSerializer(chunks[h.id]).data,
+                'score': h.score,
+                'lexical_rank': h.lexical_rank,
+                'distance': h.distance,
             }
-            for c in qs
+            for h in hits if h.id in chunks
         ])
 
 
@@ -628,155 +602,40 @@ class AIToolListView(APIView):
         ])
 
 
-# ---------- V-Agent: store-level AI insights ----------
+# ---------- usage metering ----------
 
-class VAInsightsView(APIView):
-    """Store-scoped AI insight widget. Reads only request.user.store — no cross-store access.
+class AIUsageStatsView(APIView):
+    """Sudo-only: where chat time and tokens go, from AIUsageMetric rows.
 
-    GET /api/admin-ai/vagent/insights/
-    Returns {"insights": [{type, title, body}, ...]} — 4 items, Egyptian Arabic.
+    GET /api/admin/ai/usage/?days=7 (1-90). Returns turn / hop / tool totals,
+    latency (avg + p95, time to first token), and breakdowns by model, by tool
+    (duration, errors, rows, result bytes) and the most token-hungry turns.
     """
-    permission_classes = [IsAuthenticated]
-
-    PROFILE_NAME = 'V-Agent'
-
-    SYSTEM_PROMPT = """أنت V-Agent، مساعد ذكاء اصطناعي متخصص في تحليل بيانات المتاجر وإعطاء نصائح تجارية عملية ومفيدة.
-
-قواعد ثابتة:
-- تكلم بالعربية المصرية الواضحة مباشرةً لصاحب المتجر
-- كل نصيحة: عنوان قصير (5 كلمات أقصى) + 2-3 جمل عملية فقط
-- تنوع في النصائح في كل مرة، لا تكرر نفس النوع مرتين في نفس الرد
-- استند على الأرقام الحقيقية من البيانات المقدمة
-- أسلوب ودي، مشجع، ومباشر
-
-أنواع النصائح المتاحة (اختار 4 أنواع مختلفة في كل رد):
-• top_product — تحليل الأكثر مبيعاً وكيف تزيد الاستفادة منه
-• best_customer — أفضل العملاء وأفكار لمكافأتهم والاحتفاظ بهم
-• bundle_idea — اقتراح باقة أو عرض تجميعي بناءً على المنتجات
-• marketing — فكرة تسويقية مناسبة للمنتجات والموسم الحالي
-• stock_alert — تنبيه مخزون منخفض وأولوية الشراء
-• slow_mover — منتج راكد وطريقة ذكية لتصريفه
-• trend — مقارنة المبيعات واتجاه النمو أو التراجع
-
-رد بـ JSON فقط بدون أي نص خارجه — بالضبط 4 عناصر بهذا الشكل:
-[{"type":"top_product","title":"عنوان قصير","body":"النصيحة هنا"},{"type":"...","title":"...","body":"..."},...]"""
-
-    def _get_or_create_profile(self) -> "AIProfile":
-        profile, _ = AIProfile.objects.get_or_create(
-            name=self.PROFILE_NAME,
-            defaults={
-                'is_active': False,
-                'system_instruction': self.SYSTEM_PROMPT,
-                'model_id': 'gemini-2.5-flash',
-                'temperature': 0.9,
-                'max_output_tokens': 1200,
-                'enabled_tools': [],
-                'global_knowledge': False,
-            },
-        )
-        return profile
-
-    def _gather_context(self, store) -> str:
-        from datetime import date, timedelta
-        from django.db.models import Count, F, Sum
-
-        from django.utils import timezone as tz
-        from finance.models import SalesInvoice, SalesInvoiceItem
-        from inventory.models import StockLevel, StorageStock
-        from users.models import Customer
-
-        now   = tz.now()
-        ago30 = now - timedelta(days=30)
-        ago60 = now - timedelta(days=60)
-
-        posted = SalesInvoice.Status.POSTED
-
-        top_products = list(
-            SalesInvoiceItem.objects
-            .filter(
-                invoice__store=store, invoice__status=posted,
-                invoice__date__gte=ago30,
-            )
-            .values('variant__product__name')
-            .annotate(qty=Sum('quantity'), rev=Sum(F('quantity') * F('unit_price')))
-            .order_by('-qty')[:6]
-        )
-
-        top_customers = list(
-            SalesInvoice.objects
-            .filter(
-                store=store, status=posted, date__gte=ago30,
-                is_deleted=False, customer__isnull=False,
-            )
-            .values('customer__name')
-            .annotate(spent=Sum('grand_total'), visits=Count('id'))
-            .order_by('-spent')[:4]
-        )
-
-        now_sales = SalesInvoice.objects.filter(
-            store=store, status=posted, date__gte=ago30, is_deleted=False,
-        ).aggregate(total=Sum('grand_total'), cnt=Count('id'))
-
-        prev_sales = SalesInvoice.objects.filter(
-            store=store, status=posted,
-            date__gte=ago60, date__lt=ago30, is_deleted=False,
-        ).aggregate(total=Sum('grand_total'), cnt=Count('id'))
-
-        low_stock = list(
-            StockLevel.objects
-            .filter(
-                variant__product__store=store,
-                variant__is_deleted=False,
-                variant__reorder_level__gt=0,
-                quantity__lte=F('variant__reorder_level'),
-            )
-            .values('variant__product__name', 'quantity', 'variant__reorder_level')[:8]
-        )
+    permission_classes = [IsSuperAdmin]
 
-        storage_items = list(
-            StorageStock.objects
-            .filter(store=store, is_deleted=False, quantity_remaining__gt=0)
-            .values('variant__product__name')
-            .annotate(total=Sum('quantity_remaining'))
-            .order_by('-total')[:5]
-        )
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days') or 7)
+        except (TypeError, ValueError):
+            days = 0
+        if not 1 <= days <= 90:
+            return Response({'error': 'days must be between 1 and 90.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        since = timezone.now() - timedelta(days=days)
+        return Response(dict(metering.summary(since), days=days))
 
-        customer_count = Customer.objects.filter(store=store, is_deleted=False).count()
-
-        lines = [
-            f"اسم المتجر: {store.name}",
-            f"تاريخ اليوم: {now.strftime('%Y-%m-%d')}",
-            "",
-            "=== المبيعات آخر 30 يوم ===",
-            f"الإجمالي: {now_sales['total'] or 0:.2f}  |  الفواتير: {now_sales['cnt'] or 0}",
-            f"الفترة السابقة (60-30 يوم): {prev_sales['total'] or 0:.2f}  |  الفواتير: {prev_sales['cnt'] or 0}",
-            f"إجمالي العملاء: {customer_count}",
-            "",
-            "=== أكثر المنتجات مبيعاً ===",
-        ]
-        for p in top_products:
-            lines.append(f"- {p['variant__product__name']}: {p['qty']} قطعة، إيراد {p['rev']:.2f}")
-
-        lines += ["", "=== أفضل العملاء ==="]
-        if top_customers:
-            for c in top_customers:
-                lines.append(f"- {c['customer__name']}: {c['spent']:.2f} ({c['visits']} زيارة)")
-        else:
-            lines.append("لا توجد مبيعات بعملاء مسجلين في هذه الفترة")
 
-        lines += ["", "=== المخزون المنخفض ==="]
-        if low_stock:
-            for item in low_stock:
-                lines.append(f"- {item['variant__product__name']}: متاح {item['quantity']}، حد الطلب {item['variant__reorder_level']}")
-        else:
-            lines.append("لا توجد منتجات دون حد الطلب")
+# ---------- V-Agent: store-level AI insights ----------
 
-        if storage_items:
-            lines += ["", "=== البضاعة في التخزين ==="]
-            for s in storage_items:
-                lines.append(f"- {s['variant__product__name']}: {s['total']} قطعة")
+class VAInsightsView(APIView):
+    """Store-scoped AI insight widget. Reads only request.user.store — no cross-store access.
 
-        return "\n".join(lines)
+    GET /api/admin-ai/vagent/insights/
+    Returns {"insights": [{type, title, body}, ...], "generated_at": ...} — 4 items,
+    Egyptian Arabic. Served from the store's stored AIStoreInsight row; see
+    admin_ai.insights for when it is regenerated.
+    """
+    permission_classes = [IsAuthenticated]
 
     def get(self, request):
         store = getattr(request.user, 'store', None)
@@ -784,55 +643,10 @@ class VAInsightsView(APIView):
             return Response({'error': 'no store'}, status=400)
 
         try:
-            settings_row = AISettings.load()
-            service = GeminiService(settings_row.gemini_api_key)
-        except (NoApiKey, Exception):
+            items, generated_at = insights.get_insights(store)
+        except NoApiKey:
             return Response({'error': 'AI not configured'}, status=503)
-
-        profile = self._get_or_create_profile()
-        store_context = self._gather_context(store)
-
-        user_prompt = (
-            f"بناءً على بيانات المتجر التالية، قدم 4 نصائح تجارية متنوعة ومفيدة:\n\n"
-            f"{store_context}\n\n"
-            f"تذكر: رد بـ JSON فقط كما هو محدد، 4 عناصر، أنواع مختلفة."
-        )
-
-        try:
-            from google import genai as _genai
-
-            response = service.client.models.generate_content(
-                model=profile.model_id or 'gemini-2.5-flash',
-                contents=user_prompt,
-                config=_genai.types.GenerateContentConfig(
-                    system_instruction=profile.system_instruction or self.SYSTEM_PROMPT,
-                    temperature=profile.temperature if profile.temperature is not None else 0.9,
-                    max_output_tokens=profile.max_output_tokens or 1200,
-                    response_mime_type='application/json',
-                ),
-            )
-
-            raw = response.text or '[]'
-            # Strip markdown fences if present
-            if raw.strip().startswith('```'):
-                raw = raw.strip().lstrip('`').split('\n', 1)[-1].rsplit('```', 1)[0]
-
-            insights = json.loads(raw)
-            if not isinstance(insights, list):
-                raise ValueError("unexpected shape")
-
-            # Normalise and cap at 4
-            clean = [
-                {
-                    'type': str(item.get('type', 'insight')),
-                    'title': str(item.get('title', '')),
-                    'body': str(item.get('body', '')),
-                }
-                for item in insights[:4]
-                if item.get('title') and item.get('body')
-            ]
-            return Response({'insights': clean})
-
         except Exception as e:
             logger.exception("V-Agent insights error: %s", e)
             return Response({'error': str(e)}, status=500)
+        return Response({'insights': items, 'generated_at': generated_at})
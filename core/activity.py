@@ -1,6 +1,45 @@
-"""Helpers for writing ActivityLog entries from API actions."""
+"""Helpers for writing ActivityLog entries from API actions.
+
+log_activity used to INSERT its row on the spot, so every checkout, void and
+bulk operation paid one more round trip (and index update) before answering.
+Entries are now buffered per request and written with one bulk_create when
+the response has been sent (Django's request_finished):
+
+    - inside a transaction the entry joins the buffer when it commits, so a
+      rolled-back change leaves no audit row, as before;
+    - ActivityBufferMiddleware opens the buffer; without it (management
+      commands, threads, views called directly) entries are written at once;
+    - DURABLE_TYPES (staff / credential changes) and `durable=True` calls are
+      written synchronously, inside the caller's transaction;
+    - a buffer reaching MAX_BUFFER entries is flushed early.
+
+stats() reports the buffered gauge, rows written and flush latency for
+GET /api/health/activity/. Counters are per worker process.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+
 from .models import ActivityLog
 
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER = int(os.environ.get('ACTIVITY_LOG_MAX_BUFFER', '200'))
+
+# Written before the request returns, whatever the caller asks for.
+DURABLE_TYPES = {ActivityLog.OperationType.STAFF}
+
+_local = threading.local()
+_lock = threading.Lock()
+_metrics = {
+    'buffered': 0, 'flushes': 0, 'written': 0, 'durable': 0, 'errors': 0,
+    'flush_ms_total': 0.0, 'flush_ms_max': 0.0, 'flush_ms_last': None,
+}
+
 
 def _client_ip(request):
     if not request:
@@ -11,15 +50,89 @@ def _client_ip(request):
     return request.META.get('REMOTE_ADDR')
 
 
-def log_activity(*, request, action, op_type, details=None, store=None):
+# ---------- buffer ----------
+
+def open_buffer():
+    """Start collecting entries for the current request (flushing leftovers)."""
+    flush_buffer()
+    _local.buffer = []
+
+
+def flush_buffer(**kwargs):
+    """Write and close the current request's buffer. request_finished receiver."""
+    entries = getattr(_local, 'buffer', None)
+    _local.buffer = None
+    if entries:
+        with _lock:
+            _metrics['buffered'] -= len(entries)
+        _write(entries)
+
+
+# Django's close_old_connections (request_finished, connected at import of
+# django.db) must run after the flush: otherwise, with CONN_MAX_AGE=0, it closes
+# the connection first and the bulk_create opens a new one that then idles on
+# the worker until the next request. Re-connecting it puts it behind us.
+request_finished.disconnect(close_old_connections)
+request_finished.connect(flush_buffer, dispatch_uid='core.activity.flush_buffer')
+request_finished.connect(close_old_connections)
+
+
+def _write(entries):
+    started = time.perf_counter()
+    try:
+        ActivityLog.all_objects.bulk_create(entries)
+        ok = True
+    except Exception:  # noqa: BLE001 — the response is gone; never fail the caller
+        logger.exception("Dropped %d activity log entries", len(entries))
+        ok = False
+    ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        _metrics['flushes'] += 1
+        _metrics['written' if ok else 'errors'] += len(entries)
+        _metrics['flush_ms_total'] += ms
+        _metrics['flush_ms_max'] = max(_metrics['flush_ms_max'], ms)
+        _metrics['flush_ms_last'] = ms
+
+
+def _enqueue(entry):
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        _write([entry])
+        return
+    buffer.append(entry)
+    with _lock:
+        _metrics['buffered'] += 1
+    if len(buffer) >= MAX_BUFFER:
+        open_buffer()       # flush what is there, keep buffering
+
+
+def stats():
+    """Buffered gauge, rows written / failed and flush latency in ms."""
+    with _lock:
+        m = dict(_metrics)
+    total = m.pop('flush_ms_total')
+    m['flush_ms_avg'] = round(total / m['flushes'], 3) if m['flushes'] else None
+    m['flush_ms_max'] = round(m['flush_ms_max'], 3)
+    if m['flush_ms_last'] is not None:
+        m['flush_ms_last'] = round(m['flush_ms_last'], 3)
+    m['max_buffer'] = MAX_BUFFER
+    return m
+
+
+# ---------- API ----------
+
+def log_activity(*, request, action, op_type, details=None, store=None, durable=False):
     """
-    Create an ActivityLog row for the active request's store + user.
+    Record an ActivityLog row for the active request's store + user.
 
     Pass `store` explicitly only when the request's user has no store attached
     (e.g. a super-admin acting via X-Store-ID where you've already resolved
     the target store some other way). In the common case the helper picks
     `request.user.store`, which our VendoryaJWTAuthentication already swaps
     for the X-Store-ID target when a super-admin is acting on a store.
+
+    The row is buffered (see module notes) unless `durable` is set or the
+    op_type is in DURABLE_TYPES; the returned instance already has its id.
     """
     if request is None:
         return None
@@ -37,7 +150,7 @@ def log_activity(*, request, action, op_type, details=None, store=None):
     if hasattr(op_type, 'value'):
         op_value = op_type.value
 
-    return ActivityLog.objects.create(
+    entry = ActivityLog(
         store=resolved_store,
         user=user,
         operation_type=op_value,
@@ -45,3 +158,12 @@ def log_activity(*, request, action, op_type, details=None, store=None):
         details=details or {},
         ip_address=_client_ip(request),
     )
+    if durable or op_value in DURABLE_TYPES:
+        entry.save()
+        with _lock:
+            _metrics['durable'] += 1
+    elif transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _enqueue(entry), robust=True)
+    else:
+        _enqueue(entry)
+    return entry
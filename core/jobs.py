@@ -0,0 +1,74 @@
+"""Background jobs: a progress row moved along by a daemon thread.
+
+    start(run, job, name)                  -> None   (run(job.pk) on a daemon thread after commit)
+    mark_failed(job, error)                -> None   (FAILED, with the reason and finished_at)
+    orphaned(model, stale_after=None)      -> QUEUED / RUNNING rows nothing has touched lately
+    recover(model, run, fail=False)        -> [pk]   (orphaned jobs re-run in the foreground, or failed)
+
+Job models (admin_ai.AIIngestJob, notifications.BroadcastJob) have a Status
+QUEUED → RUNNING → DONE | FAILED plus `error` and `finished_at`, and their
+runner saves progress as it goes, which keeps `updated_at` fresh. A restart or
+deploy kills the thread mid-job, as Ctrl-C does to a command running one in
+the foreground, and the row stays QUEUED or RUNNING for good. Rows in either
+status untouched for STALE_AFTER are orphaned: `manage.py recover_jobs`
+claims each with a conditional UPDATE (two sweeps never take the same row)
+and runs it again — runners pick up where the previous run stopped — or,
+with --fail, marks it FAILED.
+"""
+import os
+import threading
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+STALE_AFTER = timedelta(minutes=int(os.environ.get('JOB_STALE_MINUTES', '30')))
+
+
+def _run_in_thread(run, job_id):
+    try:
+        run(job_id)
+    finally:
+        connections.close_all()
+
+
+def start(run, job, name) -> None:
+    """Run `run(job.pk)` on a daemon thread once the job row is committed."""
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_thread, args=(run, job.pk), daemon=True, name=f'{name}-{job.pk}',
+    ).start())
+
+
+def mark_failed(job, error) -> None:
+    job.status = job.Status.FAILED
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+
+
+def orphaned(model, stale_after=None):
+    cutoff = timezone.now() - (stale_after or STALE_AFTER)
+    return (model.objects
+            .filter(status__in=[model.Status.QUEUED, model.Status.RUNNING], updated_at__lt=cutoff)
+            .order_by('created_at'))
+
+
+def recover(model, run, fail=False, stale_after=None):
+    """Re-run every orphaned job of `model` (or fail it). Returns their ids."""
+    taken = []
+    for job in orphaned(model, stale_after):
+        now = timezone.now()
+        if fail:
+            changes = {'status': model.Status.FAILED, 'finished_at': now,
+                       'error': f'Interrupted while {job.status.lower()} (worker stopped).'}
+        else:
+            changes = {'status': model.Status.QUEUED}
+        claimed = (model.objects
+                   .filter(pk=job.pk, status=job.status, updated_at=job.updated_at)
+                   .update(updated_at=now, **changes))
+        if not claimed:
+            continue
+        taken.append(job.pk)
+        if not fail:
+            run(job.pk)
+    return taken
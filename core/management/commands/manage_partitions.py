@@ -0,0 +1,66 @@
+"""Monthly partition maintenance for ActivityLog and Notification.
+
+Creates the coming months' partitions ahead of time (core.partitions), so
+inserts land in their month instead of the default partition. Rows that did
+land in the default partition move into the month when it is created. Run it
+MANUALLY or from cron, monthly is enough — there is no scheduler wired.
+
+    manage.py manage_partitions                    # through 3 months ahead
+    manage.py manage_partitions --months-ahead 6
+    manage.py manage_partitions --list             # partitions and row estimates
+
+Retention is separate: purge_old_activity_logs / purge_old_notifications drop
+the expired months.
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import partitions
+
+# (app_label.Model, partition column)
+PARTITIONED = [
+    ('core.ActivityLog', 'timestamp'),
+    ('notifications.Notification', 'created_at'),
+]
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions of ActivityLog and Notification."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help="Months after the current one to create (default 3).")
+        parser.add_argument('--list', action='store_true',
+                            help="List partitions with estimated row counts, change nothing.")
+
+    def handle(self, *args, **options):
+        ahead = options['months_ahead']
+        if ahead < 0:
+            raise CommandError("--months-ahead must be >= 0")
+        now = partitions.month_start(timezone.now())
+
+        for label, column in PARTITIONED:
+            table = apps.get_model(label)._meta.db_table
+            if options['list']:
+                self._list(table)
+                continue
+            with transaction.atomic():
+                created = partitions.ensure(connection, table, column, now,
+                                            partitions.add_months(now, ahead))
+            if created:
+                self.stdout.write(self.style.SUCCESS(f"{table}: created {', '.join(created)}"))
+            else:
+                self.stdout.write(f"{table}: up to date")
+
+    def _list(self, table):
+        names = [p.name for p in partitions.monthly(connection, table)]
+        names.append(table + partitions.DEFAULT_SUFFIX)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)", [names])
+            estimates = dict(cursor.fetchall())
+        self.stdout.write(table)
+        for name in names:
+            self.stdout.write(f"  {name:45} ~{max(estimates.get(name, 0), 0)} rows")
@@ -7,16 +7,22 @@ manual-over-automation preference) — there is no scheduler wired.
     manage.py purge_old_activity_logs              # default: keep 2 years
     manage.py purge_old_activity_logs --years 1
     manage.py purge_old_activity_logs --days 90
+    manage.py purge_old_activity_logs --archive    # detach old months, keep them as tables
     manage.py purge_old_activity_logs --dry-run    # report only, delete nothing
 
-Deletes in batches to avoid locking a huge table in one transaction.
+The table is partitioned by month (core.partitions): months wholly before the
+cutoff are dropped (or detached with --archive) in one statement each, whatever
+their size. The rest — the month the cutoff falls in, and rows in the default
+partition — is deleted in batches.
 """
 
 from datetime import timedelta
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 
+from core import partitions
 from core.models import ActivityLog
 
 
@@ -30,6 +36,8 @@ class Command(BaseCommand):
                             help="Retention in days (overrides --years if both given).")
         parser.add_argument('--batch-size', type=int, default=5000,
                             help="Rows deleted per batch (default 5000).")
+        parser.add_argument('--archive', action='store_true',
+                            help="Detach expired monthly partitions instead of dropping them.")
         parser.add_argument('--dry-run', action='store_true',
                             help="Report how many rows would be deleted, delete nothing.")
 
@@ -48,18 +56,26 @@ class Command(BaseCommand):
             cutoff = timezone.now() - timedelta(days=yrs * 365)
             window = f"{yrs} year(s)"
 
-        qs = ActivityLog.all_objects.filter(timestamp__lt=cutoff)
-        total = qs.count()
+        table = ActivityLog._meta.db_table
+        expired = [p for p in partitions.monthly(connection, table) if p.end <= cutoff]
+        verb = 'detached' if options['archive'] else 'dropped'
 
         if options['dry_run']:
+            total = ActivityLog.all_objects.filter(timestamp__lt=cutoff).count()
+            names = ', '.join(p.name for p in expired) or 'none'
             self.stdout.write(self.style.WARNING(
-                f"[dry-run] {total} log(s) older than {window} (before {cutoff:%Y-%m-%d}) would be deleted."
+                f"[dry-run] {total} log(s) older than {window} (before {cutoff:%Y-%m-%d}) would be deleted; "
+                f"monthly partitions {verb}: {names}."
             ))
             return
 
-        if total == 0:
-            self.stdout.write(f"No logs older than {window} (before {cutoff:%Y-%m-%d}). Nothing to do.")
-            return
+        for part in expired:
+            with transaction.atomic():
+                if options['archive']:
+                    partitions.detach(connection, table, part.name)
+                else:
+                    partitions.drop(connection, part.name)
+            self.stdout.write(f"  {verb} {part.name}")
 
         batch = options['batch_size']
         deleted = 0
@@ -72,5 +88,6 @@ class Command(BaseCommand):
             deleted += len(ids)
 
         self.stdout.write(self.style.SUCCESS(
-            f"Purged {deleted} log(s) older than {window} (before {cutoff:%Y-%m-%d})."
+            f"Purged logs older than {window} (before {cutoff:%Y-%m-%d}): {len(expired)} monthly "
+            f"partition(s) {verb}, {deleted} remaining log(s) deleted."
         ))
@@ -0,0 +1,61 @@
+"""Finish background jobs a restart left behind.
+
+Ingest and broadcast jobs run on daemon threads of the web process
+(core.jobs); a restart or deploy — or Ctrl-C on kb_reembed /
+ingest_erp_catalog — leaves their rows QUEUED or RUNNING with nothing to
+finish them. This finds rows in those states
+untouched for longer than the stale window and runs them again here, in the
+foreground (they resume, finished work is not repeated), or fails them. Run it
+MANUALLY after a restart, or from cron — there is no scheduler wired.
+
+    manage.py recover_jobs --dry-run        # list orphaned jobs only
+    manage.py recover_jobs                  # re-run them
+    manage.py recover_jobs --fail           # mark them FAILED instead
+    manage.py recover_jobs --minutes 5      # stale window (default JOB_STALE_MINUTES, 30)
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core import jobs
+
+# (app_label.Model, dotted path of its runner)
+JOBS = [
+    ('admin_ai.AIIngestJob', 'admin_ai.ingest.run_job'),
+    ('notifications.BroadcastJob', 'notifications.broadcast.run_job'),
+]
+
+
+class Command(BaseCommand):
+    help = "Re-run (or fail) background jobs left QUEUED / RUNNING by a restart."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=None,
+                            help="Jobs untouched this long are orphaned (default JOB_STALE_MINUTES).")
+        parser.add_argument('--fail', action='store_true',
+                            help="Mark orphaned jobs FAILED instead of running them again.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="List orphaned jobs, change nothing.")
+
+    def handle(self, *args, **options):
+        minutes = options['minutes']
+        if minutes is not None and minutes < 1:
+            raise CommandError("--minutes must be >= 1")
+        stale_after = timedelta(minutes=minutes) if minutes else None
+
+        for label, runner in JOBS:
+            model = apps.get_model(label)
+            if options['dry_run']:
+                for job in jobs.orphaned(model, stale_after):
+                    self.stdout.write(f"{label} {job.pk}: {job.status} since {job.updated_at:%Y-%m-%d %H:%M}")
+                continue
+            taken = jobs.recover(model, import_string(runner), fail=options['fail'],
+                                 stale_after=stale_after)
+            if not taken:
+                self.stdout.write(f"{label}: nothing to recover")
+                continue
+            for job in model.objects.filter(pk__in=taken).order_by('created_at'):
+                line = f"{label} {job.pk}: {job.status}"
+                self.stdout.write(f"{line} — {job.error}" if job.error else line)
@@ -1,4 +1,5 @@
-"""Per-request middleware for tenant scoping."""
+"""Per-request middleware: tenant scoping, buffered activity logging."""
+from .activity import open_buffer
 from .tenancy import set_current_request, clear_current_request
 
 
@@ -21,3 +22,15 @@ class TenantContextMiddleware:
             return self.get_response(request)
         finally:
             clear_current_request()
+
+
+class ActivityBufferMiddleware:
+    """Collects the request's log_activity entries; core.activity writes them
+    with one bulk_create once the response has been sent (request_finished)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        open_buffer()
+        return self.get_response(request)
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from core import partitions
+
+
+def partition(apps, schema_editor):
+    partitions.partition_table(schema_editor.connection, 'core_activitylog', 'timestamp')
+
+
+class Migration(migrations.Migration):
+    """ActivityLog becomes monthly range partitions on `timestamp` (core.partitions).
+    Irreversible: there is no un-partition step."""
+
+    dependencies = [
+        ('core', '0027_storesettings_lockscreen'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition),
+    ]
@@ -178,7 +178,11 @@ class Branch(TimestampedModel, SoftDeleteModel):
 
 # --- AUDIT LOGS ---
 class ActivityLog(models.Model):
-    """Tracks user actions for security and auditing."""
+    """Tracks user actions for security and auditing.
+
+    Stored as monthly partitions on `timestamp` (core.partitions); retention
+    drops whole months (purge_old_activity_logs).
+    """
 
     class OperationType(models.TextChoices):
         SALE       = 'SALE',       _('Sale')
@@ -0,0 +1,57 @@
+"""Collect items during a transaction, hand them over once it commits.
+
+    batch_on_commit(flush, item, key=None)
+
+Signal handlers that want "do this after commit" for many rows (search
+re-indexing, notifications) register one callback per transaction instead of
+one per row: items go into a batch that transaction.on_commit calls as
+`flush(items)`. With `key`, an item whose key is already in the batch is
+skipped. Outside a transaction `flush([item])` runs at once.
+
+There is one batch per atomic() level (connection.savepoint_ids), so items
+queued under a savepoint that rolls back never reach flush. Django drops the
+on_commit callbacks of a rolled-back transaction or savepoint, and the batch
+is referenced only from there: the registry below holds weak references, so a
+dropped batch disappears with its items and keys, and the next item starts a
+fresh one instead of joining (or being deduplicated against) a dead batch.
+"""
+import threading
+import weakref
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+class _Batch:
+    __slots__ = ('flush', 'items', 'keys', '__weakref__')
+
+    def __init__(self, flush):
+        self.flush = flush
+        self.items = []
+        self.keys = set()
+
+    def __call__(self):
+        self.flush(self.items)
+
+
+def batch_on_commit(flush, item, key=None, using=None):
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        flush([item])
+        return
+    registry = _local.__dict__.setdefault('batches', {})
+    slot = (flush, connection.alias, tuple(connection.savepoint_ids))
+    ref = registry.get(slot)
+    batch = ref() if ref is not None else None
+    if batch is None:
+        for dead in [s for s, r in registry.items() if r() is None]:
+            del registry[dead]
+        batch = _Batch(flush)
+        registry[slot] = weakref.ref(batch)
+        transaction.on_commit(batch, using=using, robust=True)
+    if key is not None:
+        if key in batch.keys:
+            return
+        batch.keys.add(key)
+    batch.items.append(item)
@@ -0,0 +1,146 @@
+"""Monthly range partitioning of append-mostly tables (Postgres).
+
+    partition_table(connection, table, column)         -> converts a plain table (migrations)
+    monthly(connection, table)                         -> [Partition] oldest first
+    ensure(connection, table, column, first, last)     -> [names] months created
+    detach(connection, table, name) / drop(connection, name)
+
+ActivityLog (by `timestamp`) and Notification (by `created_at`) are stored as
+one partition per calendar month (UTC), `<table>_pYYYYMM`, plus a
+`<table>_default` partition catching rows no month covers yet, so an insert
+never fails because maintenance fell behind. `manage.py manage_partitions`
+creates the coming months ahead of time; ensure() moves rows that already
+landed in the default partition into the new month before attaching it.
+
+Retention drops (or detaches) whole months — instant whatever their size, no
+dead tuples to vacuum — and time-filtered queries scan only the months they
+touch. Postgres wants the partition key in every unique index, so these tables
+have PRIMARY KEY (id, <column>) in the database; Django still treats `id` as
+the key (UUIDs), and foreign keys to them are db_constraint=False.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+from typing import List, NamedTuple
+
+DEFAULT_SUFFIX = '_default'
+_MONTH_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+class Partition(NamedTuple):
+    name: str
+    start: datetime
+    end: datetime
+
+
+def month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(dt_timezone.utc) if moment.tzinfo else moment
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+def _literal(moment: datetime) -> str:
+    return f"'{moment:%Y-%m-%d %H:%M:%S}+00'"
+
+
+def monthly(connection, table: str) -> List[Partition]:
+    """The table's monthly partitions, oldest first (the default one excluded)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass", [table])
+        names = [row[0] for row in cursor.fetchall()]
+    parts = []
+    for name in names:
+        match = _MONTH_NAME.search(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            parts.append(Partition(name, start, add_months(start, 1)))
+    return sorted(parts, key=lambda p: p.start)
+
+
+def ensure(connection, table: str, column: str, first: datetime, last: datetime) -> List[str]:
+    """Create the missing monthly partitions from `first`'s month to `last`'s."""
+    qn = connection.ops.quote_name
+    existing = {p.name for p in monthly(connection, table)}
+    created = []
+    month, stop = month_start(first), month_start(last)
+    while month <= stop:
+        name = partition_name(table, month)
+        if name not in existing:
+            start, end = _literal(month), _literal(add_months(month, 1))
+            with connection.cursor() as cursor:
+                # Built detached so rows already in the default partition for
+                # this month can move in first; ATTACH then builds the indexes.
+                cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {qn(table + DEFAULT_SUFFIX)} '
+                    f'WHERE {qn(column)} >= {start} AND {qn(column)} < {end} RETURNING *) '
+                    f'INSERT INTO {qn(name)} SELECT * FROM moved')
+                cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} '
+                               f'FOR VALUES FROM ({start}) TO ({end})')
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def detach(connection, table: str, name: str) -> None:
+    """Detach a partition; it stays as a standalone table (archive)."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+
+
+def drop(connection, name: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+
+
+def partition_table(connection, table: str, column: str, months_ahead: int = 3) -> None:
+    """Rebuild a plain table as a monthly-partitioned one, keeping its name,
+    columns, indexes, foreign keys and rows. Runs inside the migration's
+    transaction; the copy is proportional to the table size."""
+    qn = connection.ops.quote_name
+    old = f'{table}_unpartitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(old)}')
+        cursor.execute(f'ALTER TABLE {qn(old)} RENAME CONSTRAINT {qn(table + "_pkey")} '
+                       f'TO {qn(old + "_pkey")}')
+        cursor.execute(f'CREATE TABLE {qn(table)} (LIKE {qn(old)} INCLUDING DEFAULTS) '
+                       f'PARTITION BY RANGE ({qn(column)})')
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + "_pkey")} '
+                       f'PRIMARY KEY (id, {qn(column)})')
+
+        cursor.execute(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass AND NOT i.indisprimary", [old])
+        on_old = re.compile(r' ON (ONLY )?((?:\S+\.)?)"?' + re.escape(old) + r'"? ')
+        for position, (name, definition) in enumerate(cursor.fetchall()):
+            cursor.execute(f'ALTER INDEX {qn(name)} RENAME TO {qn(f"{old}_idx{position}")}')
+            cursor.execute(on_old.sub(lambda m: f' ON {m.group(2)}{qn(table)} ', definition, count=1))
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [old])
+        for position, (name, definition) in enumerate(cursor.fetchall()):
+            cursor.execute(f'ALTER TABLE {qn(old)} RENAME CONSTRAINT {qn(name)} '
+                           f'TO {qn(f"{old}_fk{position}")}')
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+        cursor.execute(f'CREATE TABLE {qn(table + DEFAULT_SUFFIX)} PARTITION OF {qn(table)} DEFAULT')
+        cursor.execute(f'SELECT MIN({qn(column)}) FROM {qn(old)}')
+        oldest = cursor.fetchone()[0]
+
+    now = datetime.now(dt_timezone.utc)
+    ensure(connection, table, column, oldest or now, add_months(month_start(now), months_ahead))
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(old)}')
+        cursor.execute(f'DROP TABLE {qn(old)}')
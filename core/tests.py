@@ -1,3 +1,96 @@
-from django.test import TestCase
+from django.db import transaction
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from core import activity
+from core.activity import log_activity
+from core.oncommit import batch_on_commit
+from core.models import ActivityLog, Store
+from users.models import User
+
+
+class ActivityBufferTests(TestCase):
+    """log_activity buffers per request and writes once; STAFF entries at once."""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_al', password='x')
+        self.store = Store.objects.create(name='AL', store_code='140', owner=owner)
+        self.request = RequestFactory().post('/x')
+        self.request.user = owner
+
+    def _count(self):
+        return ActivityLog.all_objects.filter(store=self.store).count()
+
+    def _log(self, op_type, **kwargs):
+        return log_activity(request=self.request, action='a', op_type=op_type,
+                            store=self.store, **kwargs)
+
+    def test_buffered_until_request_finished(self):
+        activity.open_buffer()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._log(ActivityLog.OperationType.SALE)
+            self._log(ActivityLog.OperationType.SALE)
+        self.assertEqual(self._count(), 0)
+        self.assertEqual(activity.stats()['buffered'], 2)
+        activity.flush_buffer()
+        self.assertEqual(self._count(), 2)
+        self.assertEqual(activity.stats()['buffered'], 0)
+
+    def test_durable_types_skip_the_buffer(self):
+        activity.open_buffer()
+        try:
+            self._log(ActivityLog.OperationType.STAFF)
+            self._log(ActivityLog.OperationType.OTHER, durable=True)
+            self.assertEqual(self._count(), 2)
+        finally:
+            activity.flush_buffer()
+
+
+    def test_request_through_the_middleware_writes_its_rows(self):
+        from django.core.signals import request_finished
+        from django.db import close_old_connections
+        from rest_framework.test import APIClient
+        from inventory.models import Product
+
+        owner = self.request.user
+        owner.store, owner.role = self.store, User.Role.OWNER
+        owner.save()
+        product = Product.objects.create(store=self.store, name='Mug')
+        client = APIClient()
+        client.force_authenticate(user=owner)
+        r = client.post(f'/api/inventory/products/{product.pk}/toggle_ghost/')
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(activity.stats()['buffered'], 0)
+
+        # Flushed before Django closes the request's connection.
+        receivers = [ref() for _key, ref, *_ in request_finished.receivers]
+        self.assertLess(receivers.index(activity.flush_buffer),
+                        receivers.index(close_old_connections))
+
+
+class BatchOnCommitTests(TestCase):
+    """Keys deduplicated per transaction; a rollback leaves nothing behind."""
+
+    def setUp(self):
+        self.flushed = []
+
+    def _flush(self, items):
+        self.flushed.append(list(items))
+
+    def test_one_flush_per_transaction_with_dedupe(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for key in ('a', 'b', 'a'):
+                batch_on_commit(self._flush, key, key=key)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.flushed, [['a', 'b']])
+
+    def test_rolled_back_keys_do_not_suppress_later_ones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    batch_on_commit(self._flush, 'a', key='a')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            batch_on_commit(self._flush, 'a', key='a')
+        self.assertEqual(self.flushed, [['a']])
@@ -5,7 +5,7 @@ from .views import (
     ActivityLogMetaView, DashboardView, DashboardWidgetConfigView, CurrencyViewSet,
     LabelPresetViewSet, QZTrayCertView, QZTraySignView,
     LockscreenLogoView, LockscreenPinView, LockscreenFactsView,
-    NavSearchView,
+    NavSearchView, GlobalSearchView,
 )
 
 router = DefaultRouter()
@@ -27,5 +27,6 @@ urlpatterns = [
     path('lockscreen/pin/',      LockscreenPinView.as_view(),   name='lockscreen-pin'),
     path('lockscreen/facts/',    LockscreenFactsView.as_view(), name='lockscreen-facts'),
     path('nav-search/',          NavSearchView.as_view(),       name='nav-search'),
+    path('global-search/',       GlobalSearchView.as_view(),    name='global-search'),
     path('', include(router.urls)),
 ]
@@ -241,6 +241,35 @@ class NavSearchView(APIView):
         return Response(results[:10])
 
 
+class GlobalSearchView(APIView):
+    """GET /api/core/global-search/?q=... — one ranked search across products,
+    customers, suppliers, invoices, purchases and service tickets (§SEARCH-GLOBAL).
+
+    Queries the store-scoped Typesense entities index; entity types the user's
+    role can't list are filtered out in the query itself. Falls back to a few
+    bounded DB lookups (5 per type) if Typesense is unconfigured or degraded.
+    Returns [{type, id, title, subtitle, path}].
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from search import entities
+        from users.permissions import has_min_role
+        q = (request.query_params.get('q') or '').strip()
+        store = request.user.store
+        if len(q) < 2 or not store:
+            return Response([])
+        types = [t for t, (_path, _rank, role) in entities.ENTITY_TYPES.items()
+                 if has_min_role(request.user, role)]
+        try:
+            from search.client import is_configured
+            if is_configured():
+                return Response(entities.search_entities(str(store.id), q, types))
+        except Exception:
+            pass
+        return Response(entities.search_entities_db(store, q, types))
+
+
 class StoreSettingsView(APIView):
     """GET = manager+, PATCH = owner only."""
 
@@ -808,6 +837,43 @@ class HealthView(APIView):
         return Response({'status': s, 'db': db_ok, 'ts': timezone.now().isoformat()}, status=code)
 
 
+class SearchHealthView(APIView):
+    """GET /api/health/search/ — Typesense breaker state + fallback rate.
+
+    Always 200: search keeps working on pg_trgm when Typesense is degraded, so an
+    open breaker is 'degraded', not down. Counters are per worker process.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        from search import cache as search_cache
+        from search.breaker import OPEN, typesense_breaker
+        from search.client import is_configured
+        breaker = typesense_breaker.stats()
+        if not is_configured():
+            s = 'unconfigured'
+        else:
+            s = 'degraded' if breaker['state'] == OPEN else 'ok'
+        return Response({
+            'status': s,
+            'typesense': breaker,
+            'autocomplete_cache': search_cache.stats(),
+            'ts': timezone.now().isoformat(),
+        })
+
+
+class ActivityHealthView(APIView):
+    """GET /api/health/activity/ — buffered ActivityLog writer: entries waiting,
+    rows written / failed, flush latency. Counters are per worker process."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        from .activity import stats
+        return Response({'activity_log': stats(), 'ts': timezone.now().isoformat()})
+
+
 # ── QZ Tray certificate signing ──────────────────────────────────────────────
 
 def _load_private_key():
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_supplierpayment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(fields=['store', 'updated_at'], name='sales_invoice_store_updated'),
+        ),
+    ]
@@ -100,6 +100,13 @@ class SalesInvoice(TimestampedModel, SoftDeleteModel):
 
     objects = TenantSoftDeleteManager()   # secure-by-default; .all_objects = unscoped
 
+    class Meta:
+        ordering = ['-updated_at', '-created_at']
+        indexes = [
+            # admin_ai.insights.data_version: latest change per store.
+            models.Index(fields=['store', 'updated_at'], name='sales_invoice_store_updated'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.status == self.Status.POSTED and not self.invoice_number:
             with transaction.atomic():
@@ -469,6 +476,82 @@ def customer_outstanding(customer, exclude_invoice_id=None):
     return total
 
 
+def annotate_customer_outstanding(qs, name='outstanding'):
+    """customer_outstanding() for a whole Customer queryset, as one annotation.
+
+    Same figure (opening seed + Σ posted, non-deleted invoices' grand_total −
+    paid_amount − non-deleted refunds), computed by two correlated subqueries
+    so lists can filter, order and slice by balance in SQL instead of calling
+    customer_outstanding() once per row.
+    """
+    from django.db.models import F, OuterRef, Q, Subquery, Value, DecimalField
+    from django.db.models.functions import Coalesce
+    DEC = DecimalField(max_digits=14, decimal_places=2)
+    ZERO = Value(Decimal('0'), output_field=DEC)
+    posted = Q(status=SalesInvoice.Status.POSTED, is_deleted=False)
+    invoice_net = (
+        SalesInvoice.all_objects.filter(posted, customer=OuterRef('pk'))
+        .order_by().values('customer')
+        .annotate(t=Sum(Coalesce('grand_total', ZERO) - Coalesce('paid_amount', ZERO),
+                        output_field=DEC))
+        .values('t')
+    )
+    refunded = (
+        RefundInvoice.all_objects.filter(
+            is_deleted=False,
+            original_invoice__customer=OuterRef('pk'),
+            original_invoice__status=SalesInvoice.Status.POSTED,
+            original_invoice__is_deleted=False,
+        )
+        .order_by().values('original_invoice__customer')
+        .annotate(t=Sum('total_refunded'))
+        .values('t')
+    )
+    return qs.annotate(**{name: (
+        Coalesce(F('balance'), ZERO, output_field=DEC)
+        + Coalesce(Subquery(invoice_net, output_field=DEC), ZERO)
+        - Coalesce(Subquery(refunded, output_field=DEC), ZERO)
+    )})
+
+
+LOW_STOCK_DIGEST_LINES = 10
+
+
+def _notify_low_stock(invoice, stocks):
+    """One notification for every variant this invoice took below its
+    reorder level: the single-item message as before, or a digest listing
+    them (all of them in payload['items'])."""
+    from notifications.dispatcher import send_notification
+    from notifications.models import Notification as Notif
+
+    items = [{
+        'variant': str(s.variant.id),
+        'sku': s.variant.sku,
+        'name': s.variant.product.name,
+        'quantity': str(s.quantity),
+        'reorder_level': str(s.low_stock_threshold),
+    } for s in stocks]
+    branch = invoice.branch.name
+    if len(items) == 1:
+        title = f"Low stock: {items[0]['name']} ({items[0]['sku']})"
+        body = f"Only {items[0]['quantity']} left at {branch}"
+    else:
+        title = f"Low stock: {len(items)} products at {branch}"
+        lines = [f"{i['name']} ({i['sku']}): {i['quantity']} left" for i in items[:LOW_STOCK_DIGEST_LINES]]
+        if len(items) > LOW_STOCK_DIGEST_LINES:
+            lines.append(f"… and {len(items) - LOW_STOCK_DIGEST_LINES} more")
+        body = '\n'.join(lines)
+    send_notification(
+        store=invoice.store,
+        title=title,
+        body=body,
+        priority=Notif.Priority.WARNING,
+        notif_type=Notif.Type.LOW_STOCK,
+        link="/inventory/products",
+        payload={'invoice': str(invoice.pk), 'branch': str(invoice.branch_id), 'items': items},
+    )
+
+
 @receiver(pre_save, sender=SalesInvoice)
 def handle_sale_stock(sender, instance, **kwargs):
     if instance.pk:
@@ -476,7 +559,8 @@ def handle_sale_stock(sender, instance, **kwargs):
             old = SalesInvoice.objects.get(pk=instance.pk)
             if old.status == SalesInvoice.Status.DRAFT and instance.status == SalesInvoice.Status.POSTED:
                 with transaction.atomic():
-                    for item in instance.items.all():
+                    low_stock = []
+                    for item in instance.items.select_related('variant__product'):
                         # Stock lives in base units; convert the sold quantity
                         # (which may be in Strips/Packs) down to base units.
                         base_qty = Decimal(str(item.quantity)) * Decimal(str(item.unit_factor or 1))
@@ -485,20 +569,12 @@ def handle_sale_stock(sender, instance, **kwargs):
                         ).first()
                         if stock:
                             stock.quantity -= base_qty
+                            stock.variant = item.variant
+                            # Alert only on the sale that crosses the variant's
+                            # reorder_level; the StockLevel re-arms on restock.
+                            if stock.mark_low_stock():
+                                low_stock.append(stock)
                             stock.save()
-                            # Fire low-stock notification once per variant crossing
-                            # its own reorder_level threshold.
-                            if stock.quantity <= (item.variant.reorder_level or 5):
-                                from notifications.dispatcher import send_notification
-                                from notifications.models import Notification as Notif
-                                send_notification(
-                                    store=instance.store,
-                                    title=f"Low stock: {item.variant.product.name} ({item.variant.sku})",
-                                    body=f"Only {stock.quantity} left at {instance.branch.name}",
-                                    priority=Notif.Priority.WARNING,
-                                    notif_type=Notif.Type.LOW_STOCK,
-                                    link="/inventory/products",
-                                )
                         if is_expiry_tracked(item.variant):
                             # FEFO: draw the base qty from the earliest-expiry batches,
                             # record each draw (for VOID + true costing), and snapshot
@@ -522,6 +598,8 @@ def handle_sale_stock(sender, instance, **kwargs):
                             base_cost = weighted_avg_cost(item.variant, instance.store)
                             item.cost_at_sale = (base_cost * Decimal(str(item.unit_factor or 1))).quantize(Decimal('0.01'))
                             item.save(update_fields=['cost_at_sale'])
+                    if low_stock:
+                        _notify_low_stock(instance, low_stock)
             elif old.status == SalesInvoice.Status.POSTED and instance.status == SalesInvoice.Status.VOID:
                 # Reversing a posted sale: put the stock back so inventory stays
                 # accurate. Mirrors the DRAFT→POSTED decrement above. (DRAFT→VOID
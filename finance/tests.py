@@ -9,6 +9,7 @@ from users.models import User, Customer
 from inventory.models import Supplier, Product, ProductVariant, StockLevel
 from finance.models import SalesInvoice, SalesInvoiceItem
 from finance.serializers import RefundInvoiceSerializer
+from notifications.models import Notification
 
 
 class ReturnsPolicyTests(TestCase):
@@ -98,3 +99,60 @@ class ReturnsPolicyTests(TestCase):
         old = self._make_invoice(when=timezone.now() - timezone.timedelta(days=999))
         refund = self._refund(old)  # must not raise
         self.assertIsNotNone(refund.refund_number)
+
+
+class LowStockAlertTests(TestCase):
+    """Low-stock alerts fire on the downward crossing only, one per invoice."""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_ls', password='x')
+        self.store = Store.objects.create(name='LS', store_code='120', owner=owner)
+        addr = Address.objects.create(store=self.store, street_1='1', city='Cairo')
+        self.branch = Branch.objects.create(store=self.store, name='Main', address=addr)
+        supplier = Supplier.objects.create(
+            store=self.store, name='Sup', code_prefix='401', prefix_locked=True)
+        self.variants = []
+        for name in ('Tea', 'Sugar'):
+            product = Product.objects.create(store=self.store, name=name, supplier=supplier)
+            variant = ProductVariant.objects.create(product=product, reorder_level=Decimal('5'))
+            StockLevel.objects.create(variant=variant, branch=self.branch, quantity=Decimal('10'))
+            self.variants.append(variant)
+        self.customer = Customer.objects.create(
+            store=self.store, name='Buyer', phone_number='0101')
+
+    def _sell(self, *lines):
+        inv = SalesInvoice.objects.create(
+            store=self.store, branch=self.branch, customer=self.customer,
+            status=SalesInvoice.Status.DRAFT, date=timezone.now(),
+        )
+        for variant, qty in lines:
+            SalesInvoiceItem.objects.create(
+                invoice=inv, variant=variant, quantity=Decimal(qty), unit_price=Decimal('1'))
+        with self.captureOnCommitCallbacks(execute=True):
+            inv.status = SalesInvoice.Status.POSTED
+            inv.save()
+
+    def _alerts(self):
+        return list(Notification.all_objects.filter(store=self.store, type=Notification.Type.LOW_STOCK))
+
+    def test_fires_once_per_crossing_and_rearms_on_restock(self):
+        tea = self.variants[0]
+        self._sell((tea, '6'))          # 10 -> 4: crosses
+        self._sell((tea, '1'))          # 4 -> 3: already alerted
+        self.assertEqual(len(self._alerts()), 1)
+
+        stock = StockLevel.objects.get(variant=tea, branch=self.branch)
+        stock.quantity += Decimal('20')
+        stock.save()
+        stock.refresh_from_db()
+        self.assertIsNone(stock.low_stock_alerted_at)
+
+        self._sell((tea, '20'))         # 23 -> 3: crosses again
+        self.assertEqual(len(self._alerts()), 2)
+
+    def test_one_digest_per_invoice(self):
+        self._sell((self.variants[0], '7'), (self.variants[1], '8'))
+        alerts = self._alerts()
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0].title, 'Low stock: 2 products at Main')
+        self.assertEqual(sorted(i['name'] for i in alerts[0].payload['items']), ['Sugar', 'Tea'])
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_drugprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocklevel',
+            name='low_stock_alerted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_stocklevel_low_stock_alerted_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocklevel',
+            index=models.Index(fields=['branch', 'updated_at'], name='stock_level_branch_updated'),
+        ),
+    ]
@@ -456,13 +456,44 @@ class StockLevel(TimestampedModel):
     variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='stock_levels')
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='stock_levels')
     quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0.000)
-    
+    # Low-stock alert state for this (variant, branch): set when a sale takes
+    # the quantity down to/below the reorder level and the alert fires, cleared
+    # by save() once stock is back above it. While set, further sales stay quiet.
+    low_stock_alerted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = ('variant', 'branch')
+        indexes = [
+            # admin_ai.insights.data_version: latest change per branch.
+            models.Index(fields=['branch', 'updated_at'], name='stock_level_branch_updated'),
+        ]
 
     def __str__(self):
         return f"{self.branch.name}: {self.quantity}"
 
+    @property
+    def low_stock_threshold(self):
+        return self.variant.reorder_level or 5
+
+    def mark_low_stock(self):
+        """Record a sale's effect on the alert state. True when the quantity
+        just crossed down to the reorder level (alert now), False while the
+        alert is already out or stock is still above it. Call before save()."""
+        if self.low_stock_alerted_at is not None or self.quantity > self.low_stock_threshold:
+            return False
+        self.low_stock_alerted_at = timezone.now()
+        return True
+
+    def save(self, *args, **kwargs):
+        # Re-arm: stock back above the reorder level (purchase, return, void,
+        # transfer, adjustment — every increase goes through save()).
+        if self.low_stock_alerted_at is not None and self.quantity > self.low_stock_threshold:
+            self.low_stock_alerted_at = None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'low_stock_alerted_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'low_stock_alerted_at']
+        super().save(*args, **kwargs)
+
 # --- 4b. EXPIRY / BATCH TRACKING (FEFO) ---
 def is_multi_unit_enabled(store_id):
     """True when this store offers multi-unit (pack/strip) selling on top of the
@@ -221,7 +221,8 @@ class ProductListSerializer(FieldVisibilityMixin, serializers.ModelSerializer):
         return build_selling_units(obj.variants.first(), obj)
 
     def get_sku_display(self, obj):
-        variants = list(obj.variants.all())
+        # pk order, so the first SKU is the default variant's (variants.first()).
+        variants = sorted(obj.variants.all(), key=lambda v: v.pk)
         if not variants:
             return None
         if len(variants) == 1:
@@ -289,3 +289,96 @@ class CategoryApiTests(TestCase):
         self.assertTrue(archived.is_deleted)
         self.assertEqual(archived.delete_reason, 'DISCONTINUED')
         self.assertEqual(archived.deleted_by_id, self.owner.id)
+
+
+class AutocompleteSuggestTests(TestCase):
+    """?suggest=1 returns the compact index-shaped row — also on the pg_trgm
+    fallback (no Typesense key in tests), so the dropdown has one shape."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.owner = User.objects.create_user(username='sugowner', password='x')
+        self.store = Store.objects.create(name='S1', store_code='202', owner=self.owner)
+        self.owner.store = self.store
+        self.owner.role = User.Role.OWNER
+        self.owner.save()
+        addr = Address.objects.create(store=self.store, street_1='1', city='Cairo')
+        branch = Branch.objects.create(store=self.store, name='Main', address=addr)
+        supplier = Supplier.objects.create(
+            store=self.store, name='Sup', code_prefix='401', prefix_locked=True)
+        product = Product.objects.create(store=self.store, name='Panadol Extra', supplier=supplier)
+        self.variant = ProductVariant.objects.create(product=product, sell_price=Decimal('45.50'))
+        StockLevel.objects.create(variant=self.variant, branch=branch, quantity=Decimal('7'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_suggest_rows_are_compact(self):
+        r = self.client.get('/api/inventory/products/autocomplete/', {'q': 'pana', 'suggest': '1'})
+        self.assertEqual(r.status_code, 200, r.content)
+        rows = r.json()['results']
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row['name'], 'Panadol Extra')
+        self.assertEqual(row['default_variant_id'], str(self.variant.id))
+        self.assertEqual(row['default_variant_price'], '45.50')
+        self.assertEqual(row['default_variant_stock'], 7.0)
+        self.assertEqual(row['sku_display'], self.variant.sku)
+        self.assertNotIn('selling_units', row)      # full-hydration fields stay out
+
+    def test_cached_prefix_invalidated_by_product_write(self):
+        url = '/api/inventory/products/autocomplete/'
+        first = self.client.get(url, {'q': 'pana', 'suggest': '1'}).json()['results']
+        self.assertEqual(len(first), 1)
+        # A new product bumps the store's catalog version → the cached prefix is stale.
+        Product.objects.create(store=self.store, name='Panadol Cold', source=Product.Source.MEMORY_BASE)
+        second = self.client.get(url, {'q': 'pana', 'suggest': '1'}).json()['results']
+        self.assertEqual({r['name'] for r in second}, {'Panadol Extra', 'Panadol Cold'})
+
+
+class ProductBrowseTests(TestCase):
+    """products/browse/ returns hits + facet counts in one call; attribute
+    filters AND across keys (DB fallback — no Typesense key in tests)."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from inventory.models import ProductAttribute
+        self.owner = User.objects.create_user(username='brwowner', password='x')
+        self.store = Store.objects.create(name='S1', store_code='203', owner=self.owner)
+        self.owner.store = self.store
+        self.owner.role = User.Role.OWNER
+        self.owner.save()
+        supplier = Supplier.objects.create(
+            store=self.store, name='Sup', code_prefix='402', prefix_locked=True)
+        season = AttributeDefinition.objects.create(store=self.store, name='Season', key='season')
+        gender = AttributeDefinition.objects.create(store=self.store, name='Gender', key='gender')
+        for name, s, g in (('Coat', 'AW25', 'Men'), ('Dress', 'AW25', 'Women'), ('Tee', 'SS25', 'Men')):
+            p = Product.objects.create(store=self.store, name=name, supplier=supplier)
+            v = ProductVariant.objects.create(product=p)
+            ProductAttribute.objects.create(variant=v, definition=season, value=s)
+            ProductAttribute.objects.create(variant=v, definition=gender, value=g)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_filters_and_facets(self):
+        r = self.client.get('/api/inventory/products/browse/', {'season': 'AW25', 'gender': 'Men'})
+        self.assertEqual(r.status_code, 200, r.content)
+        d = r.json()
+        self.assertEqual(d['found'], 1)
+        self.assertEqual(d['hits'][0]['name'], 'Coat')
+        self.assertEqual(d['facets']['attributes']['season'], [{'value': 'AW25', 'count': 1}])
+        self.assertEqual(d['facets']['stock_state'], [{'value': 'out', 'count': 1}])
+
+    def test_unfiltered_facet_counts(self):
+        d = self.client.get('/api/inventory/products/browse/').json()
+        self.assertEqual(d['found'], 3)
+        season = {f['value']: f['count'] for f in d['facets']['attributes']['season']}
+        self.assertEqual(season, {'AW25': 2, 'SS25': 1})
+        self.assertEqual(d['facets']['suppliers'][0]['count'], 3)
+
+    def test_malformed_category_or_supplier_is_400(self):
+        for param in ('category', 'supplier'):
+            r = self.client.get('/api/inventory/products/browse/', {param: 'not-a-uuid'})
+            self.assertEqual(r.status_code, 400, r.content)
+        supplier = Supplier.objects.get(store=self.store)
+        r = self.client.get('/api/inventory/products/browse/', {'supplier': str(supplier.pk)})
+        self.assertEqual(r.json()['found'], 3)
@@ -1,7 +1,7 @@
 from decimal import Decimal, InvalidOperation
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q, Sum, F, Min, Value, OuterRef, Subquery, ExpressionWrapper, DecimalField
+from django.db.models import Q, Sum, F, Min, Value, OuterRef, Subquery, Exists, ExpressionWrapper, DecimalField
 from django.db.models.functions import Coalesce
 from rest_framework import viewsets, filters, status
 from rest_framework.pagination import PageNumberPagination
@@ -11,7 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from users.permissions import RoleScopedPermission, IsManagerOrAbove, IsAdminOrAbove
 from .models import (
-    Product, Category, Supplier, AttributeDefinition, ProductVariant, Tax,
+    Product, Category, Supplier, AttributeDefinition, ProductVariant, ProductAttribute, Tax,
     StockAdjustment, StockTransfer, ProductMedia,
     StorageLocation, StorageStock, StorageMovement,
 )
@@ -114,6 +114,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         'import_memory_base': 'MANAGER',
         'dedup_memory_base': 'MANAGER',
         'autocomplete': 'CASHIER',
+        'browse':       'CASHIER',
     }
     filter_backends = [filters.SearchFilter, VisibilityOrderingFilter]
     fv_table_id = 'inventory_products'
@@ -195,11 +196,12 @@ class ProductViewSet(viewsets.ModelViewSet):
         if category:
             qs = qs.filter(category_id=category)
 
-        # Dynamic attribute filters: ?season=AW25&gender=Men
+        # Dynamic attribute filters: ?season=AW25&gender=Men. One EXISTS per key —
+        # a join per key multiplied the variant rows and forced a DISTINCT.
         for key, value in params.items():
             if key not in self._RESERVED_PARAMS:
-                qs = qs.filter(variants__attributes__definition__key=key,
-                               variants__attributes__value=value).distinct()
+                qs = qs.filter(Exists(ProductAttribute.objects.filter(
+                    variant__product=OuterRef('pk'), definition__key=key, value=value)))
         return qs
 
     def perform_create(self, serializer):
@@ -515,7 +517,11 @@ class ProductViewSet(viewsets.ModelViewSet):
         Returns {results: [...], no_history: bool}.
 
         Query params:
-          ?q=<text>   required, minimum 3 characters
+          ?q=<text>     required, minimum 3 characters
+          ?suggest=1    compact rows (search.client.SUGGEST_FIELDS) served straight
+                        from the Typesense document — no DB hydration. The client
+                        fetches the full product (GET products/<id>/) only when the
+                        user picks a row.
         """
         from django.db.models import Case, When, IntegerField, Value
         q = (request.query_params.get('q') or '').strip()
@@ -536,6 +542,44 @@ class ProductViewSet(viewsets.ModelViewSet):
             except Exception:
                 ac_source = 'memory_base'
         store_history = (ac_source == 'store_history')
+        suggest_mode = (request.query_params.get('suggest') or '').lower() in ('1', 'true')
+
+        from search import cache as search_cache
+        from search import client as ts
+        from search import indexing
+
+        # --- Hot-prefix cache: (normalized q, mode) → ranked ids, or the compact
+        #     rows in suggest mode. Keyed on the store's catalog version, so any
+        #     product write invalidates it. ---
+        cache_mode = ('pos' if pos_mode else ac_source) + (':suggest' if suggest_mode else '')
+        cached = search_cache.get(store.id, q, cache_mode)
+        if suggest_mode and cached is not None:
+            return Response({'results': self._visible_suggestions(request, cached),
+                             'no_history': store_history and not cached})
+
+        # --- Suggest mode: answer from the index alone. POS still has to check
+        #     SKU/barcode in the DB (not indexed), but that's one id-only query and
+        #     a name-typing cashier almost never hits it. ---
+        if suggest_mode and ts.is_configured():
+            try:
+                rows = ts.search_suggestions(str(store.id), q, store_history=store_history,
+                                             exclude_hidden=pos_mode)
+            except Exception:
+                rows = None
+            if rows is not None:
+                scan_ids = []
+                if pos_mode:
+                    scan_ids = list(Product.objects.filter(
+                        store=store, source=Product.Source.STORE, hide_from_pos=False,
+                    ).filter(
+                        Q(variants__sku__icontains=q) | Q(variants__barcode__icontains=q)
+                    ).values_list('id', flat=True).distinct()[:20])
+                if not scan_ids:
+                    search_cache.put(store.id, q, cache_mode, rows)
+                    return Response({
+                        'results': self._visible_suggestions(request, rows),
+                        'no_history': store_history and not rows,
+                    })
 
         base = Product.objects.filter(store=store).select_related(
             'category', 'category__parent',
@@ -550,68 +594,123 @@ class ProductViewSet(viewsets.ModelViewSet):
         if pos_mode:
             base = base.exclude(hide_from_pos=True)
 
-        # --- Typesense first: typo-tolerant ranked IDs, then load + serialize from
-        #     the DB so the JSON shape is identical to the pg_trgm path. Any error
-        #     (service down/slow/unconfigured) → fall through to pg_trgm below. ---
-        results = None
-        from search import client as ts
-        if ts.is_configured():
-            try:
-                ids = ts.search_ids(str(store.id), q, store_history=store_history)
-                by_id = {str(p.id): p for p in base.filter(id__in=ids)}
-                results = [by_id[i] for i in ids if i in by_id]
-            except Exception:
-                results = None
-
-        # --- pg_trgm fallback (also the path when Typesense is unconfigured). ---
-        if results is None:
-            qs = base.filter(
-                Q(name__icontains=q) |
-                Q(
-                    variants__attributes__definition__key__in=['active_ing', 'active_ing_ar'],
-                    variants__attributes__value__icontains=q,
-                )
-            ).distinct()
-
-            if ac_source == 'memory_base':
-                qs = qs.annotate(
-                    _rank=Case(
-                        When(name__istartswith=q, then=Value(0)),
-                        When(name__icontains=q,   then=Value(1)),
-                        default=Value(2),
-                        output_field=IntegerField(),
-                    ),
-                    _src_rank=Case(
-                        When(source=Product.Source.STORE, then=Value(0)),
-                        default=Value(1),
-                        output_field=IntegerField(),
-                    ),
-                ).order_by('_rank', '_src_rank', 'name')[:20]
-            else:
-                qs = qs.annotate(
-                    _rank=Case(
-                        When(name__istartswith=q, then=Value(0)),
-                        When(name__icontains=q,   then=Value(1)),
-                        default=Value(2),
-                        output_field=IntegerField(),
-                    ),
-                ).order_by('_rank', 'name')[:20]
-            results = list(qs)
-
-        # POS scanner: SKU + barcode aren't in the Typesense index — match them
-        # directly in the DB and surface them FIRST (a scan should always beat a
-        # fuzzy name hit), then fall back to the name/ingredient matches.
-        if pos_mode:
-            sku_hits = list(base.filter(
-                Q(variants__sku__icontains=q) | Q(variants__barcode__icontains=q)
-            ).distinct()[:20])
-            seen = {p.id for p in sku_hits}
-            results = (sku_hits + [p for p in results if p.id not in seen])[:20]
+        if cached is not None:
+            # Cache hit: skip Typesense / pg_trgm / the SKU scan, just hydrate.
+            by_id = {str(p.id): p for p in base.filter(id__in=cached)}
+            results = [by_id[i] for i in cached if i in by_id]
+        else:
+            # --- Typesense first: typo-tolerant ranked IDs, then load + serialize from
+            #     the DB so the JSON shape is identical to the pg_trgm path. Any error
+            #     (service down/slow/unconfigured) → fall through to pg_trgm below. ---
+            results = None
+            if ts.is_configured():
+                try:
+                    ids = ts.search_ids(str(store.id), q, store_history=store_history)
+                    by_id = {str(p.id): p for p in base.filter(id__in=ids)}
+                    results = [by_id[i] for i in ids if i in by_id]
+                except Exception:
+                    results = None
+
+            # --- pg_trgm fallback (also the path when Typesense is unconfigured). ---
+            if results is None:
+                qs = base.filter(
+                    Q(name__icontains=q) |
+                    Q(
+                        variants__attributes__definition__key__in=['active_ing', 'active_ing_ar'],
+                        variants__attributes__value__icontains=q,
+                    )
+                ).distinct()
+
+                if ac_source == 'memory_base':
+                    qs = qs.annotate(
+                        _rank=Case(
+                            When(name__istartswith=q, then=Value(0)),
+                            When(name__icontains=q,   then=Value(1)),
+                            default=Value(2),
+                            output_field=IntegerField(),
+                        ),
+                        _src_rank=Case(
+                            When(source=Product.Source.STORE, then=Value(0)),
+                            default=Value(1),
+                            output_field=IntegerField(),
+                        ),
+                    ).order_by('_rank', '_src_rank', 'name')[:20]
+                else:
+                    qs = qs.annotate(
+                        _rank=Case(
+                            When(name__istartswith=q, then=Value(0)),
+                            When(name__icontains=q,   then=Value(1)),
+                            default=Value(2),
+                            output_field=IntegerField(),
+                        ),
+                    ).order_by('_rank', 'name')[:20]
+                results = list(qs)
+
+            # POS scanner: SKU + barcode aren't in the Typesense index — match them
+            # directly in the DB and surface them FIRST (a scan should always beat a
+            # fuzzy name hit), then fall back to the name/ingredient matches.
+            if pos_mode:
+                sku_hits = list(base.filter(
+                    Q(variants__sku__icontains=q) | Q(variants__barcode__icontains=q)
+                ).distinct()[:20])
+                seen = {p.id for p in sku_hits}
+                results = (sku_hits + [p for p in results if p.id not in seen])[:20]
+
+            if not suggest_mode:
+                search_cache.put(store.id, q, cache_mode, [str(p.id) for p in results])
 
         no_history = (store_history and len(results) == 0)
+        if suggest_mode:
+            # Typesense down/unconfigured or a POS scan hit: same compact shape.
+            rows = [indexing.suggestion_fields(p) for p in results]
+            search_cache.put(store.id, q, cache_mode, rows)
+            return Response({'results': self._visible_suggestions(request, rows),
+                             'no_history': no_history})
         serializer = ProductListSerializer(results, many=True, context={'request': request})
         return Response({'results': serializer.data, 'no_history': no_history})
 
+    @action(detail=False, methods=['get'], url_path='browse')
+    def browse(self, request):
+        """Faceted catalog browse: one page of hits + facet counts in one call.
+
+        Query params:
+          ?q=<text>               optional name search (typo-tolerant on Typesense)
+          ?category=<id>          any tier — matches the whole subtree (repeatable)
+          ?supplier=<id>          repeatable
+          ?stock=in|low|out       repeatable
+          ?<attr key>=<value>     dynamic attributes, repeat a key to OR values
+          ?page=1&per_page=50     per_page capped at 100
+
+        Returns {found, page, per_page, hits: [suggest rows], facets: {attributes,
+        categories, suppliers, stock_state}, engine: 'typesense'|'db'}.
+        """
+        from search import browse as search_browse
+        params = request.query_params
+        reserved = self._RESERVED_PARAMS | {'q', 'per_page', 'stock', 'supplier'}
+        try:
+            page = int(params.get('page') or 1)
+            per_page = int(params.get('per_page') or 50)
+        except ValueError:
+            return Response({'detail': 'page and per_page must be integers.'}, status=400)
+        try:
+            filters = search_browse.parse_filters(params, reserved)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        payload = search_browse.browse(
+            request.user.store, q=(params.get('q') or '').strip(),
+            filters=filters, page=page, per_page=per_page,
+        )
+        payload['hits'] = self._visible_suggestions(request, payload['hits'])
+        return Response(payload)
+
+    def _visible_suggestions(self, request, rows):
+        """Apply the products table's field visibility to raw suggest rows
+        (they skip ProductListSerializer, so FieldVisibilityMixin never runs)."""
+        hidden = hidden_fields_for(request.user, self.fv_table_id)
+        if not hidden:
+            return rows
+        return [{k: v for k, v in row.items() if k not in hidden} for row in rows]
+
 
 class ProductVariantViewSet(viewsets.ModelViewSet):
     serializer_class = ProductVariantSerializer
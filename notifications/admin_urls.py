@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import AdminAlertView, AdminAlertHistoryView
+from .views import AdminAlertView, AdminAlertHistoryView, AdminBroadcastJobView
 
 urlpatterns = [
     path('send/',    AdminAlertView.as_view(),        name='admin-alert-send'),
     path('history/', AdminAlertHistoryView.as_view(), name='admin-alert-history'),
+    path('jobs/<uuid:pk>/', AdminBroadcastJobView.as_view(), name='admin-alert-job'),
 ]
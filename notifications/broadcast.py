@@ -0,0 +1,117 @@
+"""Sudo broadcasts: one ADMIN note to many stores.
+
+    send(title, body, store_ids)                   -> int   (stores written, inline)
+    create_job(title, body, store_ids=None, user)  -> BroadcastJob
+    run_job(job_id)                                -> BroadcastJob
+    start_job(job)                                 -> None  (run_job on a daemon thread after commit)
+
+AdminAlertView used to call send_notification once per store — an INSERT each,
+plus a retention DELETE each back when retention ran on insert — so an
+announcement to every tenant was one long request. Here the notes go out
+BATCH_SIZE stores at a time: one bulk_create, then ADMIN_KEEP retention for
+just those stores as one set-based delete (retention.surplus_admin), then one
+bump of the broadcast-wide counter version (reads.bump_broadcast). All-store
+broadcasts run as a BroadcastJob on a background thread (core.jobs), counting
+progress on the row like admin_ai.ingest's jobs.
+
+The first run pins the resolved target list on the job (store_ids), so a run
+interrupted by a restart — re-run by `manage.py recover_jobs` — continues
+after the `sent` stores already done instead of sending to everyone again.
+`sent` is saved in the transaction that writes the batch, so it never lags
+behind the notes actually written.
+"""
+import logging
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import jobs
+from core.models import Store
+from .models import BroadcastJob, Notification
+from .reads import bump_broadcast
+from .retention import delete_in_batches, surplus_admin
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def target_stores(store_ids: Optional[List] = None):
+    """Ids of the stores a broadcast goes to (every active one when None)."""
+    if store_ids is None:
+        qs = Store.objects.filter(is_active=True, is_deleted=False)
+    else:
+        qs = Store.objects.filter(id__in=store_ids, is_deleted=False)
+    return list(qs.order_by('pk').values_list('pk', flat=True))
+
+
+def _send_batch(title, body, store_ids) -> None:
+    Notification.all_objects.bulk_create([
+        Notification(
+            store_id=store_id,
+            priority=Notification.Priority.ADMIN,
+            type=Notification.Type.ADMIN_NOTE,
+            title=title,
+            body=body,
+        )
+        for store_id in store_ids
+    ])
+    delete_in_batches(surplus_admin(stores=store_ids))
+
+
+def send(title, body, store_ids, on_progress=None) -> int:
+    """Write the note to every store in `store_ids`, BATCH_SIZE at a time.
+
+    `on_progress(sent)` runs inside each batch's transaction, so progress
+    saved there commits (or rolls back) together with the batch's notes."""
+    for start in range(0, len(store_ids), BATCH_SIZE):
+        batch = store_ids[start:start + BATCH_SIZE]
+        with transaction.atomic():
+            _send_batch(title, body, batch)
+            if on_progress:
+                on_progress(start + len(batch))
+        bump_broadcast()
+    return len(store_ids)
+
+
+def create_job(title, body, store_ids=None, user=None) -> BroadcastJob:
+    return BroadcastJob.objects.create(
+        title=title,
+        body=body,
+        store_ids=[str(pk) for pk in store_ids] if store_ids is not None else None,
+        created_by=user,
+    )
+
+
+def run_job(job_id) -> BroadcastJob:
+    """Send the job's broadcast. Never raises: failures end up on the job row."""
+    job = BroadcastJob.objects.get(pk=job_id)
+    job.status = BroadcastJob.Status.RUNNING
+    job.save(update_fields=['status', 'updated_at'])
+    try:
+        if not job.sent:
+            stores = target_stores(job.store_ids)
+            job.store_ids, job.total = [str(pk) for pk in stores], len(stores)
+            job.save(update_fields=['store_ids', 'total', 'updated_at'])
+        done = job.sent
+
+        def progress(sent):
+            job.sent = done + sent
+            job.save(update_fields=['sent', 'updated_at'])
+
+        send(job.title, job.body, job.store_ids[done:], on_progress=progress)
+        job.status = BroadcastJob.Status.DONE
+    except Exception as e:  # noqa: BLE001 — surface on the job, not in a dead thread
+        logger.exception("Broadcast job %s failed", job_id)
+        job.status = BroadcastJob.Status.FAILED
+        job.error = f'{type(e).__name__}: {e}'
+        job.refresh_from_db(fields=['sent'])    # the failed batch's count rolled back
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'sent', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def start_job(job: BroadcastJob) -> None:
+    """Run the job on a daemon thread once its row is committed."""
+    jobs.start(run_job, job, 'broadcast')
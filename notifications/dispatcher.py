@@ -1,4 +1,35 @@
-from django.utils import timezone
+"""Notification dispatch.
+
+    send_notification(store, title, ...)  -> Notification  (written after commit)
+
+Notifications used to be INSERTed on the spot, followed by a retention DELETE,
+and several are sent from inside locked transactions (low-stock alerts while
+handle_sale_stock holds StockLevel row locks). Now, inside a transaction,
+send_notification only queues the row; every notification queued in the same
+transaction (or savepoint) is written with one bulk_create from
+`transaction.on_commit` (core.oncommit). A rolled-back transaction or
+savepoint sends nothing. Outside a transaction the row is written at once.
+
+Each write bumps the store's notification version, which invalidates the
+cached unread counts of its users (notifications.reads).
+
+Retention is no longer paid per notification: `manage.py
+purge_old_notifications` (notifications.retention) deletes in batches.
+"""
+import logging
+
+from django.db import transaction
+
+from core.oncommit import batch_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+def _write(notifications) -> None:
+    from .models import Notification
+    from .reads import bump_stores
+    Notification.all_objects.bulk_create(notifications)
+    bump_stores(n.store_id for n in notifications)
 
 
 def send_notification(store, title, body='', priority='INFO', notif_type='GENERAL',
@@ -7,10 +38,16 @@ def send_notification(store, title, body='', priority='INFO', notif_type='GENERA
     Create a notification for a store.
     user=None  → store-wide (visible to every member of the store).
     user=<obj> → addressed to one specific user only.
+
+    Inside a transaction the row is written when it commits (see module
+    notes) and the returned instance is not saved yet: it has its id, but
+    `created_at` stays None and the row cannot be queried (or referenced by
+    a foreign key) before the commit.
     """
     from .models import Notification
+    from .reads import bump_stores
 
-    n = Notification.objects.create(
+    n = Notification(
         store=store,
         user=user,
         priority=priority,
@@ -20,35 +57,9 @@ def send_notification(store, title, body='', priority='INFO', notif_type='GENERA
         link=link,
         payload=payload or {},
     )
-    _purge_after_create(store, priority)
-    return n
-
-
-def _purge_after_create(store, priority):
-    """
-    ADMIN notes: keep newest 100 per store, hard-delete the rest.
-    System (INFO/WARNING/ALERT): hard-delete anything older than 90 days.
-    """
-    from .models import Notification
-
-    # Infra keyed by an explicit `store` (may run inside a sudo-acting request) → all_objects.
-    if priority == Notification.Priority.ADMIN:
-        keep_ids = list(
-            Notification.all_objects.filter(store=store, priority=Notification.Priority.ADMIN)
-            .order_by('-created_at')
-            .values_list('id', flat=True)[:100]
-        )
-        Notification.all_objects.filter(
-            store=store, priority=Notification.Priority.ADMIN,
-        ).exclude(id__in=keep_ids).delete()
+    if transaction.get_connection().in_atomic_block:
+        batch_on_commit(_write, n)
     else:
-        cutoff = timezone.now() - timezone.timedelta(days=90)
-        Notification.all_objects.filter(
-            store=store,
-            priority__in=[
-                Notification.Priority.INFO,
-                Notification.Priority.WARNING,
-                Notification.Priority.ALERT,
-            ],
-            created_at__lt=cutoff,
-        ).delete()
+        n.save()
+        bump_stores([n.store_id])
+    return n
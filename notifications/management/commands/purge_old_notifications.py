@@ -0,0 +1,61 @@
+"""Notification retention purge.
+
+Applies notifications.retention: ADMIN notes beyond the newest 100 per store,
+and INFO / WARNING / ALERT notifications older than 90 days, are deleted.
+Months wholly past the window go as whole partitions; the rest is deleted in
+batches. The dispatcher no longer does this on every insert, so run this
+periodically (a daily cron entry is plenty).
+
+    manage.py purge_old_notifications
+    manage.py purge_old_notifications --days 30 --keep-admin 50
+    manage.py purge_old_notifications --dry-run    # report only, delete nothing
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = "Delete notifications past their retention (old system alerts, surplus admin notes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=retention.SYSTEM_RETENTION_DAYS,
+                            help="Keep INFO/WARNING/ALERT notifications this many days (default 90).")
+        parser.add_argument('--keep-admin', type=int, default=retention.ADMIN_KEEP,
+                            help="ADMIN notes kept per store (default 100).")
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE,
+                            help="Rows deleted per batch (default 5000).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report how many rows would be deleted, delete nothing.")
+
+    def handle(self, *args, **options):
+        days, keep = options['days'], options['keep_admin']
+        if days < 1:
+            raise CommandError("--days must be >= 1")
+        if keep < 0:
+            raise CommandError("--keep-admin must be >= 0")
+
+        if options['dry_run']:
+            cutoff = timezone.now() - timedelta(days=days)
+            system = retention.expired_system(cutoff).count()
+            admin = retention.surplus_admin(keep).count()
+            months = ', '.join(p.name for p in retention.expired_months(cutoff)) or 'none'
+            self.stdout.write(self.style.WARNING(
+                f"[dry-run] {system} system notification(s) older than {days} day(s) and "
+                f"{admin} admin note(s) beyond {keep} per store would be deleted; "
+                f"monthly partitions dropped: {months}."
+            ))
+            return
+
+        deleted = retention.purge(options['batch_size'], days=days, keep=keep)
+        for name in deleted['months']:
+            self.stdout.write(f"  dropped {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {len(deleted['months'])} monthly partition(s), then "
+            f"{deleted['system']} system notification(s) older than {days} day(s) and "
+            f"{deleted['admin']} admin note(s) beyond {keep} per store."
+        ))
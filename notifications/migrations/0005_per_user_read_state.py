@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Seed each user's watermark from the old shared flag: the newest notification
+# they could see that somebody had marked read. Older unread ones count as read
+# from here on; everything after it stays unread.
+SEED_WATERMARKS = """
+INSERT INTO notifications_notificationreadstate (user_id, read_up_to)
+SELECT u.id, MAX(n.created_at)
+FROM users_user u
+JOIN notifications_notification n
+  ON n.store_id = u.store_id AND (n.user_id = u.id OR n.user_id IS NULL)
+WHERE n.read_at IS NOT NULL
+GROUP BY u.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_adminsoundconfig'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                              related_name='notification_read_state', serialize=False,
+                                              to=settings.AUTH_USER_MODEL)),
+                ('read_up_to', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                   related_name='receipts', to='notifications.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                           related_name='notification_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'notification'),
+                                                        name='notification_receipt_once')],
+            },
+        ),
+        migrations.RunSQL(SEED_WATERMARKS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core import partitions
+
+
+def partition(apps, schema_editor):
+    partitions.partition_table(schema_editor.connection, 'notifications_notification', 'created_at')
+
+
+class Migration(migrations.Migration):
+    """Notification becomes monthly range partitions on `created_at`
+    (core.partitions). Its primary key turns into (id, created_at), which a
+    foreign key cannot reference, so receipts lose the database constraint
+    first; Django still cascades deletes.
+
+    Irreversible: there is no un-partition step, and the reversed AlterField
+    could not restore the receipts FK against a composite primary key."""
+
+    dependencies = [
+        ('notifications', '0006_broadcastjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationreceipt',
+            name='notification',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='receipts', to='notifications.notification'),
+        ),
+        migrations.RunPython(partition),
+    ]
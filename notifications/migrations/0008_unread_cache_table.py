@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.db import migrations
+
+# settings.CACHES['notifications'] (DatabaseCache) — shared by every worker.
+TABLE = 'notifications_unread_cache'
+
+
+def create_cache_table(apps, schema_editor):
+    call_command('createcachetable', TABLE, database=schema_editor.connection.alias, verbosity=0)
+
+
+def drop_cache_table(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {schema_editor.quote_name(TABLE)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_partition_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, drop_cache_table),
+    ]
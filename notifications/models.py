@@ -4,13 +4,15 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from core.models import Store
+from core.models import Store, TimestampedModel
 from core.tenancy import TenantScopedManager
 
 SOUND_CHOICES = [('mute', 'Mute')] + [(f's{i:02d}', f'Sound {i:02d}') for i in range(1, 11)]
 
 
 class Notification(models.Model):
+    # Stored as monthly partitions on created_at (core.partitions); retention
+    # drops whole months (notifications.retention).
 
     class Priority(models.TextChoices):
         INFO    = 'INFO',    _('Information')
@@ -45,6 +47,9 @@ class Notification(models.Model):
                                help_text=_("Frontend route the bell click should open."))
     payload = models.JSONField(default=dict, blank=True)
 
+    # Legacy shared flag: one reader marked a store-wide notification read for
+    # everyone. No longer written; per-user state is NotificationReadState +
+    # NotificationReceipt (see notifications.reads).
     read_at    = models.DateTimeField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
@@ -65,7 +70,43 @@ class Notification(models.Model):
 
     @property
     def is_unread(self):
-        return self.read_at is None
+        # Per-user when loaded through notifications.reads (user_read_at).
+        return getattr(self, 'user_read_at', self.read_at) is None
+
+
+class NotificationReadState(models.Model):
+    """A user's read watermark: every notification they can see created at or
+    before `read_up_to` is read. read-all moves it forward."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+        related_name='notification_read_state',
+    )
+    read_up_to = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"ReadState({self.user}, {self.read_up_to})"
+
+
+class NotificationReceipt(models.Model):
+    """One notification read by one user past their watermark. Folded into the
+    watermark (deleted) once read-all moves it beyond the notification."""
+
+    # No database constraint: Notification is partitioned (core.partitions);
+    # retention removes the receipts of the months it drops.
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts',
+                                     db_constraint=False)
+    user         = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                     related_name='notification_receipts')
+    read_at      = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='notification_receipt_once'),
+        ]
+
+    def __str__(self):
+        return f"Receipt({self.user}, {self.notification_id})"
 
 
 class NotificationPreference(models.Model):
@@ -115,3 +156,43 @@ class AdminSoundConfig(models.Model):
 
     def __str__(self):
         return f"AdminSound({self.admin_sound})"
+
+
+class BroadcastJob(TimestampedModel):
+    """Progress row for one sudo broadcast (notifications.broadcast).
+
+    The ADMIN note is written to the target stores in batches on a background
+    thread; `sent` counts stores done so the sudo screen can poll it.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED  = 'QUEUED',  _('Queued')
+        RUNNING = 'RUNNING', _('Running')
+        DONE    = 'DONE',    _('Done')
+        FAILED  = 'FAILED',  _('Failed')
+
+    id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title       = models.CharField(max_length=200)
+    body        = models.TextField(blank=True)
+    store_ids   = models.JSONField(null=True, blank=True,
+        help_text=_("Target stores; null = every active store."))
+    status      = models.CharField(max_length=10, choices=Status.choices,
+                                   default=Status.QUEUED, db_index=True)
+    total       = models.PositiveIntegerField(default=0)
+    sent        = models.PositiveIntegerField(default=0)
+    error       = models.TextField(blank=True, default='')
+    created_by  = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                    null=True, blank=True, related_name='broadcast_jobs')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.status == self.Status.DONE else 0.0
+        return round(self.sent / self.total, 4)
+
+    def __str__(self):
+        return f"Broadcast {self.title!r} ({self.status})"
@@ -0,0 +1,180 @@
+"""Per-user read state and cached unread counters.
+
+    inbox(user)             -> notifications the user sees (store-wide + addressed)
+    with_read_state(qs, u)  -> qs annotated with user_read_at (None = unread)
+    unread(qs, user)        -> the part of qs the user has not read
+    mark_read(user, n)      -> bool   (False if it was read already)
+    mark_all_read(user)     -> int    (how many were unread)
+    unread_count(user)      -> int    (a cache lookup; counted on a miss)
+    bump_stores(store_ids)  -> None   (after an insert: recount those stores' users)
+    bump_broadcast()        -> None   (after a broadcast batch: recount everybody)
+
+Store-wide notifications (user=None) used to carry one shared read_at, so the
+first reader marked them read for everybody. Read state is now per user: a
+watermark (NotificationReadState.read_up_to — everything created up to it is
+read, moved by read-all) plus one NotificationReceipt per notification read
+individually past it. read-all folds those receipts back into the watermark,
+so a user's state stays one row plus the few items read one by one.
+
+The bell used to COUNT(*) the inbox on every poll from every tab. The count is
+now cached per user, tagged with the store's notification version: inserting a
+notification gives the store a new version (dispatcher), reading deletes the
+user's entry. Entries expire after UNREAD_TTL, which also bounds staleness
+from retention deletes.
+
+These keys live in the `notifications` cache (settings.CACHES, a
+DatabaseCache): an insert or read handled by one worker must invalidate the
+count every other worker serves, which a per-process LocMemCache cannot do.
+A broadcast batch reaches up to a thousand stores, so instead of a version per
+store it moves the one broadcast version every entry is also tagged with.
+Only writes set versions; a poll reads the versions and the count entry in one
+SELECT and never writes unless it had to count. Versions are random tokens,
+not counters, so a version culled from the table never comes back as a value
+an old entry was counted under. A cache error is a miss, never a failure.
+"""
+import os
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, Exists, Max, OuterRef, Q, Subquery, Value, When
+
+from .models import Notification, NotificationReadState, NotificationReceipt
+
+UNREAD_TTL = int(os.environ.get('NOTIF_UNREAD_TTL', '300'))   # seconds; 0 disables
+
+CACHE_ALIAS = 'notifications'
+
+_VERSION_KEY = 'notif:ver:{}'
+_BROADCAST_KEY = 'notif:ver:broadcast'
+_COUNT_KEY   = 'notif:unread:{}:{}'
+
+
+def inbox(user):
+    store = getattr(user, 'store', None)
+    if not store:
+        return Notification.objects.none()
+    return Notification.objects.filter(Q(store=store) & (Q(user=user) | Q(user__isnull=True)))
+
+
+def watermark(user):
+    return (NotificationReadState.objects.filter(user=user)
+            .values_list('read_up_to', flat=True).first())
+
+
+def _receipt(user):
+    return NotificationReceipt.objects.filter(notification=OuterRef('pk'), user=user)
+
+
+def with_read_state(qs, user):
+    """Annotate user_read_at: the receipt time, the watermark, or None."""
+    mark = watermark(user)
+    read_at = Subquery(_receipt(user).values('read_at')[:1])
+    if mark is not None:
+        read_at = Case(When(created_at__lte=mark, then=Value(mark)), default=read_at)
+    return qs.annotate(user_read_at=read_at)
+
+
+def unread(qs, user):
+    mark = watermark(user)
+    if mark is not None:
+        qs = qs.filter(created_at__gt=mark)
+    return qs.filter(~Exists(_receipt(user)))
+
+
+# ---------- writes ----------
+
+def mark_read(user, notification) -> bool:
+    mark = watermark(user)
+    if mark is not None and notification.created_at <= mark:
+        return False
+    _, created = NotificationReceipt.objects.get_or_create(user=user, notification=notification)
+    if created:
+        forget(user)
+    return created
+
+
+def mark_all_read(user) -> int:
+    qs = inbox(user)
+    count = unread(qs, user).count()
+    newest = qs.aggregate(m=Max('created_at'))['m']
+    if newest is None:
+        return 0
+    with transaction.atomic():
+        state, _ = NotificationReadState.objects.select_for_update().get_or_create(user=user)
+        if state.read_up_to is None or newest > state.read_up_to:
+            state.read_up_to = newest
+            state.save(update_fields=['read_up_to'])
+        NotificationReceipt.objects.filter(
+            user=user, notification__created_at__lte=state.read_up_to).delete()
+    forget(user)
+    return count
+
+
+# ---------- counters ----------
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _new_version():
+    # Never reused: a version key culled or expired from the cache table and
+    # set again cannot make an old count entry match.
+    return uuid.uuid4().hex
+
+
+def bump_stores(store_ids):
+    """Invalidate the cached counts of every user of these stores. Never raises."""
+    for store_id in set(store_ids):
+        try:
+            _cache().set(_VERSION_KEY.format(store_id), _new_version(), None)
+        except Exception:
+            pass
+
+
+def bump_broadcast():
+    """Invalidate every cached count at once (one cache write). Never raises."""
+    try:
+        _cache().set(_BROADCAST_KEY, _new_version(), None)
+    except Exception:
+        pass
+
+
+def forget(user):
+    if not getattr(user, 'store_id', None):
+        return
+    try:
+        _cache().delete(_COUNT_KEY.format(user.store_id, user.pk))
+    except Exception:
+        pass
+
+
+def unread_count(user) -> int:
+    """The user's unread count. A warm poll is one SELECT on the cache table:
+    the store and broadcast versions and the count entry, which remembers the
+    versions it was counted under, are fetched together. No version yet (or
+    culled) is fine — the entry just has to have been counted without one too."""
+    store_id = getattr(user, 'store_id', None)
+    if not store_id:
+        return 0
+    if UNREAD_TTL <= 0:
+        return unread(inbox(user), user).count()
+    version_key, count_key = _VERSION_KEY.format(store_id), _COUNT_KEY.format(store_id, user.pk)
+    try:
+        found = _cache().get_many([version_key, _BROADCAST_KEY, count_key])
+    except Exception:
+        found = None
+    if found is None:
+        return unread(inbox(user), user).count()
+    # Read before counting: an insert meanwhile moves a version, so a count
+    # that missed it is stored under versions nobody matches any more.
+    versions = (found.get(version_key), found.get(_BROADCAST_KEY))
+    entry = found.get(count_key)
+    if entry is not None and entry[:2] == versions:
+        return entry[2]
+    count = unread(inbox(user), user).count()
+    try:
+        _cache().set(count_key, (*versions, count), UNREAD_TTL)
+    except Exception:
+        pass
+    return count
@@ -0,0 +1,116 @@
+"""Notification retention, run in batches outside any request.
+
+    ADMIN notes                 keep the newest ADMIN_KEEP per store
+    INFO / WARNING / ALERT      delete after SYSTEM_RETENTION_DAYS
+
+These rules used to run as a DELETE after every single notification insert.
+`manage.py purge_old_notifications` applies them periodically instead.
+
+The table is partitioned by month (core.partitions). A month wholly older than
+the system window is removed as a unit (drop_expired_months): it is detached,
+the ADMIN notes in it still among their store's newest ADMIN_KEEP are copied
+back (they land in the default partition), its receipts are deleted and the
+table is dropped — no row-by-row DELETE, nothing left to vacuum. What remains
+is deleted in batches of one SELECT of ids plus one DELETE, so no statement
+holds locks on a large slice of the table.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from core import partitions
+from .models import Notification, NotificationReceipt
+
+ADMIN_KEEP = 100
+SYSTEM_RETENTION_DAYS = 90
+BATCH_SIZE = 5000
+
+SYSTEM_PRIORITIES = [
+    Notification.Priority.INFO,
+    Notification.Priority.WARNING,
+    Notification.Priority.ALERT,
+]
+
+
+def expired_system(cutoff=None, stores=None):
+    """INFO / WARNING / ALERT notifications older than the retention window."""
+    cutoff = cutoff or timezone.now() - timedelta(days=SYSTEM_RETENTION_DAYS)
+    qs = Notification.all_objects.filter(priority__in=SYSTEM_PRIORITIES, created_at__lt=cutoff)
+    return qs.filter(store__in=stores) if stores is not None else qs
+
+
+def surplus_admin(keep=ADMIN_KEEP, stores=None):
+    """ADMIN notes beyond the newest `keep` of their store."""
+    qs = Notification.all_objects.filter(priority=Notification.Priority.ADMIN)
+    if stores is not None:
+        qs = qs.filter(store__in=stores)
+    return qs.annotate(rank=Window(
+        RowNumber(), partition_by=[F('store_id')], order_by=[F('created_at').desc(), F('id').desc()],
+    )).filter(rank__gt=keep)
+
+
+def delete_in_batches(qs, batch_size=BATCH_SIZE) -> int:
+    """Delete every row of `qs`, `batch_size` ids at a time. Returns the count."""
+    deleted = 0
+    while True:
+        ids = list(qs.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        Notification.all_objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+_KEPT_ADMIN_SQL = """
+SELECT id FROM (
+    SELECT id, created_at, row_number() OVER (
+        PARTITION BY store_id ORDER BY created_at DESC, id DESC) AS rank
+    FROM {table} WHERE priority = %s
+) ranked
+WHERE rank <= %s AND created_at >= %s AND created_at < %s
+"""
+
+
+def expired_months(cutoff):
+    """Monthly partitions that end on or before `cutoff`."""
+    return [p for p in partitions.monthly(connection, Notification._meta.db_table) if p.end <= cutoff]
+
+
+def drop_expired_months(cutoff=None, keep=ADMIN_KEEP):
+    """Remove every month older than `cutoff` as a unit. Returns the names."""
+    cutoff = cutoff or timezone.now() - timedelta(days=SYSTEM_RETENTION_DAYS)
+    table = Notification._meta.db_table
+    qn = connection.ops.quote_name
+    dropped = []
+    for part in expired_months(cutoff):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(_KEPT_ADMIN_SQL.format(table=qn(table)),
+                               [Notification.Priority.ADMIN, keep, part.start, part.end])
+                kept = [row[0] for row in cursor.fetchall()]
+            partitions.detach(connection, table, part.name)
+            with connection.cursor() as cursor:
+                if kept:
+                    cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(part.name)} '
+                                   f'WHERE id = ANY(%s)', [kept])
+                cursor.execute(
+                    f'DELETE FROM {qn(NotificationReceipt._meta.db_table)} '
+                    f'WHERE notification_id IN (SELECT id FROM {qn(part.name)}) '
+                    f'AND NOT notification_id = ANY(%s)', [kept])
+            partitions.drop(connection, part.name)
+        dropped.append(part.name)
+    return dropped
+
+
+def purge(batch_size=BATCH_SIZE, days=SYSTEM_RETENTION_DAYS, keep=ADMIN_KEEP, stores=None):
+    """Apply both rules: {'months': [dropped partitions], 'system': n, 'admin': n}
+    with n the rows deleted one batch at a time. Months are only dropped for a
+    purge of every store."""
+    cutoff = timezone.now() - timedelta(days=days)
+    return {
+        'months': drop_expired_months(cutoff, keep) if stores is None else [],
+        'system': delete_in_batches(expired_system(cutoff, stores), batch_size),
+        'admin': delete_in_batches(surplus_admin(keep, stores), batch_size),
+    }
@@ -1,11 +1,17 @@
 from rest_framework import serializers
 
-from .models import Notification, NotificationPreference
+from .models import BroadcastJob, Notification, NotificationPreference
 
 
 class NotificationSerializer(serializers.ModelSerializer):
+    # The requesting user's read time when the queryset went through
+    # notifications.reads.with_read_state; the legacy shared flag otherwise.
+    read_at   = serializers.SerializerMethodField()
     is_unread = serializers.BooleanField(read_only=True)
 
+    def get_read_at(self, obj):
+        return getattr(obj, 'user_read_at', obj.read_at)
+
     class Meta:
         model  = Notification
         fields = ['id', 'priority', 'type', 'title', 'body', 'link', 'payload',
@@ -22,3 +28,13 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
         ]
         # admin_sound is platform-wide (sudo-set) — never writable per-user.
         read_only_fields = ['admin_sound']
+
+
+class BroadcastJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model  = BroadcastJob
+        fields = ['id', 'title', 'status', 'total', 'sent', 'progress', 'error',
+                  'created_at', 'finished_at']
+        read_only_fields = fields
@@ -1,3 +1,204 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection, transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from core import jobs, partitions
+from core.models import Store
+from users.models import User
+from notifications import broadcast, reads, retention
+from notifications.dispatcher import send_notification
+from notifications.models import BroadcastJob, Notification
+
+
+class DeferredDispatchTests(TestCase):
+    """Notifications sent inside a transaction are written together after commit."""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_n', password='x')
+        self.store = Store.objects.create(name='N1', store_code='110', owner=owner)
+
+    def _count(self):
+        return Notification.all_objects.filter(store=self.store).count()
+
+    def test_written_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for i in range(3):
+                    send_notification(self.store, f'Low stock {i}')
+                self.assertEqual(self._count(), 0)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self._count(), 3)
+
+    def test_rolled_back_savepoint_sends_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            send_notification(self.store, 'kept')
+            try:
+                with transaction.atomic():
+                    send_notification(self.store, 'dropped')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            send_notification(self.store, 'kept too')
+        self.assertEqual(sorted(Notification.all_objects.values_list('title', flat=True)),
+                         ['kept', 'kept too'])
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_p', password='x')
+        self.store = Store.objects.create(name='P1', store_code='111', owner=owner)
+
+    def test_purge_applies_both_rules_in_batches(self):
+        Notification.all_objects.bulk_create([
+            Notification(store=self.store, title=f'a{i}', priority=Notification.Priority.ADMIN)
+            for i in range(5)
+        ] + [
+            Notification(store=self.store, title=f's{i}', priority=Notification.Priority.WARNING)
+            for i in range(4)
+        ])
+        old = timezone.now() - timedelta(days=retention.SYSTEM_RETENTION_DAYS + 1)
+        Notification.all_objects.filter(title__in=['s0', 's1', 's2']).update(created_at=old)
+
+        deleted = retention.purge(batch_size=2, keep=2)
+        self.assertEqual((deleted['system'], deleted['admin']), (3, 3))
+        self.assertEqual(Notification.all_objects.filter(store=self.store).count(), 3)
+
+    def test_expired_month_dropped_keeping_newest_admin_notes(self):
+        table = Notification._meta.db_table
+        month = partitions.add_months(partitions.month_start(timezone.now()), -6)
+        partitions.ensure(connection, table, 'created_at', month, month)
+        Notification.all_objects.bulk_create([
+            Notification(store=self.store, title='stale', priority=Notification.Priority.INFO),
+            Notification(store=self.store, title='note', priority=Notification.Priority.ADMIN),
+        ])
+        Notification.all_objects.filter(store=self.store).update(created_at=month + timedelta(days=2))
+
+        dropped = retention.drop_expired_months(keep=5)
+        self.assertIn(partitions.partition_name(table, month), dropped)
+        self.assertEqual(list(Notification.all_objects.filter(store=self.store)
+                              .values_list('title', flat=True)), ['note'])
+
+
+class ReadStateTests(TestCase):
+    """Store-wide notifications are read per user; the bell count is cached."""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_r2', password='x')
+        self.store = Store.objects.create(name='R1', store_code='112', owner=owner)
+        self.alice = User.objects.create_user(username='alice_n', password='x', store=self.store)
+        self.bob = User.objects.create_user(username='bob_n', password='x', store=self.store)
+        caches[reads.CACHE_ALIAS].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.n1 = send_notification(self.store, 'one')
+            self.n2 = send_notification(self.store, 'two')
+
+    def test_reading_is_per_user(self):
+        self.assertTrue(reads.mark_read(self.alice, self.n1))
+        self.assertEqual(reads.unread_count(self.alice), 1)
+        self.assertEqual(reads.unread_count(self.bob), 2)
+        row = reads.with_read_state(reads.inbox(self.bob), self.bob).get(pk=self.n1.pk)
+        self.assertTrue(row.is_unread)
+
+    def test_read_all_moves_watermark_and_folds_receipts(self):
+        reads.mark_read(self.alice, self.n1)
+        self.assertEqual(reads.mark_all_read(self.alice), 1)
+        self.assertEqual(reads.unread_count(self.alice), 0)
+        self.assertFalse(self.alice.notification_receipts.exists())
+        self.assertFalse(reads.mark_read(self.alice, self.n2))
+
+    def test_count_is_cached_in_the_shared_cache(self):
+        self.assertEqual(reads.unread_count(self.bob), 2)
+        entry = caches[reads.CACHE_ALIAS].get(reads._COUNT_KEY.format(self.store.pk, self.bob.pk))
+        self.assertEqual(entry[2], 2)
+
+    def test_warm_poll_is_one_cache_lookup(self):
+        reads.unread_count(self.bob)
+        with self.assertNumQueries(1):
+            self.assertEqual(reads.unread_count(self.bob), 2)
+
+    def test_insert_invalidates_cached_count(self):
+        self.assertEqual(reads.unread_count(self.bob), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            send_notification(self.store, 'three')
+        self.assertEqual(reads.unread_count(self.bob), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(reads.unread_count(self.bob), 3)
+
+    def test_lost_version_is_a_miss_not_a_stale_hit(self):
+        self.assertEqual(reads.unread_count(self.bob), 2)
+        caches[reads.CACHE_ALIAS].delete(reads._VERSION_KEY.format(self.store.pk))   # culled
+        Notification.all_objects.create(store=self.store, title='three')
+        self.assertEqual(reads.unread_count(self.bob), 3)
+
+    def test_read_invalidates_cached_count(self):
+        self.assertEqual(reads.unread_count(self.bob), 2)
+        reads.mark_read(self.bob, self.n1)
+        self.assertEqual(reads.unread_count(self.bob), 1)
+        reads.mark_all_read(self.bob)
+        self.assertEqual(reads.unread_count(self.bob), 0)
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='owner_b', password='x')
+        self.stores = [Store.objects.create(name=f'B{i}', store_code=f'13{i}', owner=owner)
+                       for i in range(3)]
+
+    def test_orphaned_job_resumes_after_the_stores_already_sent(self):
+        job = broadcast.create_job('Maintenance', 'Tonight', [s.pk for s in self.stores])
+        stores = [str(pk) for pk in broadcast.target_stores(job.store_ids)]
+        broadcast.send('Maintenance', 'Tonight', stores[:1])
+        BroadcastJob.objects.filter(pk=job.pk).update(
+            status=BroadcastJob.Status.RUNNING, store_ids=stores, total=3, sent=1,
+            updated_at=timezone.now() - 2 * jobs.STALE_AFTER)
+
+        self.assertEqual(jobs.recover(BroadcastJob, broadcast.run_job), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent), (BroadcastJob.Status.DONE, 3))
+        for store in self.stores:
+            self.assertEqual(Notification.all_objects.filter(store=store, title='Maintenance').count(), 1)
+
+    def test_progress_commits_with_its_batch(self):
+        job = broadcast.create_job('Maintenance', 'Tonight', [s.pk for s in self.stores])
+        real_send_batch = broadcast._send_batch
+        calls = []
+
+        def flaky(title, body, store_ids):
+            calls.append(store_ids)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            real_send_batch(title, body, store_ids)
+
+        with mock.patch.object(broadcast, 'BATCH_SIZE', 2), \
+                mock.patch.object(broadcast, '_send_batch', flaky):
+            job = broadcast.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent), (BroadcastJob.Status.FAILED, 2))
+        self.assertEqual(Notification.all_objects.filter(title='Maintenance').count(), 2)
+
+    def test_batch_invalidates_counts_with_one_version_bump(self):
+        user = User.objects.create_user(username='bcast_u', password='x', store=self.stores[0])
+        self.assertEqual(reads.unread_count(user), 0)
+        with mock.patch.object(broadcast, 'BATCH_SIZE', 2), \
+                mock.patch.object(broadcast, 'bump_broadcast', wraps=reads.bump_broadcast) as bump:
+            broadcast.send('Hi', '', [s.pk for s in self.stores])
+        self.assertEqual(bump.call_count, 2)        # per batch, not per store
+        self.assertEqual(reads.unread_count(user), 1)
 
-# Create your tests here.
+    def test_job_sends_in_batches_and_trims_admin_notes(self):
+        Notification.all_objects.bulk_create([
+            Notification(store=self.stores[0], title=f'old{i}', priority=Notification.Priority.ADMIN)
+            for i in range(retention.ADMIN_KEEP)
+        ])
+        job = broadcast.create_job('Maintenance', 'Tonight', [s.pk for s in self.stores])
+        with mock.patch.object(broadcast, 'BATCH_SIZE', 2):
+            job = broadcast.run_job(job.pk)
+        self.assertEqual((job.status, job.total, job.sent), (job.Status.DONE, 3, 3))
+        for store in self.stores:
+            self.assertTrue(Notification.all_objects.filter(store=store, title='Maintenance').exists())
+        self.assertEqual(Notification.all_objects.filter(store=self.stores[0]).count(),
+                         retention.ADMIN_KEEP)
@@ -1,4 +1,3 @@
-from django.db.models import Q
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -7,9 +6,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from users.permissions import IsSuperAdmin
-from .models import Notification, NotificationPreference, AdminSoundConfig, SOUND_CHOICES
-from .serializers import NotificationSerializer, NotificationPreferenceSerializer
-from .dispatcher import send_notification
+from .models import BroadcastJob, Notification, NotificationPreference, AdminSoundConfig, SOUND_CHOICES
+from .serializers import BroadcastJobSerializer, NotificationSerializer, NotificationPreferenceSerializer
+from . import broadcast, reads
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
@@ -22,43 +21,37 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user  = self.request.user
-        store = getattr(user, 'store', None)
-        if not store:
-            return Notification.objects.none()
-
-        qs = Notification.objects.filter(
-            Q(store=store) & (Q(user=user) | Q(user__isnull=True)),
-        )
+        user = self.request.user
+        qs = reads.inbox(user)
         if self.request.query_params.get('unread') in ('1', 'true', 'yes'):
-            qs = qs.filter(read_at__isnull=True)
+            qs = reads.unread(qs, user)
         priority = self.request.query_params.get('priority')
         if priority:
             qs = qs.filter(priority=priority.upper())
-        return qs
+        return reads.with_read_state(qs, user)
 
     @action(detail=True, methods=['post'])
     def read(self, request, pk=None):
         n = self.get_object()
-        if n.read_at is None:
-            n.read_at = timezone.now()
-            n.save(update_fields=['read_at'])
+        if n.user_read_at is None:
+            reads.mark_read(request.user, n)
+            n.user_read_at = timezone.now()
         return Response(NotificationSerializer(n).data)
 
     @action(detail=False, methods=['post'], url_path='read-all')
     def read_all(self, request):
-        count = self.get_queryset().filter(read_at__isnull=True).update(read_at=timezone.now())
-        return Response({'updated': count})
+        return Response({'updated': reads.mark_all_read(request.user)})
 
     @action(detail=False, methods=['get'], url_path='unread-count')
     def unread_count(self, request):
-        count = self.get_queryset().filter(read_at__isnull=True).count()
-        return Response({'count': count})
+        """Polled by the bell from every tab: a cache lookup (notifications.reads)."""
+        return Response({'count': reads.unread_count(request.user)})
 
     @action(detail=False, methods=['get'], url_path='recent')
     def recent(self, request):
         """Last 5 unread — used by the bell dropdown."""
-        items = self.get_queryset().filter(read_at__isnull=True)[:5]
+        user  = request.user
+        items = reads.with_read_state(reads.unread(reads.inbox(user), user), user)[:5]
         return Response(NotificationSerializer(items, many=True).data)
 
 
@@ -133,41 +126,44 @@ class AdminAlertView(APIView):
       { "title": "...", "body": "...", "store_ids": ["uuid", ...] }
       or
       { "title": "...", "body": "...", "all_stores": true }
+
+    store_ids are written before the response ({"sent_to": n}); all_stores
+    runs as a BroadcastJob in the background and answers 202 with the job —
+    poll GET /api/admin/alerts/jobs/<id>/ for progress.
     """
     permission_classes = [IsAuthenticated, IsSuperAdmin]
 
     def post(self, request):
-        from core.models import Store
-
         title = request.data.get('title', '').strip()
         body  = request.data.get('body', '').strip()
         if not title:
             return Response({'detail': 'title is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        all_stores = request.data.get('all_stores', False)
-        if all_stores:
-            stores = Store.objects.filter(is_active=True, is_deleted=False)
-        else:
-            ids = request.data.get('store_ids', [])
-            if not ids:
-                return Response({'detail': 'Provide store_ids or all_stores=true.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            stores = Store.objects.filter(id__in=ids, is_deleted=False)
-
-        count = 0
-        for store in stores:
-            send_notification(
-                store=store,
-                title=title,
-                body=body,
-                priority=Notification.Priority.ADMIN,
-                notif_type=Notification.Type.ADMIN_NOTE,
-            )
-            count += 1
+        if request.data.get('all_stores', False):
+            job = broadcast.create_job(title, body, user=request.user)
+            broadcast.start_job(job)
+            return Response({'job': BroadcastJobSerializer(job).data},
+                            status=status.HTTP_202_ACCEPTED)
 
+        ids = request.data.get('store_ids', [])
+        if not ids:
+            return Response({'detail': 'Provide store_ids or all_stores=true.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        count = broadcast.send(title, body, broadcast.target_stores(ids))
         return Response({'sent_to': count})
 
 
+class AdminBroadcastJobView(APIView):
+    """GET /api/admin/alerts/jobs/<id>/ — progress of an all-stores broadcast (sudo only)."""
+    permission_classes = [IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request, pk):
+        job = BroadcastJob.objects.filter(pk=pk).first()
+        if job is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BroadcastJobSerializer(job).data)
+
+
 class AdminAlertHistoryView(APIView):
     """
     GET /api/admin/alerts/history/?store_id=<uuid>&page=1
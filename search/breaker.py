@@ -0,0 +1,126 @@
+"""Circuit breaker + latency budget for the Typesense request path (§SEARCH-CB).
+
+Typesense being *slow* is worse than it being down: every keystroke used to wait
+out the full connection timeout before falling back to pg_trgm. Now each search
+call gets a short latency budget (the client timeout) and runs through a breaker:
+
+  CLOSED     normal. A failure OR a call slower than SLOW_MS counts as a strike;
+             FAILURE_THRESHOLD consecutive strikes trip it OPEN.
+  OPEN       every call is refused instantly (CircuitOpen) so the caller goes
+             straight to its fallback. After COOLDOWN seconds → HALF_OPEN.
+  HALF_OPEN  exactly one probe call is let through; success closes the breaker,
+             a strike re-opens it for another cooldown.
+
+State is per process (each gunicorn worker learns independently, which is what we
+want — no shared dependency to ask whether the dependency is healthy).
+"""
+import os
+import threading
+import time
+
+BUDGET_SECONDS    = float(os.environ.get('TYPESENSE_BUDGET_MS', '300')) / 1000
+SLOW_MS           = float(os.environ.get('TYPESENSE_SLOW_MS', '150'))
+FAILURE_THRESHOLD = int(os.environ.get('TYPESENSE_BREAKER_FAILURES', '5'))
+COOLDOWN          = float(os.environ.get('TYPESENSE_BREAKER_COOLDOWN', '30'))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling Typesense while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, slow_ms=SLOW_MS,
+                 cooldown=COOLDOWN, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_ms = slow_ms
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._strikes = 0
+        self._opened_at = None
+        self._probing = False
+        self.served = 0
+        self.fallbacks = 0
+        self.slow_calls = 0
+        self.errors = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+        return self._state
+
+    def _acquire(self):
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.fallbacks += 1
+        raise CircuitOpen(f'{self.name} circuit is {state}')
+
+    def _record(self, ok, elapsed_ms):
+        with self._lock:
+            was_probe, self._probing = self._probing, False
+            if ok and elapsed_ms > self.slow_ms:
+                self.slow_calls += 1
+                ok = False
+            if ok:
+                self.served += 1
+                self._strikes = 0
+                self._state = CLOSED
+                return
+            self._strikes += 1
+            if was_probe or self._strikes >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker. Raises CircuitOpen when short-circuited,
+        re-raises fn's own error after recording it. A slow-but-successful call
+        still returns its result (it only counts as a strike)."""
+        self._acquire()
+        started = self._clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self.fallbacks += 1
+            self._record(False, 0)
+            raise
+        self._record(True, (self._clock() - started) * 1000)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._state, self._strikes, self._opened_at, self._probing = CLOSED, 0, None, False
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state()
+            attempts = self.served + self.fallbacks + self.slow_calls
+            return {
+                'state': state,
+                'consecutive_strikes': self._strikes,
+                'served': self.served,
+                'slow_calls': self.slow_calls,
+                'errors': self.errors,
+                'fallbacks': self.fallbacks,
+                'fallback_rate': round(self.fallbacks / attempts, 4) if attempts else None,
+                'budget_ms': int(BUDGET_SECONDS * 1000),
+                'slow_ms': self.slow_ms,
+            }
+
+
+typesense_breaker = CircuitBreaker('typesense')
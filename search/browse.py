@@ -0,0 +1,180 @@
+"""Faceted product browsing (§SEARCH-FACET).
+
+One call returns a page of hits plus facet counts for the store's dynamic
+attributes, category tree, supplier and stock state. Typesense answers it from
+the facet fields on the product document; when Typesense is unconfigured or
+degraded the same response is built in Postgres with EXISTS filters and grouped
+counts (no per-attribute self-joins, no DISTINCT over the whole catalog).
+
+Facet counts describe the filtered result set. The DB fallback counts categories
+by the product's own (leaf) category only; Typesense counts every ancestor.
+"""
+import uuid
+from decimal import Decimal
+
+from django.db.models import (
+    Case, CharField, Count, DecimalField, Exists, F, Min, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from inventory.models import Category, Product, ProductAttribute, ProductVariant, Supplier
+from . import client as ts
+from .indexing import suggestion_fields
+
+STOCK_STATES = ('in', 'low', 'out')
+MAX_PER_PAGE = 100
+
+
+def parse_filters(params, reserved):
+    """Split request params into browse filters.
+
+    category / supplier / stock are the fixed facets; every other non-reserved
+    param is a dynamic attribute key (?season=AW25&season=SS25&gender=Men).
+    Repeated values are OR-ed. Returns {'attrs': {key: [values]}, 'category': [...],
+    'supplier': [...], 'stock': [...]}. Raises ValueError when a category or
+    supplier value is not a UUID.
+    """
+    out = {'attrs': {}, 'category': [], 'supplier': [], 'stock': []}
+    for key in params.keys():
+        values = [v for v in params.getlist(key) if v != '']
+        if not values:
+            continue
+        if key in ('category', 'supplier'):
+            try:
+                out[key] = [str(uuid.UUID(v)) for v in values]
+            except ValueError:
+                raise ValueError(f'{key} must be a UUID.') from None
+        elif key == 'stock':
+            out['stock'] = [v for v in values if v in STOCK_STATES]
+        elif key not in reserved:
+            out['attrs'][key] = values
+    return out
+
+
+def browse(store, q='', filters=None, page=1, per_page=50):
+    """Hits + facets for the store. Returns the API payload dict."""
+    filters = filters or parse_filters({}, ())
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    page = max(1, int(page))
+    payload = None
+    if ts.is_configured():
+        try:
+            payload = _browse_typesense(store, q, filters, page, per_page)
+        except Exception:
+            payload = None
+    if payload is None:
+        payload = _browse_db(store, q, filters, page, per_page)
+    payload.update({'page': page, 'per_page': per_page})
+    return payload
+
+
+# --- Typesense -------------------------------------------------------------
+
+def _browse_typesense(store, q, filters, page, per_page):
+    # One clause per attribute key: values within a key OR, keys AND.
+    clauses = [('attrs', [f'{key}={v}' for v in values])
+               for key, values in filters['attrs'].items()]
+    clauses += [('category_path', filters['category']),
+                ('supplier_id', filters['supplier']),
+                ('stock_state', filters['stock'])]
+    found, hits, raw = ts.search_facets(str(store.id), q or '*', clauses, page, per_page)
+
+    attributes = {}
+    for value, count in raw.get('attrs', []):
+        key, _, val = value.partition('=')
+        attributes.setdefault(key, []).append({'value': val, 'count': count})
+    return {
+        'found': found,
+        'hits': hits,
+        'facets': {
+            'attributes': attributes,
+            'categories': _named(Category, store, raw.get('category_path', [])),
+            'suppliers':  _named(Supplier, store, raw.get('supplier_id', [])),
+            'stock_state': [{'value': v, 'count': c} for v, c in raw.get('stock_state', [])],
+        },
+        'engine': 'typesense',
+    }
+
+
+def _named(model, store, pairs):
+    """[(id, count)] → [{'id', 'name', 'count'}] with one name lookup."""
+    if not pairs:
+        return []
+    names = dict(model.objects.filter(store=store, id__in=[p for p, _ in pairs])
+                 .values_list('id', 'name'))
+    names = {str(k): v for k, v in names.items()}
+    return [{'id': pk, 'name': names.get(pk, ''), 'count': c} for pk, c in pairs if pk]
+
+
+# --- Postgres fallback -----------------------------------------------------
+
+def _browse_db(store, q, filters, page, per_page):
+    qs = Product.objects.filter(store=store, source=Product.Source.STORE)
+    if q:
+        qs = qs.filter(name__icontains=q)
+    for key, values in filters['attrs'].items():
+        qs = qs.filter(Exists(ProductAttribute.objects.filter(
+            variant__product=OuterRef('pk'), definition__key=key, value__in=values)))
+    if filters['category']:
+        cats = filters['category']
+        qs = qs.filter(Q(category_id__in=cats) | Q(category__parent_id__in=cats)
+                       | Q(category__parent__parent_id__in=cats)
+                       | Q(category__parent__parent__parent_id__in=cats))
+    if filters['supplier']:
+        qs = qs.filter(supplier_id__in=filters['supplier'])
+
+    stock_sq = Subquery(
+        ProductVariant.objects.filter(product=OuterRef('pk'))
+        .values('product')
+        .annotate(t=Coalesce(Sum('stock_levels__quantity'), Value(Decimal('0'))))
+        .values('t')[:1]
+    )
+    reorder_sq = Subquery(
+        ProductVariant.objects.filter(product=OuterRef('pk'))
+        .values('product').annotate(m=Min('reorder_level')).values('m')[:1]
+    )
+    qs = qs.annotate(
+        _stock=Coalesce(stock_sq, Value(Decimal('0')), output_field=DecimalField()),
+        _reorder=reorder_sq,
+    ).annotate(_stock_state=Case(
+        When(_stock__lte=0, then=Value('out')),
+        When(_stock__lte=F('_reorder'), then=Value('low')),
+        default=Value('in'), output_field=CharField(),
+    ))
+    if filters['stock']:
+        qs = qs.filter(_stock_state__in=filters['stock'])
+
+    found = qs.count()
+    start = (page - 1) * per_page
+    page_qs = (qs.order_by('name')
+               .prefetch_related('variants', 'variants__stock_levels')[start:start + per_page])
+    hits = [suggestion_fields(p) for p in page_qs]
+
+    ids = qs.values('id')
+    attributes = {}
+    for row in (ProductAttribute.objects.filter(variant__product__in=ids)
+                .exclude(value='')
+                .values('definition__key', 'value')
+                .annotate(n=Count('variant__product', distinct=True))
+                .order_by('definition__key', '-n')):
+        attributes.setdefault(row['definition__key'], []).append(
+            {'value': row['value'], 'count': row['n']})
+    categories = [
+        {'id': str(r['category_id']), 'name': r['category__name'], 'count': r['n']}
+        for r in qs.exclude(category=None).values('category_id', 'category__name')
+        .annotate(n=Count('id')).order_by('-n')
+    ]
+    suppliers = [
+        {'id': str(r['supplier_id']), 'name': r['supplier__name'], 'count': r['n']}
+        for r in qs.exclude(supplier=None).values('supplier_id', 'supplier__name')
+        .annotate(n=Count('id')).order_by('-n')
+    ]
+    stock = [{'value': r['_stock_state'], 'count': r['n']}
+             for r in qs.values('_stock_state').annotate(n=Count('id')).order_by('-n')]
+    return {
+        'found': found,
+        'hits': hits,
+        'facets': {'attributes': attributes, 'categories': categories,
+                   'suppliers': suppliers, 'stock_state': stock},
+        'engine': 'db',
+    }
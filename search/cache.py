@@ -0,0 +1,102 @@
+"""Short-TTL per-store cache of autocomplete results (§SEARCH-CACHE).
+
+Cashiers type the same handful of prefixes all day, so (normalized query, mode)
+→ ranked result is cached in front of Typesense AND the pg_trgm fallback. Keys
+embed the store's catalog version; any product write bumps it (search.signals),
+which orphans every cached entry for that store at once — no key scans, the old
+entries simply age out on their TTL.
+
+Uses Django's default cache. With the stock LocMemCache both the entries and the
+hit/miss counters are per process; point CACHES at a shared backend to pool them.
+Best-effort like the rest of search/: a cache error is a miss, never a failure.
+"""
+import hashlib
+import os
+
+from django.core.cache import cache
+
+TTL = int(os.environ.get('SEARCH_CACHE_TTL', '30'))   # seconds; 0 disables
+
+_VERSION_KEY = 'search:catver:{}'
+_ENTRY_KEY   = 'search:ac:{}:{}:{}:{}'
+_HITS_KEY    = 'search:ac:hits'
+_MISSES_KEY  = 'search:ac:misses'
+
+
+def normalize(q):
+    """Case- and whitespace-insensitive form of a query ('  PanA ' → 'pana')."""
+    return ' '.join((q or '').lower().split())
+
+
+def catalog_version(store_id):
+    try:
+        cache.add(_VERSION_KEY.format(store_id), 1, None)
+        return cache.get(_VERSION_KEY.format(store_id), 1)
+    except Exception:
+        return 0
+
+
+def bump_catalog_version(store_id):
+    """Invalidate every cached result for the store. Never raises."""
+    if store_id is None:
+        return
+    key = _VERSION_KEY.format(store_id)
+    try:
+        cache.add(key, 1, None)
+        cache.incr(key)
+    except Exception:
+        pass
+
+
+def _count(key):
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key)
+    except Exception:
+        pass
+
+
+def _key(store_id, q, mode):
+    # Hash the query: memcached rejects spaces / non-ASCII (Arabic) in keys.
+    digest = hashlib.sha1(normalize(q).encode('utf-8')).hexdigest()
+    return _ENTRY_KEY.format(store_id, catalog_version(store_id), mode, digest)
+
+
+def get(store_id, q, mode):
+    """Cached result for (store, q, mode), or None. Counts a hit or a miss."""
+    if TTL <= 0:
+        return None
+    try:
+        value = cache.get(_key(store_id, q, mode))
+    except Exception:
+        value = None
+    _count(_HITS_KEY if value is not None else _MISSES_KEY)
+    return value
+
+
+def put(store_id, q, mode, value):
+    if TTL <= 0:
+        return
+    try:
+        cache.set(_key(store_id, q, mode), value, TTL)
+    except Exception:
+        pass
+
+
+def stats():
+    """{'hits', 'misses', 'hit_ratio'} since the counters were last reset."""
+    try:
+        hits = cache.get(_HITS_KEY, 0)
+        misses = cache.get(_MISSES_KEY, 0)
+    except Exception:
+        hits = misses = 0
+    total = hits + misses
+    return {'hits': hits, 'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None}
+
+
+def reset_stats():
+    try:
+        cache.delete_many([_HITS_KEY, _MISSES_KEY])
+    except Exception:
+        pass
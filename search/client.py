@@ -15,12 +15,16 @@ global search bar (§SEARCH-NAV). Supports EN + AR and parent→child breadcrumb
 
 Everything here is best-effort. If Typesense is unconfigured or unreachable the
 caller falls back to the pg_trgm query — search can never break because of Typesense.
+Request-path searches run under a latency budget + circuit breaker (search.breaker),
+so a degraded Typesense is skipped instantly instead of stalling every keystroke.
 """
 import os
 
 import typesense
 from typesense.exceptions import ObjectNotFound
 
+from .breaker import BUDGET_SECONDS, typesense_breaker
+
 HOST       = os.environ.get('TYPESENSE_HOST', '127.0.0.1')
 PORT       = os.environ.get('TYPESENSE_PORT', '8108')
 PROTOCOL   = os.environ.get('TYPESENSE_PROTOCOL', 'http')
@@ -50,6 +54,11 @@ NAV_SCHEMA = {
 # Document schema. Fields searched: name (EN trade name), brand_ar (Arabic trade
 # name), active_ing / active_ing_ar (active ingredient). store_id + source are
 # filter facets; source_rank breaks _text_match ties to surface STORE above MB.
+#
+# The unindexed tail (default_variant_* / sku_display / selling_mode) is a display
+# snapshot for the autocomplete "suggest" mode: the dropdown renders straight from
+# the hit, no DB round-trip. hide_from_pos is indexed so POS can filter on it.
+# Adding fields here needs a `ts_reindex` (the collection is created from SCHEMA).
 SCHEMA = {
     'name': COLLECTION,
     'fields': [
@@ -60,9 +69,30 @@ SCHEMA = {
         {'name': 'brand_ar',      'type': 'string', 'optional': True},
         {'name': 'active_ing',    'type': 'string', 'optional': True},
         {'name': 'active_ing_ar', 'type': 'string', 'optional': True},
+        {'name': 'hide_from_pos', 'type': 'bool',   'optional': True},
+        {'name': 'default_variant_id',    'type': 'string', 'optional': True, 'index': False},
+        {'name': 'default_variant_price', 'type': 'string', 'optional': True, 'index': False},
+        {'name': 'default_variant_stock', 'type': 'float',  'optional': True, 'index': False},
+        {'name': 'sku_display',           'type': 'string', 'optional': True, 'index': False},
+        {'name': 'selling_mode',          'type': 'string', 'optional': True, 'index': False},
+        # Browse facets (§SEARCH-FACET): attrs = "key=value" per dynamic attribute,
+        # category_path = ancestor ids root→leaf, stock_state = in / low / out.
+        {'name': 'attrs',         'type': 'string[]', 'facet': True, 'optional': True},
+        {'name': 'category_path', 'type': 'string[]', 'facet': True, 'optional': True},
+        {'name': 'supplier_id',   'type': 'string',   'facet': True, 'optional': True},
+        {'name': 'stock_state',   'type': 'string',   'facet': True, 'optional': True},
     ],
 }
 
+FACET_FIELDS = ('attrs', 'category_path', 'supplier_id', 'stock_state')
+
+# Fields returned by search_suggestions — the compact autocomplete row. Same names
+# as ProductListSerializer so the frontend reads both shapes with one code path.
+SUGGEST_FIELDS = (
+    'id', 'name', 'source', 'hide_from_pos', 'selling_mode',
+    'default_variant_id', 'default_variant_price', 'default_variant_stock', 'sku_display',
+)
+
 _clients = {}
 
 
@@ -71,18 +101,33 @@ def is_configured():
     return bool(API_KEY)
 
 
-def get_client(timeout=2):
+def get_client(timeout=2, num_retries=3):
     """Cached client with the given connection timeout (seconds).
 
-    Short (2s) for the request/search path; long (e.g. 120s) for bulk reindex.
+    Short (2s) for single-doc indexing; long (e.g. 120s) for bulk reindex. The
+    search path uses search_client() instead.
     """
-    if timeout not in _clients:
-        _clients[timeout] = typesense.Client({
+    key = (timeout, num_retries)
+    if key not in _clients:
+        _clients[key] = typesense.Client({
             'nodes': [{'host': HOST, 'port': str(PORT), 'protocol': PROTOCOL}],
             'api_key': API_KEY,
             'connection_timeout_seconds': timeout,
+            'num_retries': num_retries,
         })
-    return _clients[timeout]
+    return _clients[key]
+
+
+def search_client():
+    """Client for per-keystroke searches: the latency budget as its timeout and no
+    retries (the SDK default of 3 would multiply the budget on a slow node)."""
+    return get_client(timeout=BUDGET_SECONDS, num_retries=0)
+
+
+def guarded_search(collection, params):
+    """One guarded search call. Raises CircuitOpen while the breaker is open."""
+    return typesense_breaker.call(
+        search_client().collections[collection].documents.search, params)
 
 
 def collection_exists(client=None):
@@ -122,7 +167,7 @@ def search_nav(q, limit=10):
 
     Raises on Typesense error — caller must catch and fall back to client-side filter.
     """
-    res = get_client(timeout=2).collections[NAV_COLLECTION].documents.search({
+    res = guarded_search(NAV_COLLECTION, {
         'q': q,
         'query_by': 'label,label_ar,kw,kw_ar',
         'query_by_weights': '4,4,2,2',
@@ -134,17 +179,13 @@ def search_nav(q, limit=10):
     return [hit['document'] for hit in res.get('hits', [])]
 
 
-def search_ids(store_id, q, store_history=False, limit=20):
-    """Return ranked product IDs (strings) for the query.
-
-    Typo-tolerant + prefix (so 'convantin' → 'Conventin'). Filters by store, and
-    by source=STORE in store_history mode. Raises on ANY Typesense error — the
-    caller MUST catch and fall back to pg_trgm.
-    """
+def _product_search_params(store_id, q, store_history, limit, exclude_hidden=False):
     filter_by = f'store_id:={store_id}'
     if store_history:
         filter_by += ' && source:=STORE'
-    res = get_client(timeout=2).collections[COLLECTION].documents.search({
+    if exclude_hidden:
+        filter_by += ' && hide_from_pos:=false'
+    return {
         'q': q,
         'query_by': 'name,brand_ar,active_ing,active_ing_ar',
         'query_by_weights': '4,3,2,1',
@@ -153,6 +194,70 @@ def search_ids(store_id, q, store_history=False, limit=20):
         'prefix': True,
         'num_typos': 2,
         'per_page': limit,
-        'include_fields': 'id',
-    })
+    }
+
+
+def search_ids(store_id, q, store_history=False, limit=20):
+    """Return ranked product IDs (strings) for the query.
+
+    Typo-tolerant + prefix (so 'convantin' → 'Conventin'). Filters by store, and
+    by source=STORE in store_history mode. Raises on ANY Typesense error (or
+    CircuitOpen while the breaker is open) — the caller MUST catch and fall back
+    to pg_trgm.
+    """
+    params = _product_search_params(store_id, q, store_history, limit)
+    params['include_fields'] = 'id'
+    res = guarded_search(COLLECTION, params)
     return [hit['document']['id'] for hit in res.get('hits', [])]
+
+
+def search_suggestions(store_id, q, store_history=False, limit=20, exclude_hidden=False):
+    """Ranked compact rows (SUGGEST_FIELDS) served straight from the index.
+
+    Same ranking + filters as search_ids; exclude_hidden drops ghosted products
+    (POS). Missing optional fields come back as None. Raises on ANY Typesense
+    error — the caller MUST catch and fall back.
+    """
+    params = _product_search_params(store_id, q, store_history, limit, exclude_hidden)
+    params['include_fields'] = ','.join(SUGGEST_FIELDS)
+    res = guarded_search(COLLECTION, params)
+    return [{f: hit['document'].get(f) for f in SUGGEST_FIELDS} for hit in res.get('hits', [])]
+
+
+def _quote(value):
+    # Backtick-quoted filter values may hold spaces, commas, ':' — not backticks.
+    return '`' + str(value).replace('`', '') + '`'
+
+
+def search_facets(store_id, q='*', clauses=(), page=1, per_page=50):
+    """Faceted browse over STORE products: hits (SUGGEST_FIELDS) + facet counts.
+
+    `clauses` is a list of (facet field, accepted values): values inside one
+    clause are OR-ed, clauses are AND-ed — so two attributes are two `attrs`
+    clauses, e.g. [('attrs', ['season=AW25']), ('attrs', ['gender=Men']),
+    ('stock_state', ['low', 'out'])]. Returns (found, hits, {field: [(value, count)]}).
+    Raises on ANY Typesense error (incl. CircuitOpen) — caller falls back.
+    """
+    filter_by = [f'store_id:={store_id}', 'source:=STORE']
+    for field, values in clauses:
+        if values:
+            filter_by.append(f"{field}:=[{','.join(_quote(v) for v in values)}]")
+    res = guarded_search(COLLECTION, {
+        'q': q or '*',
+        'query_by': 'name,brand_ar,active_ing,active_ing_ar',
+        'query_by_weights': '4,3,2,1',
+        'filter_by': ' && '.join(filter_by),
+        'facet_by': ','.join(FACET_FIELDS),
+        'max_facet_values': 100,
+        'prefix': True,
+        'num_typos': 2,
+        'page': page,
+        'per_page': per_page,
+        'include_fields': ','.join(SUGGEST_FIELDS),
+    })
+    hits = [{f: hit['document'].get(f) for f in SUGGEST_FIELDS} for hit in res.get('hits', [])]
+    facets = {
+        fc['field_name']: [(c['value'], c['count']) for c in fc.get('counts', [])]
+        for fc in res.get('facet_counts', [])
+    }
+    return res.get('found', 0), hits, facets
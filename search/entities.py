@@ -0,0 +1,236 @@
+"""Global multi-entity search index (§SEARCH-GLOBAL).
+
+One `entities_<env>` collection holds every record the global search bar can jump
+to — STORE products, customers (name / phone), suppliers, posted sales invoices
+(number), purchases (our number + the supplier's vendor reference) and service
+tickets (serial). Store-scoped exactly like the products collection: every
+document carries store_id, and one typo-tolerant query ranks all types together,
+replacing a sequential `icontains` scan per entity list.
+
+Kept in sync incrementally by search.signals (upsert after commit, delete on soft
+delete); `ts_entity_reindex` rebuilds from scratch. Best-effort like the rest of
+search/: indexing never raises into a write, and the search view falls back to
+bounded per-entity DB lookups when Typesense is unavailable.
+"""
+import logging
+
+from typesense.exceptions import ObjectNotFound
+
+from core.oncommit import batch_on_commit
+from . import client as ts
+
+logger = logging.getLogger(__name__)
+
+ENTITY_COLLECTION = f'entities_{ts.COLLECTION.rsplit("_", 1)[-1]}'
+
+ENTITY_SCHEMA = {
+    'name': ENTITY_COLLECTION,
+    'fields': [
+        {'name': 'store_id',  'type': 'string', 'facet': True},
+        {'name': 'type',      'type': 'string', 'facet': True},
+        {'name': 'type_rank', 'type': 'int32'},
+        {'name': 'title',     'type': 'string'},
+        {'name': 'subtitle',  'type': 'string', 'optional': True},
+        # Exact-ish identifiers (phones, invoice / purchase / serial numbers, SKUs).
+        {'name': 'codes',     'type': 'string[]', 'optional': True},
+        {'name': 'ref_id',    'type': 'string', 'index': False, 'optional': True},
+        {'name': 'path',      'type': 'string', 'index': False, 'optional': True},
+    ],
+}
+
+# type → (list page the FE opens, tie-break rank, minimum role to see it).
+# Roles mirror the list permission of each entity's own ViewSet.
+ENTITY_TYPES = {
+    'product':  ('/inventory/products',  0, 'CASHIER'),
+    'customer': ('/people/customers',    1, 'CASHIER'),
+    'invoice':  ('/finance/invoices',    2, 'CASHIER'),
+    'service':  ('/services',            3, 'CASHIER'),
+    'supplier': ('/people/suppliers',    4, 'MANAGER'),
+    'purchase': ('/inventory/purchases', 5, 'MANAGER'),
+}
+
+
+def _doc(entity_type, obj, title, subtitle='', codes=()):
+    path, rank, _role = ENTITY_TYPES[entity_type]
+    return {
+        'id':        f'{entity_type}:{obj.pk}',
+        'store_id':  str(obj.store_id),
+        'type':      entity_type,
+        'type_rank': rank,
+        'title':     title or '',
+        'subtitle':  subtitle or '',
+        'codes':     [c for c in codes if c],
+        'ref_id':    str(obj.pk),
+        'path':      path,
+    }
+
+
+def build_entity_document(entity_type, obj):
+    """Map a model instance to its entities document, or None if it shouldn't be
+    searchable (deleted, Memory Base, draft invoice without a number…)."""
+    if getattr(obj, 'is_deleted', False):
+        return None
+    if entity_type == 'product':
+        if obj.source != 'STORE':
+            return None
+        codes = []
+        for v in obj.variants.all():
+            codes += [v.sku, v.barcode]
+        return _doc('product', obj, obj.name, '', codes)
+    if entity_type == 'customer':
+        return _doc('customer', obj, obj.name, obj.phone_number or '',
+                    [obj.phone_number, obj.whatsapp_number])
+    if entity_type == 'supplier':
+        return _doc('supplier', obj, obj.name, obj.company_name,
+                    [obj.phone_number, obj.code_prefix])
+    if entity_type == 'invoice':
+        if not obj.invoice_number:
+            return None
+        return _doc('invoice', obj, f'Invoice #{obj.invoice_number}',
+                    getattr(obj.customer, 'name', ''), [str(obj.invoice_number)])
+    if entity_type == 'purchase':
+        title = f'Purchase {obj.purchase_number}' if obj.purchase_number else 'Purchase (draft)'
+        supplier = getattr(obj.supplier, 'name', '') if obj.supplier_id else ''
+        return _doc('purchase', obj, title, supplier, [obj.purchase_number, obj.vendor_reference])
+    if entity_type == 'service':
+        client = obj.client_name or (getattr(obj.client, 'name', '') if obj.client_id else '')
+        return _doc('service', obj, f'{obj.serial_number} — {obj.service_type or "Service"}',
+                    client, [obj.serial_number, obj.client_phone])
+    raise ValueError(f'Unknown entity type {entity_type!r}')
+
+
+def _models():
+    from finance.models import PurchaseInvoice, SalesInvoice
+    from inventory.models import Product, Supplier
+    from services.models import Service
+    from users.models import Customer
+    return {
+        'product':  (Product,         ('variants',)),
+        'customer': (Customer,        ()),
+        'supplier': (Supplier,        ()),
+        'invoice':  (SalesInvoice,    ('customer',)),
+        'purchase': (PurchaseInvoice, ('supplier',)),
+        'service':  (Service,         ('client',)),
+    }
+
+
+# --- incremental sync (signals) -------------------------------------------
+
+def _flush_pending(keys):
+    models = _models()
+    for entity_type, pk in keys:
+        model, _related = models[entity_type]
+        obj = model.all_objects.filter(pk=pk).first()
+        doc = build_entity_document(entity_type, obj) if obj is not None else None
+        try:
+            docs = ts.get_client().collections[ENTITY_COLLECTION].documents
+            if doc is None:
+                docs[f'{entity_type}:{pk}'].delete()
+            else:
+                docs.upsert(doc)
+        except ObjectNotFound:
+            pass
+        except Exception as exc:       # noqa: BLE001 — indexing must never break a write
+            logger.warning("Typesense entity sync failed for %s:%s: %s", entity_type, pk, exc)
+
+
+def sync_on_commit(entity_type, pk):
+    """Upsert (or drop) one entity document after the transaction commits.
+    One batch per transaction (core.oncommit); a rollback discards it."""
+    if not ts.is_configured() or pk is None:
+        return
+    key = (entity_type, pk)
+    batch_on_commit(_flush_pending, key, key=key)
+
+
+# --- bulk rebuild ----------------------------------------------------------
+
+def reindex_entities(stdout=None, batch_size=2000):
+    """Drop + rebuild the entities collection. Returns (imported, failed). May raise."""
+    client = ts.get_client(timeout=120)
+    try:
+        client.collections[ENTITY_COLLECTION].delete()
+    except ObjectNotFound:
+        pass
+    client.collections.create(ENTITY_SCHEMA)
+
+    total, failed = 0, 0
+    for entity_type, (model, related) in _models().items():
+        qs = model.all_objects.filter(is_deleted=False)
+        if entity_type == 'product':
+            qs = qs.filter(source='STORE').prefetch_related(*related)
+        elif related:
+            qs = qs.select_related(*related)
+        batch = []
+        for obj in qs.iterator(chunk_size=batch_size):
+            doc = build_entity_document(entity_type, obj)
+            if doc is not None:
+                batch.append(doc)
+            if len(batch) >= batch_size:
+                results = client.collections[ENTITY_COLLECTION].documents.import_(batch, {'action': 'upsert'})
+                failed += sum(1 for r in results if not r.get('success', False))
+                total += len(batch)
+                batch = []
+        if batch:
+            results = client.collections[ENTITY_COLLECTION].documents.import_(batch, {'action': 'upsert'})
+            failed += sum(1 for r in results if not r.get('success', False))
+            total += len(batch)
+        if stdout:
+            stdout(f"  {entity_type}: indexed (running total {total})")
+    return total, failed
+
+
+# --- query -----------------------------------------------------------------
+
+def search_entities(store_id, q, types, limit=20):
+    """Ranked hits across the allowed entity `types`. Raises on ANY Typesense
+    error (incl. CircuitOpen) — the caller falls back to DB lookups."""
+    res = ts.guarded_search(ENTITY_COLLECTION, {
+        'q': q,
+        'query_by': 'title,codes,subtitle',
+        'query_by_weights': '4,4,2',
+        'filter_by': f"store_id:={store_id} && type:=[{','.join(types)}]",
+        'sort_by': '_text_match:desc,type_rank:asc',
+        'prefix': True,
+        'num_typos': 2,
+        'per_page': limit,
+        'include_fields': 'type,ref_id,title,subtitle,path',
+    })
+    return [{
+        'type': hit['document']['type'],
+        'id': hit['document']['ref_id'],
+        'title': hit['document']['title'],
+        'subtitle': hit['document'].get('subtitle', ''),
+        'path': hit['document'].get('path', ''),
+    } for hit in res.get('hits', [])]
+
+
+def search_entities_db(store, q, types, per_type=5):
+    """Fallback: a few bounded icontains lookups, one per allowed type."""
+    from django.db.models import Q
+    models = _models()
+    q_filters = {
+        'product':  Q(name__icontains=q) | Q(variants__sku__icontains=q) | Q(variants__barcode__icontains=q),
+        'customer': Q(name__icontains=q) | Q(phone_number__icontains=q),
+        'supplier': Q(name__icontains=q) | Q(company_name__icontains=q) | Q(phone_number__icontains=q),
+        'invoice':  Q(invoice_number=int(q)) if q.isdigit() else None,
+        'purchase': Q(purchase_number__icontains=q) | Q(vendor_reference__icontains=q),
+        'service':  Q(serial_number__icontains=q) | Q(client_name__icontains=q) | Q(client_phone__icontains=q),
+    }
+    results = []
+    for entity_type in sorted(types, key=lambda t: ENTITY_TYPES[t][1]):
+        cond = q_filters[entity_type]
+        if cond is None:
+            continue
+        model, related = models[entity_type]
+        qs = model.objects.filter(store=store).filter(cond)
+        if entity_type == 'product':
+            qs = qs.filter(source='STORE').prefetch_related(*related).distinct()
+        elif related:
+            qs = qs.select_related(*related)
+        for obj in qs[:per_type]:
+            doc = build_entity_document(entity_type, obj)
+            if doc is not None:
+                results.append({'type': doc['type'], 'id': doc['ref_id'], 'title': doc['title'],
+                                'subtitle': doc['subtitle'], 'path': doc['path']})
+    return results
@@ -8,7 +8,8 @@ import logging
 
 from typesense.exceptions import ObjectNotFound
 
-from inventory.models import Product
+from core.oncommit import batch_on_commit
+from inventory.models import Product, ProductVariant
 from . import client as ts
 
 logger = logging.getLogger(__name__)
@@ -17,28 +18,89 @@ logger = logging.getLogger(__name__)
 _ATTR_KEYS = ('brand_ar', 'active_ing', 'active_ing_ar')
 
 
+def suggestion_fields(product):
+    """The autocomplete display snapshot for a product (client.SUGGEST_FIELDS).
+
+    Mirrors ProductListSerializer's default_variant_* / sku_display so a suggest
+    row looks like a list row. The stock figure is a snapshot — selecting a result
+    hydrates the real product. For bulk use, prefetch variants__stock_levels.
+    The default variant is the lowest pk, as variants.first() picks it there.
+    """
+    variants = sorted(product.variants.all(), key=lambda v: v.pk)
+    default = variants[0] if variants else None
+    if not variants:
+        sku_display = None
+    elif len(variants) == 1:
+        sku_display = variants[0].sku
+    else:
+        sku_display = f"{variants[0].sku} +{len(variants) - 1}"
+    return {
+        'id':                    str(product.id),
+        'name':                  product.name or '',
+        'source':                product.source,
+        'hide_from_pos':         bool(product.hide_from_pos),
+        'selling_mode':          product.selling_mode,
+        'default_variant_id':    str(default.id) if default else None,
+        'default_variant_price': str(default.sell_price) if default else None,
+        'default_variant_stock': float(sum(s.quantity for s in default.stock_levels.all())) if default else 0.0,
+        'sku_display':           sku_display,
+    }
+
+
+def stock_state(product):
+    """'out' / 'low' / 'in' for the browse facet. Low = total on-hand at or below
+    the smallest variant reorder level. Same rule as browse's DB fallback."""
+    variants = list(product.variants.all())
+    total = sum(s.quantity for v in variants for s in v.stock_levels.all())
+    if total <= 0:
+        return 'out'
+    if variants and total <= min(v.reorder_level for v in variants):
+        return 'low'
+    return 'in'
+
+
+def category_path_ids(product):
+    """Category ids root → the product's category (max 4 tiers). Facet filtering
+    on any ancestor then matches the whole subtree."""
+    ids, node, guard = [], product.category, 0
+    while node is not None and guard < 10:
+        ids.append(str(node.pk))
+        node = node.parent
+        guard += 1
+    ids.reverse()
+    return ids
+
+
 def build_document(product):
     """Map a Product (+ its variant attributes) to a Typesense document.
 
     Aggregates the indexed attribute values across the product's variants (first
-    non-empty wins). For bulk use, prefetch variants__attributes__definition.
+    non-empty wins); every attribute also goes into the `attrs` facet as
+    "key=value". For bulk use, select_related the category parent chain and
+    prefetch variants__attributes__definition and variants__stock_levels.
     """
     attrs = {}
+    facet_attrs = set()
     for variant in product.variants.all():
         for a in variant.attributes.all():
             key = a.definition.key
+            if a.value:
+                facet_attrs.add(f'{key}={a.value}')
             if key in _ATTR_KEYS and key not in attrs and a.value:
                 attrs[key] = a.value
-    return {
-        'id':            str(product.id),
+    doc = suggestion_fields(product)
+    doc.update({
         'store_id':      str(product.store_id),
-        'source':        product.source,
         'source_rank':   0 if product.source == Product.Source.STORE else 1,
-        'name':          product.name or '',
         'brand_ar':      attrs.get('brand_ar', ''),
         'active_ing':    attrs.get('active_ing', ''),
         'active_ing_ar': attrs.get('active_ing_ar', ''),
-    }
+        'attrs':         sorted(facet_attrs),
+        'category_path': category_path_ids(product),
+        'supplier_id':   str(product.supplier_id) if product.supplier_id else '',
+        'stock_state':   stock_state(product),
+    })
+    return doc
 
 
 def upsert_product(product):
@@ -61,6 +123,43 @@ def delete_product(product_id):
         logger.warning("Typesense delete failed for product %s: %s", product_id, exc)
 
 
+# Stock / price edits don't save the Product, but they change the suggest snapshot.
+# Collect the touched product / variant ids per transaction and refresh each
+# product once after commit (core.oncommit), so a 10-line checkout costs one
+# upsert per product — never a Typesense call inside the locked transaction.
+
+def _flush_pending(keys):
+    product_ids = {pk for kind, pk in keys if kind == 'product'}
+    variant_ids = {pk for kind, pk in keys if kind == 'variant'}
+    if variant_ids:
+        product_ids.update(ProductVariant.all_objects.filter(id__in=variant_ids)
+                           .values_list('product_id', flat=True))
+    qs = (Product.all_objects.filter(id__in=product_ids)
+          .prefetch_related('variants', 'variants__stock_levels',
+                            'variants__attributes', 'variants__attributes__definition'))
+    for product in qs:
+        if product.is_deleted:
+            delete_product(product.pk)
+        else:
+            upsert_product(product)
+
+
+def _refresh_on_commit(key):
+    if not ts.is_configured() or key[1] is None:
+        return
+    batch_on_commit(_flush_pending, key, key=key)
+
+
+def refresh_product_on_commit(product_id):
+    """Re-index a product once the current transaction commits. Best-effort."""
+    _refresh_on_commit(('product', product_id))
+
+
+def refresh_variant_on_commit(variant_id):
+    """Re-index a variant's product once the current transaction commits."""
+    _refresh_on_commit(('variant', variant_id))
+
+
 def reindex_all(stdout=None, batch_size=2000):
     """Drop + rebuild the whole collection from the DB. Idempotent.
 
@@ -82,7 +181,10 @@ def reindex_all(stdout=None, batch_size=2000):
         failed += sum(1 for r in results if not r.get('success', False))
 
     qs = (Product.all_objects.filter(is_deleted=False)
-          .prefetch_related('variants', 'variants__attributes', 'variants__attributes__definition'))
+          .select_related('category', 'category__parent',
+                          'category__parent__parent', 'category__parent__parent__parent')
+          .prefetch_related('variants', 'variants__stock_levels',
+                            'variants__attributes', 'variants__attributes__definition'))
     batch = []
     for product in qs.iterator(chunk_size=batch_size):
         batch.append(build_document(product))
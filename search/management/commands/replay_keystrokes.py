@@ -0,0 +1,93 @@
+"""Replay a recorded autocomplete keystroke trace against the real view (§SEARCH-CACHE).
+
+Each trace line is JSON: {"t_ms": 1234, "q": "pan", "pos": true} — one request per
+keystroke, as the POS / purchase screens send them. The trace is replayed twice
+through ProductViewSet.autocomplete as the given user: once with the hot-prefix
+cache disabled (cold) and once with it on (warm). Prints latency percentiles for
+both runs plus the warm run's hit ratio. Inter-keystroke gaps are not slept —
+this measures server work, not wall-clock typing.
+
+    manage.py replay_keystrokes --user cashier1
+    manage.py replay_keystrokes --user cashier1 --trace my_trace.jsonl --suggest
+"""
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from search import cache as search_cache
+
+_DEFAULT_TRACE = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks',
+                              'keystrokes_sample.jsonl')
+
+
+class Command(BaseCommand):
+    help = "Replay a keystroke trace through autocomplete; report latency + cache hit ratio."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to replay as (needs a store).')
+        parser.add_argument('--trace', default=_DEFAULT_TRACE, help='JSONL keystroke trace.')
+        parser.add_argument('--suggest', action='store_true', help='Replay in ?suggest=1 mode.')
+
+    def handle(self, *args, **options):
+        from users.models import User
+        try:
+            user = User.objects.select_related('store').get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}.")
+        if not user.store_id:
+            raise CommandError('User has no store.')
+
+        with open(options['trace'], encoding='utf-8') as fh:
+            trace = [json.loads(line) for line in fh if line.strip()]
+        if not trace:
+            raise CommandError('Trace is empty.')
+        self.stdout.write(f"Replaying {len(trace)} keystrokes as {user.username} "
+                          f"(store {user.store.name})…")
+
+        ttl = search_cache.TTL
+        try:
+            search_cache.TTL = 0
+            cold = self._replay(user, trace, options['suggest'])
+            search_cache.TTL = ttl or 30
+            search_cache.bump_catalog_version(user.store_id)   # start the warm run empty
+            search_cache.reset_stats()
+            warm = self._replay(user, trace, options['suggest'])
+            stats = search_cache.stats()
+        finally:
+            search_cache.TTL = ttl
+
+        for label, timings in (('cold (no cache)', cold), ('warm (cache)   ', warm)):
+            self.stdout.write(f"  {label}  {self._summary(timings)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Hit ratio {stats['hit_ratio']} ({stats['hits']} hits / {stats['misses']} misses)."))
+
+    def _replay(self, user, trace, suggest):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from inventory.views import ProductViewSet
+
+        view = ProductViewSet.as_view({'get': 'autocomplete'})
+        factory = APIRequestFactory()
+        timings = []
+        for event in trace:
+            params = {'q': event['q']}
+            if event.get('pos'):
+                params['pos'] = '1'
+            if suggest:
+                params['suggest'] = '1'
+            request = factory.get('/api/inventory/products/autocomplete/', params)
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def _summary(timings):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return (f"mean {statistics.mean(ordered):7.2f} ms · p50 {statistics.median(ordered):7.2f} ms"
+                f" · p95 {p95:7.2f} ms · total {sum(ordered) / 1000:6.2f} s")
@@ -0,0 +1,24 @@
+"""Rebuild the Typesense global-search (entities) collection from the database.
+
+Idempotent + safe to re-run: drops and recreates the collection, then bulk-imports
+every searchable product, customer, supplier, posted invoice, purchase and service
+ticket across all stores. Day-to-day changes sync incrementally via search.signals.
+"""
+from django.core.management.base import BaseCommand
+
+from search import client as ts
+from search.entities import ENTITY_COLLECTION, reindex_entities
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Typesense global-search index from the database (idempotent)."
+
+    def handle(self, *args, **options):
+        if not ts.is_configured():
+            self.stderr.write(self.style.WARNING(
+                "TYPESENSE_API_KEY not set — nothing to do (global search will use the DB)."))
+            return
+        self.stdout.write(f"Reindexing into '{ENTITY_COLLECTION}' @ {ts.HOST}:{ts.PORT} …")
+        total, failed = reindex_entities(stdout=lambda m: self.stdout.write(m))
+        style = self.style.SUCCESS if failed == 0 else self.style.WARNING
+        self.stdout.write(style(f"Done. {total} documents indexed ({failed} failed)."))
@@ -1,18 +1,26 @@
-"""Keep the Typesense index in sync with Product writes (§SEARCH-TS).
+"""Keep the Typesense indexes in sync with model writes (§SEARCH-TS, §SEARCH-GLOBAL).
 
 Both handlers call the fail-safe indexing helpers (which swallow every Typesense
 error), so a Typesense outage can never roll back or block a product save/delete.
 Soft delete is a save with is_deleted=True → the product is dropped from the index.
+Every catalog write also bumps the store's catalog version, which invalidates the
+hot-prefix autocomplete cache (search.cache) for that store.
 """
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from inventory.models import Product, ProductAttribute
-from . import indexing
+from finance.models import PurchaseInvoice, SalesInvoice
+from inventory.models import Product, ProductAttribute, ProductVariant, StockLevel, Supplier
+from services.models import Service
+from users.models import Customer
+from . import cache as search_cache
+from . import entities, indexing
 
 
 @receiver(post_save, sender=Product)
 def _product_saved(sender, instance, **kwargs):
+    search_cache.bump_catalog_version(instance.store_id)
+    entities.sync_on_commit('product', instance.pk)
     if getattr(instance, 'is_deleted', False):
         indexing.delete_product(instance.pk)
     else:
@@ -21,6 +29,8 @@ def _product_saved(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=Product)
 def _product_deleted(sender, instance, **kwargs):
+    search_cache.bump_catalog_version(instance.store_id)
+    entities.sync_on_commit('product', instance.pk)
     indexing.delete_product(instance.pk)
 
 
@@ -34,7 +44,48 @@ def _attribute_changed(sender, instance, **kwargs):
     product = getattr(getattr(instance, 'variant', None), 'product', None)
     if product is None:
         return
+    search_cache.bump_catalog_version(product.store_id)
     if getattr(product, 'is_deleted', False):
         indexing.delete_product(product.pk)
     else:
         indexing.upsert_product(product)
+
+
+# The suggest snapshot (price / SKU / stock of the default variant) lives on the
+# variant and its StockLevels — refresh the parent after commit, deduped per product.
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def _variant_changed(sender, instance, **kwargs):
+    product = getattr(instance, 'product', None)
+    if product is not None:
+        search_cache.bump_catalog_version(product.store_id)   # SKU / barcode hits
+    indexing.refresh_product_on_commit(instance.product_id)
+    entities.sync_on_commit('product', instance.product_id)
+
+
+@receiver(post_save, sender=StockLevel)
+def _stock_changed(sender, instance, **kwargs):
+    indexing.refresh_variant_on_commit(instance.variant_id)
+
+
+# Global search (search.entities): customers, suppliers, invoices, purchases and
+# service tickets. Each write re-syncs its one document after commit; soft delete
+# is a save, so build_entity_document returns None and the document is dropped.
+_ENTITY_TYPES = {
+    Customer: 'customer', Supplier: 'supplier', SalesInvoice: 'invoice',
+    PurchaseInvoice: 'purchase', Service: 'service',
+}
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_delete, sender=SalesInvoice)
+@receiver(post_save, sender=PurchaseInvoice)
+@receiver(post_delete, sender=PurchaseInvoice)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def _entity_changed(sender, instance, **kwargs):
+    entities.sync_on_commit(_ENTITY_TYPES[sender], instance.pk)
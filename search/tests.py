@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase, TestCase
+
+from search.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """A degraded Typesense must be skipped instantly, then probed back in."""
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.breaker = CircuitBreaker('t', failure_threshold=2, slow_ms=100,
+                                      cooldown=10, clock=self.clock)
+
+    def _fail(self):
+        def boom():
+            raise ConnectionError('down')
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(boom)
+
+    def _slow(self):
+        def slow():
+            self.clock.now += 0.5          # 500 ms > slow_ms
+            return 'late'
+        return self.breaker.call(slow)
+
+    def test_opens_after_threshold_and_short_circuits(self):
+        self._fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(lambda: 'never')
+
+    def test_slow_calls_count_as_strikes_but_return(self):
+        self.assertEqual(self._slow(), 'late')
+        self._slow()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_single_probe(self):
+        self._fail()
+        self._fail()
+        self.clock.now += 11
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self._fail()
+        self._fail()
+        self.clock.now += 11
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        stats = self.breaker.stats()
+        self.assertEqual(stats['errors'], 3)
+
+
+class GlobalSearchFallbackTests(TestCase):
+    """Without Typesense the global search falls back to per-type DB lookups,
+    and never returns entity types the user's role can't list."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from core.models import Store
+        from inventory.models import Supplier
+        from users.models import Customer, User
+        self.user = User.objects.create_user(username='gsowner', password='x')
+        self.store = Store.objects.create(name='S1', store_code='204', owner=self.user)
+        self.user.store = self.store
+        self.user.role = User.Role.CASHIER
+        self.user.save()
+        Customer.objects.create(store=self.store, name='Mona Adel', phone_number='01001234567')
+        Supplier.objects.create(store=self.store, name='Mona Pharma', code_prefix='403')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_cashier_sees_customers_not_suppliers(self):
+        r = self.client.get('/api/core/global-search/', {'q': 'mona'})
+        self.assertEqual(r.status_code, 200, r.content)
+        self.assertEqual([hit['type'] for hit in r.json()], ['customer'])
+
+    def test_phone_lookup(self):
+        hits = self.client.get('/api/core/global-search/', {'q': '0100123'}).json()
+        self.assertEqual(hits[0]['title'], 'Mona Adel')
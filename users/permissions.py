@@ -27,6 +27,11 @@ def _required_rank(role):
     return ROLE_RANK.get(role, 0)
 
 
+def has_min_role(user, role):
+    """True when `user` ranks at or above `role` (super-admins always do)."""
+    return _user_rank(user) >= _required_rank(role)
+
+
 class IsSuperAdmin(BasePermission):
     """Allows access only to Vendorya platform super-admins."""
     message = "Super-admin privileges required."
@@ -54,7 +59,7 @@ class _MinRolePermission(BasePermission):
             return False
         if getattr(user, 'is_superadmin', False):
             return True
-        return _user_rank(user) >= _required_rank(self.min_role)
+        return has_min_role(user, self.min_role)
 
 
 class IsCashierOrAbove(_MinRolePermission):
@@ -110,4 +115,4 @@ class RoleScopedPermission(BasePermission):
         role_map = getattr(view, 'role_map', None) or {}
         default = getattr(view, 'default_min_role', User.Role.OWNER)
         required = role_map.get(view.action, default)
-        return _user_rank(user) >= _required_rank(required)
+        return has_min_role(user, required)
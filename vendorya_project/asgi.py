@@ -5,6 +5,15 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Deployment: the POS / back-office API stays on gunicorn sync workers (wsgi.py).
+Long-lived Admin AI chats go to a small ASGI process instead, so an open chat
+holds a coroutine rather than a worker for its whole multi-hop exchange:
+
+    uvicorn vendorya_project.asgi:application --workers 2 --port 8001
+
+with the reverse proxy sending /api/admin/ai/chat/stream/ there (buffering off).
+Every other route also works over ASGI; only that one is async end to end.
 """
 
 import os
@@ -97,6 +97,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.TenantContextMiddleware',
+    'core.middleware.ActivityBufferMiddleware',
     # AxesMiddleware must be last so it sees the final auth outcome.
     'axes.middleware.AxesMiddleware',
 ]
@@ -188,6 +189,25 @@ VUE_DIST_DIR = os.path.join(BASE_DIR, '..', 'vendorya-frontend', 'dist')
 if os.path.exists(VUE_DIST_DIR):
     STATICFILES_DIRS += [os.path.join(VUE_DIST_DIR, 'assets')]
 
+# Caches. `default` stays per process (search autocomplete, KB retrieval —
+# short-lived, best-effort). `notifications` holds the bell's unread counters,
+# which every worker must see invalidated at once, so it lives in the database
+# (table created by notifications migration 0008). It holds one entry per user
+# plus one per store: MAX_ENTRIES must stay above that, or every write culls.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'notifications': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'notifications_unread_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('NOTIF_CACHE_MAX_ENTRIES', '200000')),
+            'CULL_FREQUENCY': 10,       # cull a tenth when full, not a third
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
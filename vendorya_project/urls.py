@@ -5,7 +5,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.http import FileResponse, Http404
-from core.views import HealthView
+from core.views import ActivityHealthView, HealthView, SearchHealthView
 
 def serve_vue(request, path=''):
     index = os.path.join(settings.BASE_DIR, '..', 'vendorya-frontend', 'dist', 'index.html')
@@ -22,6 +22,8 @@ urlpatterns = [
 
     # Public health check
     path('api/health/', HealthView.as_view(), name='health'),
+    path('api/health/search/', SearchHealthView.as_view(), name='health-search'),
+    path('api/health/activity/', ActivityHealthView.as_view(), name='health-activity'),
 
     # API URLs
     path('api/core/',      include('core.urls')),